@@ -0,0 +1,86 @@
+"""Compare the ways a list endpoint can render its rows
+
+Seeds ROWS lessons, then times each path from query to response bytes:
+
+    models      hydrate model instances, jsonable_encoder, json.dumps
+                (the list routes before the .values() fast path)
+    values      .values() dicts encoded with orjson (the current path)
+    json_agg    Postgres builds the JSON array itself
+
+Seeded rows are deleted afterwards. Usage: python -m benchmarks.list_render
+"""
+import asyncio
+import json
+import statistics
+import sys
+import time
+
+from fastapi.encoders import jsonable_encoder
+from tortoise import Tortoise, connections
+
+from library.database.database import TORTOISE_ORM
+from library.dependencies.pagination import dumps
+from models.dashboard import Lesson
+
+ROWS = 10_000
+ROUNDS = 5
+TITLE = "benchmark lesson"
+
+
+def queryset():
+    return Lesson.filter(title=TITLE).order_by("-created_at", "-id")
+
+
+async def models() -> bytes:
+    rows = await queryset()
+    return json.dumps(jsonable_encoder([dict(row) for row in rows])).encode()
+
+
+async def values() -> bytes:
+    return dumps(await queryset().values())
+
+
+async def json_agg() -> bytes:
+    sql = queryset().values().sql()
+    _, rows = await connections.get("default").execute_query(
+        f"SELECT coalesce(json_agg(t), '[]')::text AS body FROM ({sql}) t"
+    )
+    return rows[0]["body"].encode()
+
+
+async def main(rows: int) -> None:
+    await Tortoise.init(config=TORTOISE_ORM)
+    try:
+        await Lesson.bulk_create(
+            [
+                Lesson(
+                    title=TITLE,
+                    content="x" * 600,
+                    stage=1,
+                    stack="backend",
+                    track="python",
+                    proficiency="beginner",
+                )
+                for _ in range(rows)
+            ],
+            batch_size=1000,
+        )
+        print(f"{rows} rows, best and median of {ROUNDS} rounds")
+        for path in (models, values, json_agg):
+            timings = []
+            for _ in range(ROUNDS):
+                start = time.perf_counter()
+                body = await path()
+                timings.append(time.perf_counter() - start)
+            print(
+                f"{path.__name__:>10}: {min(timings) * 1000:8.1f} ms"
+                f" {statistics.median(timings) * 1000:8.1f} ms"
+                f" {len(body):>10} bytes"
+            )
+    finally:
+        await Lesson.filter(title=TITLE).delete()
+        await Tortoise.close_connections()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else ROWS))
@@ -26,3 +26,82 @@ DATABASE_URL = config(
 
 SECRET_KEY = config("SECRET_KEY", cast=str)
 ALGORITHM = config("ALGORITHM", cast=str)
+
+# In-process cache of decoded tokens and authenticated users.
+AUTH_CACHE_TTL = config("AUTH_CACHE_TTL", cast=float, default=60.0)
+AUTH_CACHE_SIZE = config("AUTH_CACHE_SIZE", cast=int, default=1024)
+
+# Worker pool used for bcrypt hashing/verification ("thread" or "process").
+PASSWORD_HASH_EXECUTOR = config(
+    "PASSWORD_HASH_EXECUTOR", cast=str, default="thread"
+)
+PASSWORD_HASH_WORKERS = config("PASSWORD_HASH_WORKERS", cast=int, default=4)
+PASSWORD_HASH_MAX_PENDING = config(
+    "PASSWORD_HASH_MAX_PENDING", cast=int, default=64
+)
+
+REDIS_HOST = config("REDIS_HOST", cast=str, default="redis")
+REDIS_PORT = config("REDIS_PORT", cast=int, default=6379)
+REDIS_POOL_SIZE = config("REDIS_POOL_SIZE", cast=int, default=20)
+REDIS_OTP_DB = config("REDIS_OTP_DB", cast=int, default=1)
+# Shared database for caches, token revocation and other short-lived keys.
+REDIS_CACHE_DB = config("REDIS_CACHE_DB", cast=int, default=2)
+
+ACCESS_TOKEN_EXPIRE_MINUTES = config(
+    "ACCESS_TOKEN_EXPIRE_MINUTES", cast=int, default=15
+)
+REFRESH_TOKEN_EXPIRE_DAYS = config(
+    "REFRESH_TOKEN_EXPIRE_DAYS", cast=int, default=30
+)
+
+PAGE_SIZE = config("PAGE_SIZE", cast=int, default=20)
+MAX_PAGE_SIZE = config("MAX_PAGE_SIZE", cast=int, default=100)
+
+# Cohort feed pages, cached in-process and in Redis.
+FEED_CACHE_SIZE = config("FEED_CACHE_SIZE", cast=int, default=512)
+FEED_CACHE_TTL = config("FEED_CACHE_TTL", cast=int, default=300)
+
+# Resolved cohort ids, cached in-process. Entries expire so the cache
+# stays bounded and recovers from cohorts deleted outside the app.
+COHORT_CACHE_SIZE = config("COHORT_CACHE_SIZE", cast=int, default=1024)
+COHORT_CACHE_TTL = config("COHORT_CACHE_TTL", cast=float, default=3600.0)
+
+# Rows fetched per round trip when streaming admin exports.
+EXPORT_CHUNK_SIZE = config("EXPORT_CHUNK_SIZE", cast=int, default=500)
+
+# Rows per section on the dashboard home page.
+HOME_SECTION_SIZE = config("HOME_SECTION_SIZE", cast=int, default=5)
+
+# Generate time-ordered (UUIDv7) primary keys instead of random UUID4s.
+TIME_ORDERED_IDS = config("TIME_ORDERED_IDS", cast=bool, default=True)
+
+# Request activity is buffered in Redis and written to user.last_active
+# in batches every ACTIVITY_FLUSH_INTERVAL seconds.
+ACTIVITY_FLUSH_INTERVAL = config(
+    "ACTIVITY_FLUSH_INTERVAL", cast=float, default=60.0
+)
+ACTIVITY_BATCH_SIZE = config("ACTIVITY_BATCH_SIZE", cast=int, default=1000)
+
+# Rows validated, hashed and inserted together by bulk imports.
+IMPORT_CHUNK_SIZE = config("IMPORT_CHUNK_SIZE", cast=int, default=500)
+
+# Expired promotion tasks and quizzes are closed at their deadline. The
+# pending deadlines are also reloaded every DEADLINE_SWEEP_INTERVAL
+# seconds, to pick up rows scheduled by other workers.
+DEADLINE_SWEEP_INTERVAL = config(
+    "DEADLINE_SWEEP_INTERVAL", cast=float, default=300.0
+)
+DEADLINE_BATCH_SIZE = config("DEADLINE_BATCH_SIZE", cast=int, default=500)
+
+# Seconds a response is replayed for a retried Idempotency-Key.
+IDEMPOTENCY_TTL = config("IDEMPOTENCY_TTL", cast=int, default=86400)
+
+# Submissions claimed for grading are held by their grader for
+# GRADING_LEASE seconds, after which other graders may claim them.
+GRADING_LEASE = config("GRADING_LEASE", cast=int, default=900)
+GRADING_CLAIM_SIZE = config("GRADING_CLAIM_SIZE", cast=int, default=20)
+
+# Histogram buckets in the quiz score statistics, and how long computed
+# statistics are kept in Redis at most.
+QUIZ_STATS_BINS = config("QUIZ_STATS_BINS", cast=int, default=10)
+QUIZ_STATS_TTL = config("QUIZ_STATS_TTL", cast=int, default=86400)
@@ -4,6 +4,8 @@ from typing import Callable
 from fastapi import FastAPI
 from tortoise.contrib.fastapi import register_tortoise
 
+from library.database.redis import redis_manager
+
 from config import (
     POSTGRES_USER,
     POSTGRES_PASSWORD,
@@ -60,5 +62,13 @@ async def init_db(app: FastAPI) -> None:
 def create_start_app_handler(app: FastAPI) -> Callable:
     async def start_app() -> None:
         await init_db(app)
+        await redis_manager.connect()
 
     return start_app
+
+
+def create_stop_app_handler(app: FastAPI) -> Callable:
+    async def stop_app() -> None:
+        await redis_manager.close()
+
+    return stop_app
@@ -0,0 +1,73 @@
+import logging
+from typing import Dict
+
+import redis.asyncio as aioredis
+
+from config import (
+    REDIS_HOST,
+    REDIS_PORT,
+    REDIS_POOL_SIZE,
+    REDIS_OTP_DB,
+    REDIS_CACHE_DB,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class RedisManager:
+    """Own one asyncio connection pool per Redis database.
+
+    Pools are opened on application startup and closed on shutdown, so
+    every request shares the same bounded set of connections.
+    """
+
+    def __init__(self, host: str, port: int, pool_size: int, dbs: tuple):
+        self.host = host
+        self.port = port
+        self.pool_size = pool_size
+        self.dbs = dbs
+        self._clients: Dict[int, aioredis.Redis] = {}
+
+    async def connect(self) -> None:
+        """Open a connection pool for every configured database."""
+        for db in self.dbs:
+            if db in self._clients:
+                continue
+            pool = aioredis.BlockingConnectionPool(
+                host=self.host,
+                port=self.port,
+                db=db,
+                max_connections=self.pool_size,
+                decode_responses=True,
+            )
+            self._clients[db] = aioredis.Redis(connection_pool=pool)
+        try:
+            for client in self._clients.values():
+                await client.ping()
+            logger.warning("--- REDIS CONNECTION WAS SUCCESSFUL ---")
+        except Exception as e:
+            logger.warning("--- REDIS CONNECTION ERROR ---")
+            logger.warning(e)
+            logger.warning("--- REDIS CONNECTION ERROR ---")
+
+    def client(self, db: int) -> aioredis.Redis:
+        """Return the client bound to a database."""
+        try:
+            return self._clients[db]
+        except KeyError as e:
+            raise RuntimeError(f"Redis database {db} is not connected.") from e
+
+    async def close(self) -> None:
+        """Close every connection pool."""
+        for client in self._clients.values():
+            await client.close()
+            await client.connection_pool.disconnect()
+        self._clients.clear()
+
+
+redis_manager = RedisManager(
+    host=REDIS_HOST,
+    port=REDIS_PORT,
+    pool_size=REDIS_POOL_SIZE,
+    dbs=(REDIS_OTP_DB, REDIS_CACHE_DB),
+)
@@ -0,0 +1,201 @@
+import struct
+from typing import List
+from uuid import UUID
+
+import numpy as np
+from tortoise import connections
+
+from config import REDIS_CACHE_DB, QUIZ_STATS_BINS, QUIZ_STATS_TTL
+from library.database.redis import redis_manager
+from library.dependencies.pagination import dumps
+
+PERCENTILES = (10, 25, 50, 75, 90)
+
+# A quiz belongs to the cohort of its lesson, not to the current cohort
+# of the student who took it, so promotions do not move scores between
+# cohorts. Quizzes without a lesson belong to no cohort.
+SCORES_SQL = """SELECT q."score", q."lesson_id"
+FROM "quiz" AS q JOIN "lesson" AS l ON l."id" = q."lesson_id"
+WHERE l."cohort_id" = $1 AND q."score" IS NOT NULL"""
+
+# Changes whenever a score in the cohort is added, changed or removed.
+# The sum catches queryset updates, which leave updated_at alone.
+FINGERPRINT_SQL = """SELECT count(*) AS "count", sum(q."score") AS "total",
+    max(q."updated_at") AS "updated_at"
+FROM "quiz" AS q JOIN "lesson" AS l ON l."id" = q."lesson_id"
+WHERE l."cohort_id" = $1 AND q."score" IS NOT NULL"""
+
+# PostgreSQL binary COPY framing: a signature, 32-bit flags and a
+# header extension of the given length, then per row a field count and
+# a length before each field, then a -1 trailer.
+COPY_SIGNATURE = b"PGCOPY\n\xff\r\n\x00"
+COPY_HEADER = struct.Struct(f">{len(COPY_SIGNATURE)}sII")
+# Flag bit set when each row carries an OID.
+COPY_WITH_OIDS = 1 << 16
+COPY_TRAILER = b"\xff\xff"
+ROW = np.dtype(
+    [
+        ("fields", ">i2"),
+        ("score_size", ">i4"),
+        ("score", ">f8"),
+        ("lesson_size", ">i4"),
+        ("lesson", "V16"),
+    ]
+)
+
+
+class ScoreReader:
+    """Decode a binary COPY of (score, lesson_id) rows into NumPy arrays
+
+    Called with each chunk of the stream as it arrives. Every row has
+    the same width, so each chunk is read with a single `frombuffer`
+    and only a partial row is carried over to the next chunk.
+    """
+
+    def __init__(self):
+        self.pending = b""
+        self.header = True
+        self.chunks: List[np.ndarray] = []
+
+    async def __call__(self, data: bytes) -> None:
+        buffer = self.pending + data
+        if self.header:
+            if len(buffer) < COPY_HEADER.size:
+                self.pending = buffer
+                return
+            signature, flags, extension = COPY_HEADER.unpack_from(buffer)
+            if signature != COPY_SIGNATURE:
+                raise ValueError("Not a binary COPY stream.")
+            if flags & COPY_WITH_OIDS:
+                raise ValueError("Binary COPY rows with OIDs are not read.")
+            start = COPY_HEADER.size + extension
+            if len(buffer) < start:
+                self.pending = buffer
+                return
+            buffer = buffer[start:]
+            self.header = False
+        end = len(buffer) // ROW.itemsize * ROW.itemsize
+        if end:
+            self.chunks.append(np.frombuffer(buffer[:end], dtype=ROW))
+        self.pending = buffer[end:]
+
+    def arrays(self):
+        """Return the scores and the 16-byte lesson ids read."""
+        if self.pending != COPY_TRAILER:
+            raise ValueError("Incomplete binary COPY stream.")
+        rows = np.concatenate(self.chunks) if self.chunks else np.empty(0, ROW)
+        return rows["score"].astype(np.float64), rows["lesson"]
+
+
+async def load_scores(cohort_id: int):
+    """Stream the quiz scores of a cohort into arrays."""
+    reader = ScoreReader()
+    async with connections.get("default").acquire_connection() as raw:
+        await raw.copy_from_query(
+            SCORES_SQL, cohort_id, output=reader, format="binary"
+        )
+    return reader.arrays()
+
+
+def score_stats(
+    scores: np.ndarray, lessons: np.ndarray, bins: int = QUIZ_STATS_BINS
+) -> dict:
+    """Summarise scores and rank lessons by difficulty.
+
+    A lesson's difficulty is how many standard deviations its mean score
+    sits below the cohort mean, so harder lessons score higher.
+    """
+    if not scores.size:
+        return {"count": 0}
+    mean, std = scores.mean(), scores.std()
+    counts, edges = np.histogram(scores, bins=bins)
+
+    # Group by lesson: 16-byte ids compare as pairs of 64-bit integers.
+    keys, codes = np.unique(
+        np.ascontiguousarray(lessons).view(">u8").reshape(-1, 2),
+        axis=0,
+        return_inverse=True,
+    )
+    codes = codes.reshape(-1)
+    attempts = np.bincount(codes)
+    lesson_means = np.bincount(codes, weights=scores) / attempts
+    if std:
+        difficulty = (mean - lesson_means) / std
+    else:
+        difficulty = np.zeros_like(lesson_means)
+    order = np.argsort(-difficulty, kind="stable")
+
+    lesson_ids = [UUID(bytes=key.tobytes()) for key in keys]
+    return {
+        "count": int(scores.size),
+        "mean": float(mean),
+        "std": float(std),
+        "min": float(scores.min()),
+        "max": float(scores.max()),
+        "percentiles": dict(
+            zip(
+                map(str, PERCENTILES),
+                np.percentile(scores, PERCENTILES).tolist(),
+            )
+        ),
+        "histogram": {"edges": edges.tolist(), "counts": counts.tolist()},
+        "lessons": [
+            {
+                "lesson_id": lesson_ids[i],
+                "attempts": int(attempts[i]),
+                "mean": float(lesson_means[i]),
+                "difficulty": float(difficulty[i]),
+            }
+            for i in order
+        ],
+    }
+
+
+class QuizStats:
+    """Quiz score statistics per cohort, cached until the scores change
+
+    Each request costs one aggregate query for the cohort's fingerprint
+    (score count, sum and latest update). The statistics are only recomputed,
+    and the scores only transferred, when the fingerprint has moved.
+    """
+
+    prefix = "quiz-stats:"
+
+    def __init__(self, ttl: int):
+        self.ttl = ttl
+
+    @staticmethod
+    def redis():
+        return redis_manager.client(REDIS_CACHE_DB)
+
+    async def fingerprint(self, cohort_id: int) -> str:
+        rows = await connections.get("default").execute_query_dict(
+            FINGERPRINT_SQL, [cohort_id]
+        )
+        row = rows[0]
+        return f"{row['count']}|{row['total']}|{row['updated_at']}"
+
+    async def get(self, cohort_id: int) -> bytes:
+        """Return the rendered statistics of a cohort."""
+        key = f"{self.prefix}{cohort_id}"
+        fingerprint = await self.fingerprint(cohort_id)
+        cached = await self.redis().hmget(key, "fingerprint", "body")
+        if cached[0] == fingerprint:
+            return cached[1].encode("utf-8")
+        body = dumps(
+            {
+                "cohort_id": cohort_id,
+                **score_stats(*await load_scores(cohort_id)),
+            }
+        )
+        async with self.redis().pipeline(transaction=True) as pipe:
+            pipe.hset(
+                key,
+                mapping={"fingerprint": fingerprint, "body": body.decode()},
+            )
+            pipe.expire(key, self.ttl)
+            await pipe.execute()
+        return body
+
+
+quiz_stats = QuizStats(ttl=QUIZ_STATS_TTL)
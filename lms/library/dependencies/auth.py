@@ -1,4 +1,7 @@
+import asyncio
+import logging
 from datetime import datetime, timezone
+from typing import Optional, Tuple
 
 from jose import jwt, JWTError
 from pydantic import ValidationError
@@ -7,35 +10,137 @@ from fastapi.security import (
     OAuth2PasswordBearer,
     SecurityScopes,
 )
-from library.schemas.auth import JWTSchema
-from config import SECRET_KEY, ALGORITHM
+from library.schemas.auth import TokenClaims, Principal
+from library.security.tokens import ACCESS, token_state
+from library.database.redis import redis_manager
+from library.dependencies.cache import TTLCache
+from library.jobs.activity import activity_tracker
+from config import (
+    SECRET_KEY,
+    ALGORITHM,
+    AUTH_CACHE_TTL,
+    AUTH_CACHE_SIZE,
+    REDIS_CACHE_DB,
+)
 from models.user import User
 
+logger = logging.getLogger(__name__)
+
 
 oauth2_scheme = OAuth2PasswordBearer(
     tokenUrl="/auth/login/",
     scopes={"base": "For ordinary users", "root": "For super users"},
 )
 
+# Decoded token payloads, keyed by the raw token.
+token_cache = TTLCache(maxsize=AUTH_CACHE_SIZE, ttl=AUTH_CACHE_TTL)
+# Authenticated user rows, keyed by the stringified user id.
+user_cache = TTLCache(maxsize=AUTH_CACHE_SIZE, ttl=AUTH_CACHE_TTL)
 
-async def get_current_user(
-    security_scopes: SecurityScopes, token: str = Depends(oauth2_scheme)
-):
+
+class UserCacheListener:
+    """Applies user invalidations published by other workers
+
+    `invalidate_user` drops the local entry and publishes the ids on
+    `channel`; every worker drops its own entries on receipt.
+    """
+
+    channel = "user-invalidate"
+
+    def __init__(self):
+        self._listener: Optional[asyncio.Task] = None
+
+    @staticmethod
+    def redis():
+        return redis_manager.client(REDIS_CACHE_DB)
+
+    async def _listen(self) -> None:
+        while True:
+            pubsub = None
+            try:
+                pubsub = self.redis().pubsub()
+                await pubsub.subscribe(self.channel)
+                async for message in pubsub.listen():
+                    if message.get("type") == "message":
+                        for user_id in message["data"].split():
+                            user_cache.invalidate(user_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # Invalidations may have been missed while disconnected.
+                logger.warning("User cache listener error: %s", e)
+                user_cache.clear()
+                await asyncio.sleep(1)
+            finally:
+                if pubsub is not None:
+                    await pubsub.close()
+
+    async def start(self) -> None:
+        """Start listening for invalidations from other workers."""
+        if self._listener is None:
+            self._listener = asyncio.create_task(self._listen())
+
+    async def stop(self) -> None:
+        """Stop the invalidation listener."""
+        if self._listener is not None:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+            self._listener = None
+        user_cache.clear()
+
+
+user_cache_listener = UserCacheListener()
+
+
+async def invalidate_user(*user_ids) -> None:
+    """Drop cached users on every worker so their next request reloads."""
+    user_ids = [str(user_id) for user_id in user_ids]
+    for user_id in user_ids:
+        user_cache.invalidate(user_id)
+    if user_ids:
+        await user_cache_listener.redis().publish(
+            UserCacheListener.channel, " ".join(user_ids)
+        )
+
+
+async def decode_token(token: str) -> TokenClaims:
+    """Decode a bearer token and check expiry and revocation.
+
+    Refresh and password reset tokens are rejected here; they are only
+    accepted by their own routes.
+    """
+    token_data, _ = await _decode(token)
+    return token_data
+
+
+async def _decode(token: str) -> Tuple[TokenClaims, bool]:
+    """Decode a bearer token, also returning whether its claims are stale."""
     auth_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Your auth token is invalid.",
     )
-    try:
-        payload = jwt.decode(token, str(SECRET_KEY), algorithms=[ALGORITHM])
-        user_id = payload.get("user_id")
-        expire = payload.get("expire")
+    token_data = token_cache.get(token)
+    if token_data is None:
+        try:
+            payload = jwt.decode(
+                token, str(SECRET_KEY), algorithms=[ALGORITHM]
+            )
+            user_id = payload.get("user_id")
+            expire = payload.get("expire")
+
+            token_data = TokenClaims(**payload)
 
-        token_data = JWTSchema(user_id=user_id, expire=expire)
+            if user_id is None or expire is None:
+                raise auth_exception
+        except (JWTError, ValidationError) as e:
+            raise auth_exception from e
+        token_cache.set(token, token_data)
 
-        if user_id is None or expire is None:
-            raise auth_exception
-    except (JWTError, ValidationError) as e:
-        raise auth_exception from e
+    if token_data.type not in (None, ACCESS):
+        raise auth_exception
 
     # Check expiration.
     if datetime.now(timezone.utc) > token_data.expire:
@@ -44,11 +149,57 @@ async def get_current_user(
             detail="Your token has expired. Please login.",
         )
 
-    user = await User.get_or_none(id=token_data.user_id)
-    if user is None:
+    revoked, stale = await token_state(token_data)
+    if revoked:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="This user does not exist.",
+            detail="Your token has been revoked. Please login.",
         )
+    return token_data, stale
+
 
+async def load_user(user_id: str) -> User:
+    """Return the user for a token, reading through the user cache."""
+    user = user_cache.get(user_id)
+    if user is None:
+        user = await User.get_or_none(id=user_id)
+        if user is None:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="This user does not exist.",
+            )
+        user_cache.set(user_id, user)
     return user
+
+
+async def get_current_user(
+    security_scopes: SecurityScopes, token: str = Depends(oauth2_scheme)
+):
+    token_data = await decode_token(token)
+    await activity_tracker.touch(token_data.user_id)
+    return await load_user(token_data.user_id)
+
+
+async def get_current_principal(
+    security_scopes: SecurityScopes, token: str = Depends(oauth2_scheme)
+):
+    """Lightweight auth dependency for read-only routes
+
+    Access tokens carry the role and cohort claims, so no user query is
+    made. Tokens issued without claims, before cohorts were keyed by id,
+    or before the user's claims last changed (see `expire_user_claims`)
+    fall back to loading the user.
+    """
+    token_data, stale = await _decode(token)
+    await activity_tracker.touch(token_data.user_id)
+    if stale or token_data.type != ACCESS or token_data.cohort_id is None:
+        return await load_user(token_data.user_id)
+    return Principal(
+        id=token_data.user_id,
+        is_admin=token_data.is_admin,
+        stage=token_data.stage,
+        stack=token_data.stack,
+        track=token_data.track,
+        proficiency=token_data.proficiency,
+        cohort_id=token_data.cohort_id,
+    )
@@ -0,0 +1,240 @@
+import asyncio
+import hashlib
+import logging
+import time
+from typing import Awaitable, Callable, Dict, List, Optional, Union
+
+from fastapi import Request, Response, status
+from redis.exceptions import WatchError
+
+from config import REDIS_CACHE_DB, FEED_CACHE_SIZE, FEED_CACHE_TTL
+from library.database.redis import redis_manager
+from library.dependencies.cache import TTLCache
+from library.dependencies.pagination import CursorParams, dumps, render
+from library.dependencies.utils import get_queryset
+
+logger = logging.getLogger(__name__)
+
+
+class FeedCache:
+    """Two-tier cache of cohort feed pages
+
+    Every student in a cohort gets the same lessons, resources and tasks,
+    so pages are cached per (feed, cohort). Each cohort key holds all of
+    its cached pages: a local LRU entry and a Redis hash. Invalidating a
+    cohort drops both and is broadcast to the other workers over Redis
+    pub/sub.
+
+    Every feed key also has a version counter, bumped on invalidation,
+    from which strong ETags are derived without loading any rows.
+    """
+
+    channel = "feed-invalidate"
+
+    def __init__(self, maxsize: int, ttl: int):
+        self.ttl = ttl
+        self.local = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._listener: Optional[asyncio.Task] = None
+
+    @staticmethod
+    def redis():
+        return redis_manager.client(REDIS_CACHE_DB)
+
+    @staticmethod
+    def key(feed: str, cohort) -> str:
+        """Return the cache key of a cohort feed.
+
+        `cohort` is anything with the cohort attributes: a user, a
+        principal or a content row.
+        """
+        values = get_queryset(cohort).values()
+        return ":".join(
+            ["feed", feed, *(str(getattr(v, "value", v)) for v in values)]
+        )
+
+    @staticmethod
+    def all_key(feed: str) -> str:
+        """Return the key of a feed across every cohort (admin listing)."""
+        return f"feed:{feed}:all"
+
+    @staticmethod
+    def general_key(feed: str) -> str:
+        """Return the key of the rows of a feed shown to every cohort."""
+        return f"feed:{feed}:general"
+
+    async def versions(self, keys: List[str]) -> List[str]:
+        """Return the current version of each feed key.
+
+        Missing counters are seeded with the current time rather than
+        zero, so a counter lost from Redis never repeats an old ETag.
+        """
+        version_keys = [f"version:{key}" for key in keys]
+        values = await self.redis().mget(version_keys)
+        if None in values:
+            seed = time.time_ns()
+            async with self.redis().pipeline(transaction=False) as pipe:
+                for version_key, value in zip(version_keys, values):
+                    if value is None:
+                        pipe.set(version_key, seed, nx=True)
+                await pipe.execute()
+            values = await self.redis().mget(version_keys)
+        return values
+
+    async def etag(self, keys: List[str], params: CursorParams) -> str:
+        """Return a strong ETag for one page of the given feeds."""
+        versions = await self.versions(keys)
+        raw = "|".join(
+            [*keys, *versions, params.cursor or "", str(params.limit)]
+        )
+        return f'"{hashlib.sha1(raw.encode("utf-8")).hexdigest()}"'
+
+    async def conditional(
+        self,
+        request: Request,
+        keys: List[str],
+        params: CursorParams,
+        loader: Callable[[], Awaitable[Union[dict, bytes]]],
+    ) -> Response:
+        """Answer 304 if the client's copy is current, else load the page.
+
+        The version is read before the page is loaded, so a page can be
+        newer than its ETag but never older.
+        """
+        etag = await self.etag(keys, params)
+        if_none_match = request.headers.get("if-none-match", "")
+        client_etags = {tag.strip() for tag in if_none_match.split(",")}
+        if etag in client_etags or "*" in client_etags:
+            return Response(
+                status_code=status.HTTP_304_NOT_MODIFIED,
+                headers={"ETag": etag},
+            )
+        return render(await loader(), headers={"ETag": etag})
+
+    async def fetch(
+        self,
+        key: str,
+        params: CursorParams,
+        loader: Callable[[], Awaitable[dict]],
+    ) -> bytes:
+        """Return a cached rendered page, loading it on a miss.
+
+        Pages are cached without their `next` link, which is rebuilt from
+        `params` for each request. A loaded page is only cached if the
+        feed's version has not moved since before the load, so a page
+        read before an invalidation is never stored after it.
+        """
+        page_key = f"{params.cursor or ''}:{params.limit}"
+        cursor_key = f"{page_key}:next"
+        pages = self.local.get(key)
+        if pages is not None and page_key in pages:
+            return params.with_next(*pages[page_key])
+
+        version_key = f"version:{key}"
+        async with self.redis().pipeline(transaction=False) as pipe:
+            pipe.hmget(key, page_key, cursor_key)
+            pipe.get(version_key)
+            (body, next_cursor), version = await pipe.execute()
+        if body is not None:
+            entry = (body.encode("utf-8"), next_cursor or None)
+        else:
+            page = await loader()
+            entry = (
+                dumps({k: v for k, v in page.items() if k != "next"}),
+                page["next_cursor"],
+            )
+            stored = await self._store(
+                key,
+                version_key,
+                version,
+                {page_key: entry[0], cursor_key: entry[1] or ""},
+            )
+            if not stored:
+                return params.with_next(*entry)
+
+        pages = self.local.get(key)
+        if pages is None:
+            pages = {}
+            self.local.set(key, pages)
+        pages[page_key] = entry
+        return params.with_next(*entry)
+
+    async def _store(
+        self,
+        key: str,
+        version_key: str,
+        version: Optional[str],
+        mapping: Dict[str, bytes],
+    ) -> bool:
+        """Add pages to a cohort hash unless the feed has moved on.
+
+        The hash gets its TTL only when it is created, so pages added
+        later expire with it instead of extending it.
+        """
+        async with self.redis().pipeline(transaction=True) as pipe:
+            try:
+                await pipe.watch(key, version_key)
+                if await pipe.get(version_key) != version:
+                    return False
+                created = not await pipe.exists(key)
+                pipe.multi()
+                pipe.hset(key, mapping=mapping)
+                if created:
+                    pipe.expire(key, self.ttl)
+                await pipe.execute()
+            except WatchError:
+                # Invalidated, or written by another request, meanwhile.
+                return False
+        return True
+
+    async def invalidate(self, key: str) -> None:
+        """Drop every cached page of a cohort feed on all workers.
+
+        Also bumps the versions of the feed and of its admin listing.
+        """
+        self.local.invalidate(key)
+        feed = key.split(":")[1]
+        async with self.redis().pipeline(transaction=True) as pipe:
+            pipe.delete(key)
+            pipe.incr(f"version:{key}")
+            pipe.incr(f"version:{self.all_key(feed)}")
+            pipe.publish(self.channel, key)
+            await pipe.execute()
+
+    async def _listen(self) -> None:
+        while True:
+            pubsub = None
+            try:
+                pubsub = self.redis().pubsub()
+                await pubsub.subscribe(self.channel)
+                async for message in pubsub.listen():
+                    if message.get("type") == "message":
+                        self.local.invalidate(message["data"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # Invalidations may have been missed while disconnected.
+                logger.warning("Feed cache listener error: %s", e)
+                self.local.clear()
+                await asyncio.sleep(1)
+            finally:
+                if pubsub is not None:
+                    await pubsub.close()
+
+    async def start(self) -> None:
+        """Start listening for invalidations from other workers."""
+        if self._listener is None:
+            self._listener = asyncio.create_task(self._listen())
+
+    async def stop(self) -> None:
+        """Stop the invalidation listener."""
+        if self._listener is not None:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+            self._listener = None
+        self.local.clear()
+
+
+feed_cache = FeedCache(maxsize=FEED_CACHE_SIZE, ttl=FEED_CACHE_TTL)
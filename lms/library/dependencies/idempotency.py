@@ -0,0 +1,65 @@
+from typing import Optional
+
+from fastapi import HTTPException, status
+
+from config import REDIS_CACHE_DB, IDEMPOTENCY_TTL
+from library.database.redis import redis_manager
+
+# Stored while the first request with a key is still being handled. It
+# expires after PENDING_TTL seconds in case that request never finishes.
+PENDING = ""
+PENDING_TTL = 60
+
+
+class Idempotency:
+    """Replay the response to a request retried with an Idempotency-Key
+
+    The first request claims the key in Redis before doing any work and
+    stores its response body there once it succeeds. Retries with the
+    same key get that body back without touching Postgres. A request that
+    fails releases its key, so the client can retry it.
+    """
+
+    prefix = "idempotency:"
+
+    def __init__(self, ttl: int):
+        self.ttl = ttl
+
+    @staticmethod
+    def redis():
+        return redis_manager.client(REDIS_CACHE_DB)
+
+    def key(self, user_id, scope: str, idempotency_key: str) -> str:
+        """Keys are per user and per route, so they cannot collide."""
+        return f"{self.prefix}{user_id}:{scope}:{idempotency_key}"
+
+    async def claim(self, key: str) -> Optional[bytes]:
+        """Claim a key. Returns the stored body if it was already used.
+
+        Raises:
+            HTTP_409_CONFLICT if a request with the key is in progress
+        """
+        redis = self.redis()
+        if await redis.set(key, PENDING, ex=PENDING_TTL, nx=True):
+            return None
+        body = await redis.get(key)
+        if body is None:
+            # Released between the two calls; the retry takes it over.
+            return await self.claim(key)
+        if body == PENDING:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="A request with this Idempotency-Key is in progress.",
+            )
+        return body.encode("utf-8")
+
+    async def store(self, key: str, body: bytes) -> None:
+        """Store the response body of a claimed key."""
+        await self.redis().set(key, body.decode("utf-8"), ex=self.ttl)
+
+    async def release(self, key: str) -> None:
+        """Release a claimed key after the request failed."""
+        await self.redis().delete(key)
+
+
+idempotency = Idempotency(ttl=IDEMPOTENCY_TTL)
@@ -0,0 +1,149 @@
+import codecs
+import csv
+import io
+import time
+from typing import AsyncIterator, List, Optional, Tuple
+
+import orjson
+from fastapi import Request, UploadFile
+from pydantic import ValidationError
+
+from config import IMPORT_CHUNK_SIZE
+
+# Bytes read from an upload at a time.
+READ_SIZE = 64 * 1024
+
+
+class ImportReport:
+    """Per-row outcome and throughput of a bulk import"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.rows = 0
+        self.created = 0
+        self.errors: List[dict] = []
+
+    def error(self, row: int, error) -> None:
+        """Record why a row was not imported."""
+        if isinstance(error, ValidationError):
+            error = "; ".join(
+                f"{'.'.join(str(loc) for loc in e['loc'])}: {e['msg']}"
+                for e in error.errors()
+            )
+        self.errors.append({"row": row, "error": str(error)})
+
+    def result(self) -> dict:
+        seconds = time.perf_counter() - self.started
+        return {
+            "rows": self.rows,
+            "created": self.created,
+            "failed": len(self.errors),
+            "errors": self.errors,
+            "seconds": round(seconds, 3),
+            "rows_per_second": round(self.rows / seconds, 1)
+            if seconds
+            else None,
+        }
+
+
+def _complete_records(text: str) -> Tuple[str, str]:
+    """Split text after its last line that ends outside a quoted field.
+
+    Quotes inside a field are doubled, so a line ends inside a quoted
+    field exactly when an odd number of quotes precede it.
+    """
+    cut = start = quotes = 0
+    while True:
+        end = text.find("\n", start)
+        if end < 0:
+            return text[:cut], text[cut:]
+        quotes += text.count('"', start, end)
+        start = end + 1
+        if quotes % 2 == 0:
+            cut = start
+
+
+async def read_csv(
+    upload: UploadFile,
+    chunk_size: int = IMPORT_CHUNK_SIZE,
+    read_size: int = READ_SIZE,
+) -> AsyncIterator[List[Tuple[int, dict]]]:
+    """Yield numbered rows of an uploaded CSV, `chunk_size` at a time.
+
+    The upload is read and decoded `read_size` bytes at a time, so the
+    file is never held in memory whole. Only complete records are parsed;
+    a record cut off by a read waits for the next one. Empty cells are
+    read as missing values. Rows are numbered from 1, after the header.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    header = None
+    pending = ""
+    number = 0
+    chunk = []
+    while True:
+        data = await upload.read(read_size)
+        text = pending + decoder.decode(data, final=not data)
+        if data:
+            text, pending = _complete_records(text)
+        for values in csv.reader(io.StringIO(text, newline="")):
+            if not values:
+                continue
+            if header is None:
+                header = [key.strip() for key in values]
+                continue
+            number += 1
+            chunk.append(
+                (
+                    number,
+                    {
+                        key: value.strip()
+                        for key, value in zip(header, values)
+                        if key and value.strip()
+                    },
+                )
+            )
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+        if not data:
+            break
+    if chunk:
+        yield chunk
+
+
+def _parse_line(line: bytes) -> Tuple[Optional[dict], Optional[str]]:
+    try:
+        row = orjson.loads(line)
+    except orjson.JSONDecodeError as e:
+        return None, f"Invalid JSON: {e}"
+    if not isinstance(row, dict):
+        return None, "Each line must be a JSON object"
+    return row, None
+
+
+async def read_jsonl(
+    request: Request, chunk_size: int = IMPORT_CHUNK_SIZE
+) -> AsyncIterator[List[Tuple[int, Optional[dict], Optional[str]]]]:
+    """Yield numbered rows of a JSON-lines request body in chunks.
+
+    The body is parsed as it arrives, so it is never held in memory
+    whole. Each item is (line number, row, error); a line that is not a
+    JSON object has no row and an error instead. Blank lines are skipped.
+    """
+    buffer = b""
+    number = 0
+    chunk = []
+    async for data in request.stream():
+        buffer += data
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            number += 1
+            if line.strip():
+                chunk.append((number, *_parse_line(line)))
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+    if buffer.strip():
+        chunk.append((number + 1, *_parse_line(buffer)))
+    if chunk:
+        yield chunk
@@ -0,0 +1,50 @@
+from typing import Dict, Iterable, List, Optional
+
+from models.user import User
+
+
+class CreatorLoader:
+    """Request-scoped batch loader for content creators
+
+    Collects every creator id referenced by a response and resolves them
+    with a single `id__in` query, so listing N rows costs one user query
+    instead of N. Resolved creators are remembered for the rest of the
+    request.
+
+    Use as a dependency: `loader: CreatorLoader = Depends()`.
+    """
+
+    fields = ("id", "first_name", "surname", "is_admin")
+
+    def __init__(self):
+        self._creators: Dict[str, Optional[dict]] = {}
+
+    async def load_many(self, ids: Iterable) -> Dict[str, Optional[dict]]:
+        """Return creators by id, querying only those not yet loaded."""
+        wanted = {str(i) for i in ids if i is not None}
+        missing = wanted - self._creators.keys()
+        if missing:
+            for creator in await User.filter(id__in=missing).values(
+                *self.fields
+            ):
+                self._creators[str(creator["id"])] = creator
+            for creator_id in missing - self._creators.keys():
+                self._creators[creator_id] = None
+        return {i: self._creators[i] for i in wanted}
+
+    async def load(self, creator_id) -> Optional[dict]:
+        """Return a single creator."""
+        if creator_id is None:
+            return None
+        return (await self.load_many([creator_id]))[str(creator_id)]
+
+    async def attach(self, rows: List) -> List[dict]:
+        """Return rows as dicts with their creator under `creator`."""
+        rows = [row if isinstance(row, dict) else dict(row) for row in rows]
+        creators = await self.load_many(row.get("creator_id") for row in rows)
+        for row in rows:
+            creator_id = row.get("creator_id")
+            row["creator"] = (
+                creators[str(creator_id)] if creator_id is not None else None
+            )
+        return rows
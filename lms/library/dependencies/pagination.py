@@ -0,0 +1,144 @@
+import base64
+from datetime import datetime
+from typing import List, Optional, Tuple, Type, Union
+from uuid import UUID
+
+import orjson
+from fastapi import HTTPException, Query, Request, Response, status
+from pydantic import BaseModel
+from tortoise.expressions import Q
+from tortoise.queryset import QuerySet
+
+from config import PAGE_SIZE, MAX_PAGE_SIZE
+from library.dependencies.loaders import CreatorLoader
+
+
+def encode_cursor(created_at: datetime, row_id) -> str:
+    """Encode the sort key of a row as an opaque cursor."""
+    raw = f"{created_at.isoformat()}|{row_id}".encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("utf-8")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, UUID]:
+    """Decode a cursor back into its (created_at, id) sort key."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode("utf-8"))
+        created_at, row_id = raw.decode("utf-8").split("|")
+        return datetime.fromisoformat(created_at), UUID(row_id)
+    except ValueError as e:
+        raise HTTPException(
+            detail="Invalid pagination cursor",
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+        ) from e
+
+
+class CursorParams:
+    """Query parameters for keyset pagination
+
+    Pages are ordered newest first on (created_at, id). The cursor marks
+    the last row of the previous page, so every page is an index range
+    scan rather than an OFFSET scan.
+    """
+
+    def __init__(
+        self,
+        request: Request,
+        cursor: Optional[str] = Query(None),
+        limit: int = Query(PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    ):
+        self.url = request.url
+        self.cursor = cursor
+        self.limit = limit
+        self.after = decode_cursor(cursor) if cursor else None
+
+    def apply(self, queryset: QuerySet) -> QuerySet:
+        """Restrict a queryset to the rows of the requested page."""
+        if self.after is not None:
+            created_at, row_id = self.after
+            # The first predicate bounds the index range, the second
+            # breaks ties between rows created at the same instant.
+            queryset = queryset.filter(
+                Q(created_at__lte=created_at),
+                Q(created_at__lt=created_at) | Q(id__lt=row_id),
+            )
+        return queryset.order_by("-created_at", "-id").limit(self.limit + 1)
+
+    def page(self, rows: List[dict]) -> dict:
+        """Build the response body from up to limit + 1 fetched rows."""
+        next_cursor = None
+        if len(rows) > self.limit:
+            rows = rows[: self.limit]
+            last = rows[-1]
+            next_cursor = encode_cursor(last["created_at"], last["id"])
+        return {
+            "results": rows,
+            "next_cursor": next_cursor,
+            "next": self.next_url(next_cursor),
+        }
+
+    def next_url(self, next_cursor: Optional[str]) -> Optional[str]:
+        """Return the link to the page after `next_cursor`, if any."""
+        if not next_cursor:
+            return None
+        return str(self.url.include_query_params(cursor=next_cursor))
+
+    def with_next(self, body: bytes, next_cursor: Optional[str]) -> bytes:
+        """Append this request's `next` link to a page rendered without it.
+
+        The link depends on the URL of the request, so shared cached
+        pages leave it out and get it back here.
+        """
+        next_url = dumps(self.next_url(next_cursor))
+        return body[:-1] + b',"next":' + next_url + b"}"
+
+
+def page_fields(schema: Type[BaseModel]) -> List[str]:
+    """Return the columns to select for rows of a response schema.
+
+    `creator` is not a column: the loader attaches it from `creator_id`.
+    """
+    return [
+        "creator_id" if name == "creator" else name
+        for name in schema.__fields__
+    ]
+
+
+async def paginate(
+    queryset: QuerySet,
+    params: CursorParams,
+    schema: Type[BaseModel],
+    loader: Optional[CreatorLoader] = None,
+) -> dict:
+    """Fetch one page of a queryset, attaching creators if given a loader.
+
+    Rows are selected with `.values()` on the fields of `schema` only, so
+    no model instances are built and unused columns are not read.
+    """
+    rows = await params.apply(queryset).values(*page_fields(schema))
+    page = params.page(rows)
+    if loader is not None:
+        page["results"] = await loader.attach(page["results"])
+        for row in page["results"]:
+            del row["creator_id"]
+    return page
+
+
+def dumps(content) -> bytes:
+    """Encode content to JSON bytes.
+
+    asyncpg hands back its own UUID type, which orjson does not know, so
+    anything unrecognised is encoded as its string form.
+    """
+    return orjson.dumps(content, default=str)
+
+
+def render(content: Union[dict, bytes], **kwargs) -> Response:
+    """Render a page straight to a JSON response.
+
+    orjson encodes UUIDs, datetimes and enums natively, which skips
+    FastAPI's per-field `jsonable_encoder` pass. Already rendered bytes
+    are sent as they are.
+    """
+    if not isinstance(content, bytes):
+        content = dumps(content)
+    return Response(content, media_type="application/json", **kwargs)
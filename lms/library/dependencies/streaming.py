@@ -0,0 +1,68 @@
+from typing import AsyncIterator
+
+from fastapi import Query
+from fastapi.responses import StreamingResponse
+from tortoise.queryset import QuerySet
+from tortoise.transactions import in_transaction
+
+from config import EXPORT_CHUNK_SIZE
+from library.dependencies.pagination import dumps
+
+NDJSON = "ndjson"
+JSON = "json"
+
+
+class ExportParams:
+    """Query parameters for streamed exports
+
+    `format=json` streams a single JSON array, `format=ndjson` one JSON
+    object per line.
+    """
+
+    def __init__(
+        self, format: str = Query(JSON, regex=f"^({JSON}|{NDJSON})$")
+    ):
+        self.format = format
+
+
+async def stream_rows(
+    queryset: QuerySet, chunk_size: int = EXPORT_CHUNK_SIZE
+) -> AsyncIterator[dict]:
+    """Yield the rows of a queryset from a server-side cursor.
+
+    Rows are fetched `chunk_size` at a time, so memory use does not grow
+    with the size of the table. Server-side cursors only live inside a
+    transaction, which is held open until the last row is read.
+    """
+    sql = queryset.order_by("-created_at", "-id").values().sql()
+    async with in_transaction() as connection:
+        async with connection.acquire_connection() as raw:
+            async for record in raw.cursor(sql, prefetch=chunk_size):
+                yield dict(record)
+
+
+async def _encode(rows: AsyncIterator[dict], format: str):
+    if format == NDJSON:
+        async for row in rows:
+            yield dumps(row) + b"\n"
+        return
+    yield b"["
+    separator = b""
+    async for row in rows:
+        yield separator + dumps(row)
+        separator = b","
+    yield b"]"
+
+
+def stream_response(
+    queryset: QuerySet, params: ExportParams
+) -> StreamingResponse:
+    """Stream every row of a queryset as a JSON array or NDJSON."""
+    media_type = (
+        "application/x-ndjson"
+        if params.format == NDJSON
+        else "application/json"
+    )
+    return StreamingResponse(
+        _encode(stream_rows(queryset), params.format), media_type=media_type
+    )
@@ -43,9 +43,4 @@ def to_lower_case(data: str):
 
 
 def get_queryset(user):
-    return {
-        "stage": user.stage,
-        "stack": user.stack,
-        "track": user.track,
-        "proficiency": user.proficiency,
-    }
+    return {"cohort_id": user.cohort_id}
@@ -0,0 +1,137 @@
+import asyncio
+import logging
+import time
+from datetime import datetime, timezone
+from typing import Dict, Optional
+from uuid import UUID
+
+from tortoise import connections
+
+from config import (
+    REDIS_CACHE_DB,
+    ACTIVITY_FLUSH_INTERVAL,
+    ACTIVITY_BATCH_SIZE,
+)
+from library.database.redis import redis_manager
+from library.dependencies.cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+FLUSH_SQL = """
+UPDATE "user" AS u SET "last_active" = v.ts
+FROM unnest($1::uuid[], $2::timestamptz[]) AS v(id, ts)
+WHERE u."id" = v.id AND u."last_active" < v.ts
+"""
+
+
+class ActivityTracker:
+    """Write-behind tracking of user.last_active
+
+    Authenticated requests record the time in a Redis hash (user id to
+    Unix time). A background task swaps the hash out every `interval`
+    seconds and writes it with batched UPDATEs, so each user costs at
+    most one row write per interval whatever their request rate. Each
+    worker also skips Redis for users it recorded within the interval.
+    """
+
+    key = "activity"
+
+    def __init__(self, interval: float, batch_size: int):
+        self.interval = interval
+        self.batch_size = batch_size
+        self.recent = TTLCache(maxsize=10_000, ttl=interval)
+        self._task: Optional[asyncio.Task] = None
+
+    @staticmethod
+    def redis():
+        return redis_manager.client(REDIS_CACHE_DB)
+
+    async def touch(self, user_id) -> None:
+        """Record that a user is active now."""
+        user_id = str(user_id)
+        if self.recent.get(user_id) is not None:
+            return
+        self.recent.set(user_id, True)
+        try:
+            await self.redis().hset(self.key, user_id, time.time())
+        except Exception as e:
+            # Activity is best effort; never fail the request over it.
+            logger.warning("Activity tracking error: %s", e)
+
+    async def pending(self) -> Dict[str, float]:
+        """Return activity recorded but not yet written to Postgres."""
+        return {
+            user_id: float(ts)
+            for user_id, ts in (await self.redis().hgetall(self.key)).items()
+        }
+
+    async def flush(self) -> int:
+        """Write pending activity to Postgres. Returns the users written.
+
+        The hash is read and deleted atomically, so workers flushing at
+        the same time never write an entry twice.
+        """
+        async with self.redis().pipeline(transaction=True) as pipe:
+            pipe.hgetall(self.key)
+            pipe.delete(self.key)
+            entries, _ = await pipe.execute()
+        if not entries:
+            return 0
+        items = list(entries.items())
+        conn = connections.get("default")
+        try:
+            for start in range(0, len(items), self.batch_size):
+                end = start + self.batch_size
+                batch = items[start:end]
+                await conn.execute_query(
+                    FLUSH_SQL,
+                    [
+                        [UUID(user_id) for user_id, _ in batch],
+                        [
+                            datetime.fromtimestamp(float(ts), timezone.utc)
+                            for _, ts in batch
+                        ],
+                    ],
+                )
+        except Exception:
+            # Put the entries back, without overwriting newer activity.
+            async with self.redis().pipeline(transaction=False) as pipe:
+                for user_id, ts in items:
+                    pipe.hsetnx(self.key, user_id, ts)
+                await pipe.execute()
+            raise
+        return len(items)
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.flush()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("Activity flush error: %s", e)
+
+    async def start(self) -> None:
+        """Start the periodic flush."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the periodic flush and write what is pending."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        try:
+            await self.flush()
+        except Exception as e:
+            logger.warning("Activity flush error: %s", e)
+
+
+activity_tracker = ActivityTracker(
+    interval=ACTIVITY_FLUSH_INTERVAL, batch_size=ACTIVITY_BATCH_SIZE
+)
@@ -0,0 +1,240 @@
+import asyncio
+import heapq
+import logging
+import time
+from collections import defaultdict
+from types import SimpleNamespace
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, NamedTuple, Optional, Tuple, Type
+
+from redis.exceptions import LockError
+from tortoise import connections
+from tortoise.models import Model
+
+from config import (
+    REDIS_CACHE_DB,
+    DEADLINE_SWEEP_INTERVAL,
+    DEADLINE_BATCH_SIZE,
+)
+from library.database.redis import redis_manager
+from library.dependencies.feed_cache import feed_cache
+from models.dashboard import PromotionTask, Quiz
+
+logger = logging.getLogger(__name__)
+
+# Seconds before retrying a job whose lock another worker holds.
+LOCK_RETRY = 1.0
+
+
+# Closes up to $2 open rows due by $1, returning the cohort of each.
+CLOSE_SQL = """UPDATE "{table}" SET {close}
+WHERE "id" IN (
+    SELECT "id" FROM "{table}"
+    WHERE {open} AND "deadline" <= $1
+    LIMIT $2
+)
+RETURNING {cohort} AS "cohort_id"
+"""
+
+
+class DeadlineJob(NamedTuple):
+    model: Type[Model]
+    # Filter for rows that are still open.
+    open: dict
+    # UPDATE closing a batch of due rows, see CLOSE_SQL.
+    close_sql: str
+    # Cached feed listing the rows, invalidated for the cohorts closed.
+    feed: Optional[str] = None
+
+
+JOBS: Dict[str, DeadlineJob] = {
+    "promotiontask": DeadlineJob(
+        PromotionTask,
+        {"active": True},
+        CLOSE_SQL.format(
+            table="promotiontask",
+            close='"active" = false',
+            open='"active"',
+            cohort='"cohort_id"',
+        ),
+        feed="promotiontask",
+    ),
+    "quiz": DeadlineJob(
+        Quiz,
+        {"closed": False},
+        CLOSE_SQL.format(
+            table="quiz",
+            close='"closed" = true',
+            open='NOT "closed"',
+            cohort="NULL::int",
+        ),
+    ),
+}
+
+
+class DeadlineScheduler:
+    """Close promotion tasks and quizzes when their deadline passes
+
+    Open deadlines are kept in a min-heap of (timestamp, job, id). The
+    runner sleeps until the earliest one, or until an earlier deadline is
+    scheduled, then closes every due row of that job with batched
+    UPDATEs. Jobs run under a Redis lock, so only one worker across the
+    deployment runs each one at a time. The UPDATEs match on deadline
+    rather than on ids, so whichever worker holds the lock also closes
+    rows that other workers scheduled. The heap is reloaded from Postgres
+    every `interval` seconds, taking only the rows due before the next
+    reload, so it stays small however many rows are open.
+    """
+
+    lock_prefix = "deadline-lock:"
+
+    def __init__(self, interval: float, batch_size: int):
+        self.interval = interval
+        self.batch_size = batch_size
+        self.heap: List[Tuple[float, str, str]] = []
+        self.loaded_at: Optional[float] = None
+        self._wake = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    @staticmethod
+    def redis():
+        return redis_manager.client(REDIS_CACHE_DB)
+
+    def schedule(self, job: str, *rows) -> None:
+        """Add the deadlines of newly created rows of a job."""
+        for row in rows:
+            if row.deadline is None:
+                continue
+            entry = (row.deadline.timestamp(), job, str(row.id))
+            heapq.heappush(self.heap, entry)
+            if self.heap[0] == entry:
+                self._wake.set()
+
+    async def load(self) -> None:
+        """Rebuild the heap from the open rows due before the next reload."""
+        horizon = datetime.now(timezone.utc) + timedelta(seconds=self.interval)
+        heap = []
+        for name, job in JOBS.items():
+            rows = await job.model.filter(
+                deadline__lte=horizon, **job.open
+            ).values_list("id", "deadline")
+            heap.extend(
+                (deadline.timestamp(), name, str(row_id))
+                for row_id, deadline in rows
+            )
+        heapq.heapify(heap)
+        self.heap = heap
+        self.loaded_at = time.monotonic()
+
+    async def expire(self, name: str, now: datetime) -> Optional[int]:
+        """Close the rows of a job due by `now`. Returns the rows closed.
+
+        Cached pages of the job's feed are invalidated for every cohort
+        with a closed row. Returns None without touching Postgres if
+        another worker holds the job's lock.
+        """
+        job = JOBS[name]
+        lock = self.redis().lock(
+            self.lock_prefix + name, timeout=self.interval
+        )
+        if not await lock.acquire(blocking=False):
+            return None
+        cohorts = set()
+        try:
+            closed = 0
+            while True:
+                rows = await connections.get("default").execute_query_dict(
+                    job.close_sql, [now, self.batch_size]
+                )
+                closed += len(rows)
+                cohorts.update(row["cohort_id"] for row in rows)
+                if len(rows) < self.batch_size:
+                    return closed
+        finally:
+            try:
+                # Also runs if a later batch fails, for the batches closed.
+                if job.feed is not None and cohorts:
+                    await self.invalidate(job.feed, cohorts)
+            finally:
+                try:
+                    await lock.release()
+                except LockError:
+                    # Held past its timeout; another worker may own it now.
+                    pass
+
+    @staticmethod
+    async def invalidate(feed: str, cohorts) -> None:
+        """Drop the cached pages of a feed for the given cohorts."""
+        for cohort_id in cohorts:
+            await feed_cache.invalidate(
+                feed_cache.key(feed, SimpleNamespace(cohort_id=cohort_id))
+            )
+        await feed_cache.invalidate(feed_cache.general_key(feed))
+
+    async def run_due(self) -> None:
+        """Pop the due deadlines and run their jobs."""
+        now = datetime.now(timezone.utc)
+        due = defaultdict(list)
+        while self.heap and self.heap[0][0] <= now.timestamp():
+            _, name, row_id = heapq.heappop(self.heap)
+            due[name].append(row_id)
+        for name, row_ids in due.items():
+            if await self.expire(name, now) is None:
+                # The lock holder may have started before these were
+                # due, so check again shortly.
+                retry = now.timestamp() + LOCK_RETRY
+                for row_id in row_ids:
+                    heapq.heappush(self.heap, (retry, name, row_id))
+
+    def _timeout(self) -> float:
+        """Seconds until the next deadline or reload, whichever is first."""
+        if self.loaded_at is None:
+            return 0
+        timeout = self.interval - (time.monotonic() - self.loaded_at)
+        if self.heap:
+            timeout = min(timeout, self.heap[0][0] - time.time())
+        return max(timeout, 0)
+
+    async def _run(self) -> None:
+        while True:
+            self._wake.clear()
+            try:
+                await asyncio.wait_for(self._wake.wait(), self._timeout())
+                # An earlier deadline was scheduled, recompute the wait.
+                continue
+            except asyncio.TimeoutError:
+                pass
+            try:
+                if (
+                    self.loaded_at is None
+                    or time.monotonic() - self.loaded_at >= self.interval
+                ):
+                    await self.load()
+                await self.run_due()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("Deadline scheduler error: %s", e)
+                # Usually the database is not up yet; retry shortly.
+                await asyncio.sleep(LOCK_RETRY)
+
+    async def start(self) -> None:
+        """Start the scheduler. The heap is loaded on its first run."""
+        if self._task is None:
+            self.loaded_at = None
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the scheduler."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+deadline_scheduler = DeadlineScheduler(
+    interval=DEADLINE_SWEEP_INTERVAL, batch_size=DEADLINE_BATCH_SIZE
+)
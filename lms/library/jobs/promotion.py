@@ -0,0 +1,84 @@
+import time
+from collections import Counter
+from typing import Optional
+
+from tortoise import connections
+from tortoise.transactions import in_transaction
+
+from library.dependencies.auth import invalidate_user
+from library.security.tokens import expire_user_claims
+from models.cohort import Cohort
+
+# Students at the last stage have nowhere to be promoted to.
+MAX_STAGE = 10
+
+# A student is eligible once they have passed every promotion task set
+# for their cohort, which holds their current stage.
+ELIGIBLE_SQL = """SELECT u."id", u."stage", u."cohort_id"
+FROM "user" AS u
+JOIN "promotiontask" AS t ON t."cohort_id" = u."cohort_id"
+LEFT JOIN "tasksubmission" AS s
+    ON s."task_id" = t."id" AND s."user_id" = u."id"
+WHERE NOT u."is_admin" AND u."stage" < $1
+AND ($2::int IS NULL OR u."stage" = $2)
+GROUP BY u."id"
+HAVING bool_and(coalesce(s."passed", false))"""
+
+# Only moves students still in the cohort they were found eligible in,
+# so a concurrent run cannot promote anyone twice.
+PROMOTE_SQL = """UPDATE "user" AS u SET
+    "stage" = u."stage" + 1,
+    "cohort_id" = p."target",
+    "updated_at" = now()
+FROM unnest($1::uuid[], $2::int[], $3::int[]) AS p("id", "source", "target")
+WHERE u."id" = p."id" AND u."cohort_id" = p."source"
+"""
+
+
+async def promote_students(
+    stage: Optional[int] = None, dry_run: bool = False
+) -> dict:
+    """Move every eligible student up one stage.
+
+    Eligibility is computed in one aggregate query and the promotion is
+    applied in one UPDATE, which also moves each student to the cohort of
+    their new stage. Restrict to one stage with `stage`. With `dry_run`
+    nothing is written. Returns counts per stage and the time taken.
+    """
+    started = time.perf_counter()
+    rows = await connections.get("default").execute_query_dict(
+        ELIGIBLE_SQL, [MAX_STAGE, stage]
+    )
+    report = {
+        "dry_run": dry_run,
+        "eligible": len(rows),
+        "promoted": 0,
+        "by_stage": dict(Counter(row["stage"] for row in rows)),
+    }
+    if rows and not dry_run:
+        # Cohorts are resolved before the transaction, so a rollback
+        # cannot leave a cached id for a cohort that was never created.
+        targets = {}
+        sources = {row["cohort_id"] for row in rows}
+        for cohort in await Cohort.filter(id__in=sources):
+            targets[cohort.id] = await Cohort.resolve(
+                stage=cohort.stage + 1,
+                stack=cohort.stack,
+                track=cohort.track,
+                proficiency=cohort.proficiency,
+            )
+        async with in_transaction() as conn:
+            report["promoted"], _ = await conn.execute_query(
+                PROMOTE_SQL,
+                [
+                    [row["id"] for row in rows],
+                    [row["cohort_id"] for row in rows],
+                    [targets[row["cohort_id"]] for row in rows],
+                ],
+            )
+        # Tokens issued before now still carry the old stage and cohort.
+        user_ids = [row["id"] for row in rows]
+        await expire_user_claims(*user_ids)
+        await invalidate_user(*user_ids)
+    report["seconds"] = round(time.perf_counter() - started, 3)
+    return report
@@ -1,3 +1,4 @@
+from uuid import UUID
 from typing import Optional
 from datetime import datetime
 from pydantic import BaseModel, EmailStr, root_validator, Field
@@ -16,9 +17,44 @@ class JWTSchema(BaseModel):
     expire: Optional[datetime]
 
 
+class TokenClaims(JWTSchema):
+    """Decoded JWT payload
+
+    Access tokens also carry the role and cohort claims, so read-only
+    routes can authorize and filter without loading the user.
+    """
+
+    jti: Optional[str]
+    type: Optional[str]
+    issued_at: Optional[float]
+    is_admin: Optional[bool]
+    stage: Optional[int]
+    stack: Optional[str]
+    track: Optional[str]
+    proficiency: Optional[str]
+    cohort_id: Optional[int]
+
+
+class Principal(BaseModel):
+    """Authenticated user as described by an access token"""
+
+    id: UUID
+    is_admin: bool
+    stage: Optional[int]
+    stack: Optional[str]
+    track: Optional[str]
+    proficiency: Optional[str]
+    cohort_id: Optional[int]
+
+
 class AuthResponse(BaseModel):
     user: UserPublic
     token: str
+    refresh_token: Optional[str]
+
+
+class RefreshSchema(BaseModel):
+    refresh_token: str
 
 
 class ForgotPasswordSchema(BaseModel):
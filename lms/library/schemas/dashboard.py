@@ -1,6 +1,10 @@
-from typing import Optional
+from datetime import datetime
+from typing import List, Optional
+from uuid import UUID
 from pydantic import BaseModel, Field, root_validator
 
+from config import MAX_PAGE_SIZE
+
 from library.dependencies.utils import regex, validate_stack_and_track
 from library.schemas.register import UserPublic
 from library.schemas.common import CommonBase, CommonResponse, SharedModel
@@ -50,7 +54,17 @@ class AnnouncementCreate(BaseModel):
 
 
 class AnnouncementResponse(CommonResponse):
-    creator: UserPublic
+    creator: Optional[UserPublic]
+
+
+class AnnouncementItem(AnnouncementResponse):
+    """An announcement as listed in a feed page"""
+
+    general: bool
+    stage: Optional[int]
+    stack: Optional[str]
+    track: Optional[str]
+    proficiency: Optional[str]
 
 
 class LessonCreate(CommonBase):
@@ -66,6 +80,24 @@ class LessonResponse(CommonResponse):
     stage: int
 
 
+class LessonItem(LessonResponse):
+    """A lesson as listed in a feed page"""
+
+    creator: Optional[UserPublic]
+
+
+class ResourceItem(LessonItem):
+    """A resource as listed in a feed page"""
+
+
+class PromotionTaskItem(LessonItem):
+    """A promotional task as listed in a feed page"""
+
+    active: bool
+    deadline: Optional[datetime]
+    feedback: Optional[str]
+
+
 class PromoTaskCreate(CommonBase):
     deadline: int = Field(..., ge=1, le=14)
 
@@ -120,3 +152,37 @@ class TaskPublicSchema(SharedModel):
     url: str
     graded: bool
     submitted: bool
+    resubmissions: int
+
+
+class SubmissionClaim(TaskPublicSchema):
+    user_id: UUID
+    task_id: UUID
+    claimed_until: datetime
+
+
+class Grade(BaseModel):
+    id: UUID
+    passed: bool
+
+
+class GradeBatch(BaseModel):
+    """Grades for submissions claimed by the grader"""
+
+    grades: List[Grade] = Field(..., min_items=1, max_items=MAX_PAGE_SIZE)
+
+
+class PromotionRun(BaseModel):
+    """Promote students, optionally only those at one stage"""
+
+    stage: Optional[int] = Field(None, ge=0, le=9)
+    dry_run: bool = False
+
+
+class UserProfile(UserPublic):
+    email: Optional[str]
+    phone: Optional[str]
+    stage: Optional[int]
+    stack: Optional[str]
+    track: Optional[str]
+    proficiency: Optional[str]
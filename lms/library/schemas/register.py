@@ -1,5 +1,10 @@
+from typing import Optional
 from pydantic import BaseModel, EmailStr, Field, root_validator
-from library.dependencies.utils import validate_password
+from library.dependencies.utils import (
+    validate_password,
+    validate_stack_and_track,
+)
+from library.schemas.enums import Stack, Track, Proficiency
 from uuid import UUID
 
 
@@ -14,6 +19,19 @@ class UserCreate(BaseModel):
         return validate_password(values=values)
 
 
+class UserImport(UserCreate):
+    """A row of a bulk user import, optionally placing the user in a cohort"""
+
+    stage: int = Field(0, ge=0, le=10)
+    stack: Optional[Stack]
+    track: Optional[Track]
+    proficiency: Optional[Proficiency]
+
+    @root_validator()
+    def validate_cohort(cls, values):
+        return validate_stack_and_track(values=values)
+
+
 class UserPublic(BaseModel):
     id: UUID
     first_name: str = Field(..., max_length=50)
@@ -1,41 +1,69 @@
-import random
+import secrets
 import string
+from typing import Dict, Iterable, Optional
 
-import redis
+from config import REDIS_OTP_DB
+from library.database.redis import redis_manager
 
 
 class OTPManager:
     """Manage user OTP."""
 
-    redis = redis.Redis(host="redis", port=6379, db=1)
+    alphabet = string.ascii_uppercase + string.ascii_lowercase + string.digits
 
     @staticmethod
-    def generate_token(num: int = 9) -> str:
-        """Generate random token."""
-        return "".join(
-            random.choice(
-                string.ascii_uppercase + string.ascii_lowercase + string.digits
-            )
-            for _ in range(num)
-        )
+    def client():
+        """Return the Redis client that stores OTPs."""
+        return redis_manager.client(REDIS_OTP_DB)
 
     @classmethod
-    def create_otp(cls, user_id: str, expires: int = 900):
-        """Create OTP"""
+    def generate_token(cls, num: int = 9) -> str:
+        """Generate a cryptographically secure random token."""
+        return "".join(secrets.choice(cls.alphabet) for _ in range(num))
+
+    @classmethod
+    async def create_otp(cls, user_id: str, expires: int = 900) -> str:
+        """Create OTP
+
+        Uses a single set-if-absent, so issuing an OTP is one round trip
+        and can never overwrite another user's token.
+        """
+        redis = cls.client()
         otp = cls.generate_token()
-        while cls.redis.exists(otp):
+        while not await redis.set(otp, user_id, ex=expires, nx=True):
             otp = cls.generate_token()
-        cls.redis.set(otp, user_id, ex=expires)
         return otp
 
     @classmethod
-    def get_otp_user(cls, otp: str):
-        """Return the owner of OTP"""
-        return (
-            cls.redis.get(otp).decode("utf-8")
-            if cls.redis.exists(otp)
-            else None
-        )
+    async def create_otps(
+        cls, user_ids: Iterable[str], expires: int = 900
+    ) -> Dict[str, str]:
+        """Create OTPs for many users in pipelined batches
+
+        Returns a mapping of user id to OTP.
+        """
+        redis = cls.client()
+        otps = {}
+        pending = list(user_ids)
+        while pending:
+            tokens = [cls.generate_token() for _ in pending]
+            async with redis.pipeline(transaction=False) as pipe:
+                for otp, user_id in zip(tokens, pending):
+                    pipe.set(otp, user_id, ex=expires, nx=True)
+                results = await pipe.execute()
+            retry = []
+            for otp, user_id, created in zip(tokens, pending, results):
+                if created:
+                    otps[user_id] = otp
+                else:
+                    retry.append(user_id)
+            pending = retry
+        return otps
+
+    @classmethod
+    async def consume_otp(cls, otp: str) -> Optional[str]:
+        """Return the owner of OTP and delete it, so it works only once"""
+        return await cls.client().getdel(otp)
 
 
 otp_manager = OTPManager()
@@ -0,0 +1,133 @@
+import asyncio
+import time
+from concurrent.futures import (
+    Executor,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+)
+from typing import Iterable, List, Optional
+
+from fastapi import HTTPException, status
+from passlib.context import CryptContext
+
+from config import (
+    PASSWORD_HASH_EXECUTOR,
+    PASSWORD_HASH_WORKERS,
+    PASSWORD_HASH_MAX_PENDING,
+)
+
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+
+def _hash(password: str) -> str:
+    return pwd_context.hash(password)
+
+
+def _verify(password: str, hashed_password: str) -> bool:
+    return pwd_context.verify(password, hashed_password)
+
+
+class PasswordHasher:
+    """Hash and verify passwords on a worker pool.
+
+    bcrypt is deliberately slow, so calling it inside a request handler
+    blocks the event loop. The pool is created lazily and recreated after
+    shutdown, and at most `max_pending` calls may be queued at once.
+    """
+
+    def __init__(
+        self,
+        workers: int = 4,
+        executor: str = "thread",
+        max_pending: int = 64,
+    ):
+        self.workers = workers
+        self.executor_type = executor
+        self.max_pending = max_pending
+        self.pending = 0
+        self.calls = 0
+        self.rejected = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+        self._executor: Optional[Executor] = None
+
+    @property
+    def executor(self) -> Executor:
+        if self._executor is None:
+            if self.executor_type == "process":
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            else:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.workers, thread_name_prefix="bcrypt"
+                )
+        return self._executor
+
+    async def _run(self, func, *args):
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise HTTPException(
+                detail="Server is busy, please try again shortly",
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            )
+        return await self._submit(func, *args)
+
+    async def _submit(self, func, *args):
+        self.pending += 1
+        start = time.perf_counter()
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.executor, func, *args)
+        finally:
+            elapsed = time.perf_counter() - start
+            self.pending -= 1
+            self.calls += 1
+            self.total_seconds += elapsed
+            self.max_seconds = max(self.max_seconds, elapsed)
+
+    async def hash(self, password: str) -> str:
+        """Return the bcrypt hash of a password."""
+        return await self._run(_hash, password)
+
+    async def hash_many(self, passwords: Iterable[str]) -> List[str]:
+        """Hash a batch of passwords in parallel across the pool.
+
+        At most `workers` of them are queued at a time, so a bulk caller
+        waits for free workers instead of being rejected, and never
+        fills the queue that interactive logins share.
+        """
+        limit = asyncio.Semaphore(self.workers)
+
+        async def hash_one(password: str) -> str:
+            async with limit:
+                return await self._submit(_hash, password)
+
+        return await asyncio.gather(*(hash_one(p) for p in passwords))
+
+    async def verify(self, password: str, hashed_password: str) -> bool:
+        """Check a password against its stored hash."""
+        return await self._run(_verify, password, hashed_password)
+
+    def shutdown(self):
+        """Stop the worker pool; it is recreated on next use."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    def stats(self) -> dict:
+        """Return queue depth and latency metrics."""
+        avg_seconds = self.total_seconds / self.calls if self.calls else 0.0
+        return {
+            "pending": self.pending,
+            "calls": self.calls,
+            "rejected": self.rejected,
+            "avg_seconds": avg_seconds,
+            "max_seconds": self.max_seconds,
+        }
+
+
+password_hasher = PasswordHasher(
+    workers=PASSWORD_HASH_WORKERS,
+    executor=PASSWORD_HASH_EXECUTOR,
+    max_pending=PASSWORD_HASH_MAX_PENDING,
+)
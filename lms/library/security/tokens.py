@@ -0,0 +1,135 @@
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Tuple
+
+from jose import jwt
+
+from config import (
+    SECRET_KEY,
+    ALGORITHM,
+    ACCESS_TOKEN_EXPIRE_MINUTES,
+    REFRESH_TOKEN_EXPIRE_DAYS,
+    REDIS_CACHE_DB,
+)
+from library.database.redis import redis_manager
+
+ACCESS = "access"
+REFRESH = "refresh"
+RESET = "reset"
+# Password reset links are valid for ten minutes.
+RESET_TOKEN_EXPIRE_SECONDS = 600
+
+
+def _encode(claims: dict, expire: datetime) -> str:
+    to_encode = {
+        **claims,
+        "jti": uuid.uuid4().hex,
+        "issued_at": time.time(),
+        "expire": str(expire),
+    }
+    return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+
+
+def create_access_token(user) -> str:
+    """Create a short-lived token carrying role and cohort claims."""
+    expire = datetime.now(timezone.utc) + timedelta(
+        minutes=ACCESS_TOKEN_EXPIRE_MINUTES
+    )
+    claims = {
+        "user_id": str(user.id),
+        "type": ACCESS,
+        "is_admin": user.is_admin,
+        "stage": user.stage,
+        "stack": user.stack,
+        "track": user.track,
+        "proficiency": user.proficiency,
+        "cohort_id": user.cohort_id,
+    }
+    return _encode(claims, expire)
+
+
+def create_refresh_token(user) -> str:
+    """Create a long-lived token that can only be exchanged at refresh."""
+    expire = datetime.now(timezone.utc) + timedelta(
+        days=REFRESH_TOKEN_EXPIRE_DAYS
+    )
+    return _encode({"user_id": str(user.id), "type": REFRESH}, expire)
+
+
+def create_reset_token(user) -> str:
+    """Create a token that can only be used to reset the password."""
+    expire = datetime.now(timezone.utc) + timedelta(
+        seconds=RESET_TOKEN_EXPIRE_SECONDS
+    )
+    return _encode({"user_id": str(user.id), "type": RESET}, expire)
+
+
+def _user_key(user_id) -> str:
+    return f"user-tokens:{user_id}"
+
+
+async def revoke_token(jti: str, expire: datetime) -> bool:
+    """Revoke a token until it would have expired anyway.
+
+    Returns False if the token was already revoked.
+    """
+    ttl = max(int((expire - datetime.now(timezone.utc)).total_seconds()), 1)
+    redis = redis_manager.client(REDIS_CACHE_DB)
+    return bool(await redis.set(f"revoked:{jti}", 1, ex=ttl, nx=True))
+
+
+async def _set_cutoff(field: str, *user_ids) -> None:
+    """Record that tokens issued to the users so far are affected.
+
+    Stores a cutoff rather than listing the tokens, and keeps it for as
+    long as the longest-lived token issued before it.
+    """
+    redis = redis_manager.client(REDIS_CACHE_DB)
+    async with redis.pipeline(transaction=True) as pipe:
+        for user_id in user_ids:
+            key = _user_key(user_id)
+            pipe.hset(key, field, time.time())
+            pipe.expire(key, timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS))
+        await pipe.execute()
+
+
+async def revoke_user_tokens(user_id) -> None:
+    """Revoke every token issued to a user so far."""
+    await _set_cutoff("revoked_before", user_id)
+
+
+async def expire_user_claims(*user_ids) -> None:
+    """Mark the role and cohort claims of the users' tokens as stale.
+
+    The tokens stay valid, but requests made with them load the user
+    instead of trusting the claims.
+    """
+    await _set_cutoff("claims_before", *user_ids)
+
+
+async def token_state(claims) -> Tuple[bool, bool]:
+    """Return whether a token is revoked and whether its claims are stale.
+
+    Checks the token and its user's cutoffs in a single round trip.
+    Tokens issued before `issued_at` was added count as issued at the
+    epoch, so user-wide cutoffs also cover them.
+    """
+    redis = redis_manager.client(REDIS_CACHE_DB)
+    async with redis.pipeline(transaction=False) as pipe:
+        pipe.exists(f"revoked:{claims.jti}")
+        pipe.hmget(
+            _user_key(claims.user_id), "revoked_before", "claims_before"
+        )
+        revoked, (revoked_before, claims_before) = await pipe.execute()
+    issued_at = claims.issued_at or 0
+    if revoked_before is not None and issued_at <= float(revoked_before):
+        revoked = True
+    stale = claims_before is not None and issued_at <= float(claims_before)
+    return bool(revoked), stale
+
+
+async def is_revoked(claims) -> bool:
+    """Check the token and its user's revocation cutoff."""
+    revoked, _ = await token_state(claims)
+    return revoked
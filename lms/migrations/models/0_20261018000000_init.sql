@@ -0,0 +1,128 @@
+-- upgrade --
+CREATE TABLE IF NOT EXISTS "media" (
+    "id" UUID NOT NULL  PRIMARY KEY,
+    "created_at" TIMESTAMPTZ NOT NULL  DEFAULT CURRENT_TIMESTAMP,
+    "updated_at" TIMESTAMPTZ NOT NULL  DEFAULT CURRENT_TIMESTAMP,
+    "title" VARCHAR(128),
+    "url" VARCHAR(500),
+    "filename" VARCHAR(200),
+    "filesize" VARCHAR(100)
+);
+COMMENT ON TABLE "media" IS 'Media contents';
+CREATE TABLE IF NOT EXISTS "user" (
+    "id" UUID NOT NULL  PRIMARY KEY,
+    "created_at" TIMESTAMPTZ NOT NULL  DEFAULT CURRENT_TIMESTAMP,
+    "updated_at" TIMESTAMPTZ NOT NULL  DEFAULT CURRENT_TIMESTAMP,
+    "username" VARCHAR(55),
+    "first_name" VARCHAR(100),
+    "surname" VARCHAR(100),
+    "email" VARCHAR(100),
+    "phone" VARCHAR(55),
+    "gender" VARCHAR(55),
+    "stage" INT,
+    "stack" VARCHAR(55),
+    "track" VARCHAR(55),
+    "proficiency" VARCHAR(55),
+    "last_active" TIMESTAMPTZ NOT NULL  DEFAULT CURRENT_TIMESTAMP,
+    "is_admin" BOOL NOT NULL  DEFAULT False,
+    "hashed_password" VARCHAR(255),
+    "email_verified" BOOL NOT NULL  DEFAULT False
+);
+CREATE TABLE IF NOT EXISTS "announcement" (
+    "id" UUID NOT NULL  PRIMARY KEY,
+    "created_at" TIMESTAMPTZ NOT NULL  DEFAULT CURRENT_TIMESTAMP,
+    "updated_at" TIMESTAMPTZ NOT NULL  DEFAULT CURRENT_TIMESTAMP,
+    "title" VARCHAR(128),
+    "content" VARCHAR(655),
+    "general" BOOL NOT NULL  DEFAULT False,
+    "stack" VARCHAR(55),
+    "track" VARCHAR(55),
+    "proficiency" VARCHAR(100),
+    "stage" INT,
+    "creator_id" UUID REFERENCES "user" ("id") ON DELETE CASCADE
+);
+CREATE TABLE IF NOT EXISTS "lesson" (
+    "id" UUID NOT NULL  PRIMARY KEY,
+    "created_at" TIMESTAMPTZ NOT NULL  DEFAULT CURRENT_TIMESTAMP,
+    "updated_at" TIMESTAMPTZ NOT NULL  DEFAULT CURRENT_TIMESTAMP,
+    "title" VARCHAR(128),
+    "content" VARCHAR(655),
+    "stack" VARCHAR(55),
+    "track" VARCHAR(55),
+    "proficiency" VARCHAR(55),
+    "stage" INT,
+    "creator_id" UUID REFERENCES "user" ("id") ON DELETE CASCADE,
+    "media_id" UUID REFERENCES "media" ("id") ON DELETE CASCADE
+);
+CREATE TABLE IF NOT EXISTS "notification" (
+    "id" UUID NOT NULL  PRIMARY KEY,
+    "created_at" TIMESTAMPTZ NOT NULL  DEFAULT CURRENT_TIMESTAMP,
+    "updated_at" TIMESTAMPTZ NOT NULL  DEFAULT CURRENT_TIMESTAMP,
+    "message" VARCHAR(255),
+    "sender_id" UUID REFERENCES "user" ("id") ON DELETE CASCADE
+);
+CREATE TABLE IF NOT EXISTS "picture" (
+    "id" UUID NOT NULL  PRIMARY KEY,
+    "created_at" TIMESTAMPTZ NOT NULL  DEFAULT CURRENT_TIMESTAMP,
+    "updated_at" TIMESTAMPTZ NOT NULL  DEFAULT CURRENT_TIMESTAMP,
+    "url" VARCHAR(500),
+    "filename" VARCHAR(200),
+    "filesize" VARCHAR(100),
+    "user_id" UUID REFERENCES "user" ("id") ON DELETE CASCADE
+);
+CREATE TABLE IF NOT EXISTS "promotiontask" (
+    "id" UUID NOT NULL  PRIMARY KEY,
+    "created_at" TIMESTAMPTZ NOT NULL  DEFAULT CURRENT_TIMESTAMP,
+    "updated_at" TIMESTAMPTZ NOT NULL  DEFAULT CURRENT_TIMESTAMP,
+    "title" VARCHAR(128),
+    "content" VARCHAR(655),
+    "stack" VARCHAR(55),
+    "track" VARCHAR(55),
+    "proficiency" VARCHAR(55),
+    "stage" INT,
+    "feedback" VARCHAR(256),
+    "active" BOOL NOT NULL  DEFAULT False,
+    "deadline" TIMESTAMPTZ,
+    "creator_id" UUID REFERENCES "user" ("id") ON DELETE CASCADE
+);
+CREATE TABLE IF NOT EXISTS "quiz" (
+    "id" UUID NOT NULL  PRIMARY KEY,
+    "created_at" TIMESTAMPTZ NOT NULL  DEFAULT CURRENT_TIMESTAMP,
+    "updated_at" TIMESTAMPTZ NOT NULL  DEFAULT CURRENT_TIMESTAMP,
+    "content" VARCHAR(655),
+    "deadline" TIMESTAMPTZ,
+    "score" DOUBLE PRECISION   DEFAULT 0,
+    "lesson_id" UUID REFERENCES "lesson" ("id") ON DELETE CASCADE,
+    "user_id" UUID REFERENCES "user" ("id") ON DELETE CASCADE
+);
+CREATE TABLE IF NOT EXISTS "resource" (
+    "id" UUID NOT NULL  PRIMARY KEY,
+    "created_at" TIMESTAMPTZ NOT NULL  DEFAULT CURRENT_TIMESTAMP,
+    "updated_at" TIMESTAMPTZ NOT NULL  DEFAULT CURRENT_TIMESTAMP,
+    "title" VARCHAR(128),
+    "content" VARCHAR(655),
+    "stack" VARCHAR(55),
+    "track" VARCHAR(55),
+    "proficiency" VARCHAR(55),
+    "stage" INT,
+    "creator_id" UUID REFERENCES "user" ("id") ON DELETE CASCADE,
+    "media_id" UUID REFERENCES "media" ("id") ON DELETE CASCADE
+);
+COMMENT ON TABLE "resource" IS 'Resources';
+CREATE TABLE IF NOT EXISTS "tasksubmission" (
+    "id" UUID NOT NULL  PRIMARY KEY,
+    "created_at" TIMESTAMPTZ NOT NULL  DEFAULT CURRENT_TIMESTAMP,
+    "updated_at" TIMESTAMPTZ NOT NULL  DEFAULT CURRENT_TIMESTAMP,
+    "url" VARCHAR(500),
+    "graded" BOOL NOT NULL  DEFAULT False,
+    "passed" BOOL NOT NULL  DEFAULT False,
+    "submitted" BOOL NOT NULL  DEFAULT False,
+    "task_id" UUID REFERENCES "promotiontask" ("id") ON DELETE CASCADE,
+    "user_id" UUID REFERENCES "user" ("id") ON DELETE CASCADE
+);
+CREATE TABLE IF NOT EXISTS "aerich" (
+    "id" SERIAL NOT NULL PRIMARY KEY,
+    "version" VARCHAR(255) NOT NULL,
+    "app" VARCHAR(100) NOT NULL,
+    "content" JSONB NOT NULL
+);
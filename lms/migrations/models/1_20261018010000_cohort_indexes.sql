@@ -0,0 +1,12 @@
+-- upgrade --
+CREATE INDEX IF NOT EXISTS "idx_announcement_cohort" ON "announcement" ("stage", "stack", "track", "proficiency", "created_at", "id");
+CREATE INDEX IF NOT EXISTS "idx_announcement_general" ON "announcement" ("created_at", "id") WHERE "general";
+CREATE INDEX IF NOT EXISTS "idx_lesson_cohort" ON "lesson" ("stage", "stack", "track", "proficiency", "created_at", "id");
+CREATE INDEX IF NOT EXISTS "idx_promotiontask_cohort" ON "promotiontask" ("stage", "stack", "track", "proficiency", "created_at", "id");
+CREATE INDEX IF NOT EXISTS "idx_resource_cohort" ON "resource" ("stage", "stack", "track", "proficiency", "created_at", "id");
+-- downgrade --
+DROP INDEX IF EXISTS "idx_announcement_cohort";
+DROP INDEX IF EXISTS "idx_announcement_general";
+DROP INDEX IF EXISTS "idx_lesson_cohort";
+DROP INDEX IF EXISTS "idx_promotiontask_cohort";
+DROP INDEX IF EXISTS "idx_resource_cohort";
@@ -0,0 +1,27 @@
+-- upgrade --
+-- Re-key the high-insert leaf tables (nothing references them) with
+-- UUIDv7 ids derived from created_at: 48-bit millisecond timestamp,
+-- version 7, variant 10, random bits. md5/random keep this PG12-safe.
+UPDATE "tasksubmission" SET "id" = (
+    lpad(to_hex(floor(extract(epoch FROM "created_at") * 1000)::bigint), 12, '0')
+    || '7' || substr(md5(random()::text || "id"::text), 1, 3)
+    || to_hex(8 + floor(random() * 4)::int)
+    || substr(md5(random()::text || "id"::text), 1, 15)
+)::uuid;
+UPDATE "notification" SET "id" = (
+    lpad(to_hex(floor(extract(epoch FROM "created_at") * 1000)::bigint), 12, '0')
+    || '7' || substr(md5(random()::text || "id"::text), 1, 3)
+    || to_hex(8 + floor(random() * 4)::int)
+    || substr(md5(random()::text || "id"::text), 1, 15)
+)::uuid;
+UPDATE "quiz" SET "id" = (
+    lpad(to_hex(floor(extract(epoch FROM "created_at") * 1000)::bigint), 12, '0')
+    || '7' || substr(md5(random()::text || "id"::text), 1, 3)
+    || to_hex(8 + floor(random() * 4)::int)
+    || substr(md5(random()::text || "id"::text), 1, 15)
+)::uuid;
+REINDEX TABLE "tasksubmission";
+REINDEX TABLE "notification";
+REINDEX TABLE "quiz";
+-- downgrade --
+-- The new ids are valid UUIDs, so there is nothing to undo.
@@ -0,0 +1,72 @@
+-- upgrade --
+CREATE TABLE IF NOT EXISTS "cohort" (
+    "id" SERIAL NOT NULL PRIMARY KEY,
+    "key" VARCHAR(255) NOT NULL UNIQUE,
+    "stage" INT,
+    "stack" VARCHAR(55),
+    "track" VARCHAR(55),
+    "proficiency" VARCHAR(100)
+);
+COMMENT ON TABLE "cohort" IS 'A distinct (stage, stack, track, proficiency) combination';
+ALTER TABLE "user" ADD "cohort_id" INT;
+ALTER TABLE "lesson" ADD "cohort_id" INT;
+ALTER TABLE "resource" ADD "cohort_id" INT;
+ALTER TABLE "promotiontask" ADD "cohort_id" INT;
+ALTER TABLE "announcement" ADD "cohort_id" INT;
+-- Backfill: one cohort per distinct combination, keyed the way
+-- Cohort.make_key builds it (NULL as empty, joined with |).
+INSERT INTO "cohort" ("key", "stage", "stack", "track", "proficiency")
+SELECT DISTINCT ON (k) k, "stage", "stack", "track", "proficiency"
+FROM (
+    SELECT coalesce(c."stage"::text, '') || '|' || coalesce(c."stack", '') || '|' || coalesce(c."track", '') || '|' || coalesce(c."proficiency", '') AS k, c.*
+    FROM (
+        SELECT "stage", "stack", "track", "proficiency" FROM "user"
+        UNION
+        SELECT "stage", "stack", "track", "proficiency" FROM "lesson"
+        UNION
+        SELECT "stage", "stack", "track", "proficiency" FROM "resource"
+        UNION
+        SELECT "stage", "stack", "track", "proficiency" FROM "promotiontask"
+        UNION
+        SELECT "stage", "stack", "track", "proficiency" FROM "announcement"
+    ) c
+) keyed
+ON CONFLICT ("key") DO NOTHING;
+UPDATE "user" t SET "cohort_id" = c."id" FROM "cohort" c
+WHERE c."key" = coalesce(t."stage"::text, '') || '|' || coalesce(t."stack", '') || '|' || coalesce(t."track", '') || '|' || coalesce(t."proficiency", '');
+UPDATE "lesson" t SET "cohort_id" = c."id" FROM "cohort" c
+WHERE c."key" = coalesce(t."stage"::text, '') || '|' || coalesce(t."stack", '') || '|' || coalesce(t."track", '') || '|' || coalesce(t."proficiency", '');
+UPDATE "resource" t SET "cohort_id" = c."id" FROM "cohort" c
+WHERE c."key" = coalesce(t."stage"::text, '') || '|' || coalesce(t."stack", '') || '|' || coalesce(t."track", '') || '|' || coalesce(t."proficiency", '');
+UPDATE "promotiontask" t SET "cohort_id" = c."id" FROM "cohort" c
+WHERE c."key" = coalesce(t."stage"::text, '') || '|' || coalesce(t."stack", '') || '|' || coalesce(t."track", '') || '|' || coalesce(t."proficiency", '');
+UPDATE "announcement" t SET "cohort_id" = c."id" FROM "cohort" c
+WHERE c."key" = coalesce(t."stage"::text, '') || '|' || coalesce(t."stack", '') || '|' || coalesce(t."track", '') || '|' || coalesce(t."proficiency", '');
+ALTER TABLE "user" ADD CONSTRAINT "fk_user_cohort_12368fb4" FOREIGN KEY ("cohort_id") REFERENCES "cohort" ("id") ON DELETE RESTRICT;
+ALTER TABLE "lesson" ADD CONSTRAINT "fk_lesson_cohort_001ee460" FOREIGN KEY ("cohort_id") REFERENCES "cohort" ("id") ON DELETE RESTRICT;
+ALTER TABLE "resource" ADD CONSTRAINT "fk_resource_cohort_0e2055ea" FOREIGN KEY ("cohort_id") REFERENCES "cohort" ("id") ON DELETE RESTRICT;
+ALTER TABLE "promotiontask" ADD CONSTRAINT "fk_promotio_cohort_577f80bd" FOREIGN KEY ("cohort_id") REFERENCES "cohort" ("id") ON DELETE RESTRICT;
+ALTER TABLE "announcement" ADD CONSTRAINT "fk_announce_cohort_8b498a9c" FOREIGN KEY ("cohort_id") REFERENCES "cohort" ("id") ON DELETE RESTRICT;
+DROP INDEX IF EXISTS "idx_announcement_cohort";
+CREATE INDEX IF NOT EXISTS "idx_announcement_cohort" ON "announcement" ("cohort_id", "created_at", "id");
+DROP INDEX IF EXISTS "idx_lesson_cohort";
+CREATE INDEX IF NOT EXISTS "idx_lesson_cohort" ON "lesson" ("cohort_id", "created_at", "id");
+DROP INDEX IF EXISTS "idx_promotiontask_cohort";
+CREATE INDEX IF NOT EXISTS "idx_promotiontask_cohort" ON "promotiontask" ("cohort_id", "created_at", "id");
+DROP INDEX IF EXISTS "idx_resource_cohort";
+CREATE INDEX IF NOT EXISTS "idx_resource_cohort" ON "resource" ("cohort_id", "created_at", "id");
+-- downgrade --
+DROP INDEX IF EXISTS "idx_announcement_cohort";
+DROP INDEX IF EXISTS "idx_lesson_cohort";
+DROP INDEX IF EXISTS "idx_promotiontask_cohort";
+DROP INDEX IF EXISTS "idx_resource_cohort";
+ALTER TABLE "user" DROP COLUMN "cohort_id";
+ALTER TABLE "lesson" DROP COLUMN "cohort_id";
+ALTER TABLE "resource" DROP COLUMN "cohort_id";
+ALTER TABLE "promotiontask" DROP COLUMN "cohort_id";
+ALTER TABLE "announcement" DROP COLUMN "cohort_id";
+DROP TABLE IF EXISTS "cohort";
+CREATE INDEX IF NOT EXISTS "idx_announcement_cohort" ON "announcement" ("stage", "stack", "track", "proficiency", "created_at", "id");
+CREATE INDEX IF NOT EXISTS "idx_lesson_cohort" ON "lesson" ("stage", "stack", "track", "proficiency", "created_at", "id");
+CREATE INDEX IF NOT EXISTS "idx_promotiontask_cohort" ON "promotiontask" ("stage", "stack", "track", "proficiency", "created_at", "id");
+CREATE INDEX IF NOT EXISTS "idx_resource_cohort" ON "resource" ("stage", "stack", "track", "proficiency", "created_at", "id");
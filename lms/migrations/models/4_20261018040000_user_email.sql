@@ -0,0 +1,14 @@
+-- upgrade --
+-- Store emails normalized. Rows whose lowercase form is shared with
+-- another account are left as they are, and the unique index below
+-- then fails on them: such accounts have to be merged by hand first.
+UPDATE "user" u SET "email" = lower(trim(u."email"))
+WHERE u."email" <> lower(trim(u."email"))
+AND NOT EXISTS (
+    SELECT 1 FROM "user" o
+    WHERE o."id" <> u."id"
+    AND lower(trim(o."email")) = lower(trim(u."email"))
+);
+CREATE UNIQUE INDEX IF NOT EXISTS "uidx_user_email" ON "user" ((LOWER(email)));
+-- downgrade --
+DROP INDEX IF EXISTS "uidx_user_email";
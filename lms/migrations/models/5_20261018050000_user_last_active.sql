@@ -0,0 +1,4 @@
+-- upgrade --
+CREATE INDEX IF NOT EXISTS "idx_user_last_ac_55300c" ON "user" ("last_active");
+-- downgrade --
+DROP INDEX IF EXISTS "idx_user_last_ac_55300c";
@@ -0,0 +1,9 @@
+-- upgrade --
+ALTER TABLE "quiz" ADD "closed" BOOL NOT NULL  DEFAULT False;
+UPDATE "quiz" SET "closed" = true WHERE "deadline" <= now();
+CREATE INDEX "idx_promotionta_deadlin_372b54" ON "promotiontask" ("deadline");
+CREATE INDEX "idx_quiz_deadlin_80bbe8" ON "quiz" ("deadline");
+-- downgrade --
+DROP INDEX "idx_promotionta_deadlin_372b54";
+DROP INDEX "idx_quiz_deadlin_80bbe8";
+ALTER TABLE "quiz" DROP COLUMN "closed";
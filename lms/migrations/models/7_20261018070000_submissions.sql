@@ -0,0 +1,18 @@
+-- upgrade --
+ALTER TABLE "tasksubmission" ADD "resubmissions" INT NOT NULL  DEFAULT 0;
+-- Keep the latest submission per (user, task), counting the others.
+UPDATE "tasksubmission" AS s SET "resubmissions" = d."total" - 1
+FROM (
+    SELECT DISTINCT ON ("user_id", "task_id") "id",
+        count(*) OVER (PARTITION BY "user_id", "task_id") AS "total"
+    FROM "tasksubmission"
+    ORDER BY "user_id", "task_id", "created_at" DESC, "id" DESC
+) AS d
+WHERE s."id" = d."id" AND d."total" > 1;
+DELETE FROM "tasksubmission" AS s USING "tasksubmission" AS newer
+WHERE s."user_id" = newer."user_id" AND s."task_id" = newer."task_id"
+AND (s."created_at", s."id") < (newer."created_at", newer."id");
+CREATE UNIQUE INDEX "uid_tasksubmiss_user_id_cfb6d4" ON "tasksubmission" ("user_id", "task_id");
+-- downgrade --
+DROP INDEX "uid_tasksubmiss_user_id_cfb6d4";
+ALTER TABLE "tasksubmission" DROP COLUMN "resubmissions";
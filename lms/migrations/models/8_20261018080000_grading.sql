@@ -0,0 +1,10 @@
+-- upgrade --
+ALTER TABLE "tasksubmission" ADD "claimed_by_id" UUID;
+ALTER TABLE "tasksubmission" ADD "claimed_until" TIMESTAMPTZ;
+CREATE INDEX IF NOT EXISTS "idx_tasksubmission_ungraded" ON "tasksubmission" ("created_at", "id") WHERE NOT "graded";
+ALTER TABLE "tasksubmission" ADD CONSTRAINT "fk_tasksubm_user_570bfd11" FOREIGN KEY ("claimed_by_id") REFERENCES "user" ("id") ON DELETE SET NULL;
+-- downgrade --
+ALTER TABLE "tasksubmission" DROP CONSTRAINT "fk_tasksubm_user_570bfd11";
+DROP INDEX IF EXISTS "idx_tasksubmission_ungraded";
+ALTER TABLE "tasksubmission" DROP COLUMN "claimed_by_id";
+ALTER TABLE "tasksubmission" DROP COLUMN "claimed_until";
@@ -1,4 +1,5 @@
 # flake8: noqa
 
+from models.cohort import Cohort
 from models.user import User, Picture
 from models.dashboard import *
@@ -1,13 +1,95 @@
+import os
+import threading
+import time
+import uuid
+
 from tortoise import fields
+from tortoise.indexes import Index
 from tortoise.models import Model
 
+from config import TIME_ORDERED_IDS
+
+_uuid7_lock = threading.Lock()
+_uuid7_last = (0, 0)
+
+
+def uuid7() -> uuid.UUID:
+    """Return a time-ordered UUID (version 7).
+
+    The top 48 bits are the Unix time in milliseconds, so new keys land
+    at the right edge of the primary key index instead of at random
+    pages. Within one millisecond the 12-bit `rand_a` field is used as a
+    counter, keeping keys from one process strictly increasing.
+    """
+    global _uuid7_last
+    with _uuid7_lock:
+        millis = time.time_ns() // 1_000_000
+        last_millis, counter = _uuid7_last
+        if millis <= last_millis:
+            millis, counter = last_millis, counter + 1
+            if counter > 0xFFF:
+                millis, counter = millis + 1, 0
+        else:
+            counter = int.from_bytes(os.urandom(2), "big") & 0x7FF
+        _uuid7_last = (millis, counter)
+    rand_b = int.from_bytes(os.urandom(8), "big") & ((1 << 62) - 1)
+    value = (millis & ((1 << 48) - 1)) << 80
+    value |= 0x7 << 76 | counter << 64 | 0b10 << 62 | rand_b
+    return uuid.UUID(int=value)
+
+
+def new_id() -> uuid.UUID:
+    """Return a primary key for a new row."""
+    return uuid7() if TIME_ORDERED_IDS else uuid.uuid4()
+
 
 class BaseModel(Model):
     """Define datetime model mixin."""
 
-    id = fields.UUIDField(pk=True)
+    id = fields.UUIDField(pk=True, default=new_id)
     created_at = fields.DatetimeField(auto_now_add=True)
     updated_at = fields.DatetimeField(auto_now=True)
 
     class Meta:
         abstract = True
+
+
+class NamedIndex(Index):
+    """Index compared by value, so aerich only diffs real changes."""
+
+    def _key(self):
+        return (
+            type(self).__name__,
+            self.name,
+            tuple(self.fields),
+            tuple(expression.get_sql() for expression in self.expressions),
+            self.extra,
+        )
+
+    def __eq__(self, other):
+        return isinstance(other, NamedIndex) and self._key() == other._key()
+
+    def __hash__(self):
+        return hash(self._key())
+
+
+class UniqueIndex(NamedIndex):
+    """Unique index, which may be on expressions such as LOWER(email)."""
+
+    INDEX_TYPE = "UNIQUE"
+
+
+class PartialIndex(NamedIndex):
+    """B-tree index restricted to the rows matching a SQL condition."""
+
+    def __init__(self, *expressions, condition: str, **kwargs):
+        super().__init__(*expressions, **kwargs)
+        self.extra = f" WHERE {condition}"
+
+
+def cohort_index(table: str) -> NamedIndex:
+    """Index serving cohort-filtered feeds sorted newest first."""
+    return NamedIndex(
+        fields=("cohort_id", "created_at", "id"),
+        name=f"idx_{table}_cohort",
+    )
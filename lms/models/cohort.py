@@ -0,0 +1,137 @@
+from typing import Iterable, Optional
+
+from tortoise import fields
+from tortoise.exceptions import IntegrityError
+from tortoise.models import Model
+from tortoise.transactions import in_transaction
+
+from config import COHORT_CACHE_SIZE, COHORT_CACHE_TTL
+from library.dependencies.cache import TTLCache
+
+COHORT_FIELDS = ("stage", "stack", "track", "proficiency")
+
+# Resolved ids by cohort key. Cohorts are never changed, but an id can
+# go stale if the cohort was created in a transaction that rolled back,
+# or deleted by hand. Writes that then fail on the foreign key call
+# `Cohort.forget_missing` and retry with freshly resolved ids.
+_cohort_ids = TTLCache(maxsize=COHORT_CACHE_SIZE, ttl=COHORT_CACHE_TTL)
+
+
+def _value(value):
+    return getattr(value, "value", value)
+
+
+class Cohort(Model):
+    """A distinct (stage, stack, track, proficiency) combination
+
+    Users and cohort content point at a cohort by a small integer key,
+    so feeds filter and index on one integer column instead of four
+    strings. `key` is the four values joined, with NULL as empty.
+    """
+
+    id = fields.IntField(pk=True)
+    key = fields.CharField(max_length=255, unique=True)
+    stage = fields.IntField(null=True)
+    stack = fields.CharField(max_length=55, null=True)
+    track = fields.CharField(max_length=55, null=True)
+    proficiency = fields.CharField(max_length=100, null=True)
+
+    @staticmethod
+    def make_key(stage=None, stack=None, track=None, proficiency=None):
+        return "|".join(
+            "" if value is None else str(_value(value))
+            for value in (stage, stack, track, proficiency)
+        )
+
+    @classmethod
+    async def resolve(
+        cls, stage=None, stack=None, track=None, proficiency=None
+    ) -> int:
+        """Return the id of a cohort, creating it on first use."""
+        key = cls.make_key(stage, stack, track, proficiency)
+        cohort_id = _cohort_ids.get(key)
+        if cohort_id is None:
+            cohort = await cls.get_or_none(key=key)
+            if cohort is None:
+                values = {
+                    "stage": stage,
+                    "stack": _value(stack),
+                    "track": _value(track),
+                    "proficiency": _value(proficiency),
+                }
+                try:
+                    cohort = await cls.create(key=key, **values)
+                except IntegrityError:
+                    # Created concurrently by another request.
+                    cohort = await cls.get(key=key)
+            cohort_id = cohort.id
+            _cohort_ids.set(key, cohort_id)
+        return cohort_id
+
+    @classmethod
+    async def forget_missing(cls, cohort_ids: Iterable) -> bool:
+        """Drop the cached ids if any of `cohort_ids` no longer exists.
+
+        Called after an IntegrityError. Returns True if a cohort was
+        missing, in which case the write can be retried.
+        """
+        ids = {cohort_id for cohort_id in cohort_ids if cohort_id is not None}
+        if await cls.filter(id__in=ids).count() == len(ids):
+            return False
+        _cohort_ids.clear()
+        return True
+
+    @classmethod
+    async def resolve_for(cls, row, **changes) -> int:
+        """Return the cohort of a row, with `changes` applied on top."""
+        values = {name: getattr(row, name) for name in COHORT_FIELDS}
+        values.update(
+            (name, value)
+            for name, value in changes.items()
+            if name in COHORT_FIELDS
+        )
+        return await cls.resolve(**values)
+
+
+async def assign_cohorts(rows: Iterable) -> None:
+    """Set `cohort_id` on unsaved rows, e.g. before a bulk_create."""
+    for row in rows:
+        row.cohort_id = await Cohort.resolve_for(row)
+
+
+async def create_in_cohorts(model, rows: list) -> None:
+    """Assign cohorts to rows and bulk create them in one transaction."""
+    await assign_cohorts(rows)
+    try:
+        async with in_transaction():
+            await model.bulk_create(rows)
+    except IntegrityError:
+        if not await Cohort.forget_missing(row.cohort_id for row in rows):
+            raise
+        await assign_cohorts(rows)
+        async with in_transaction():
+            await model.bulk_create(rows)
+
+
+class CohortMember:
+    """Mixin keeping `cohort_id` in step with the cohort columns on save
+
+    Queryset `.update()` and `bulk_create` bypass `save`; callers set
+    `cohort_id` themselves there (see `Cohort.resolve_for` and
+    `assign_cohorts`).
+    """
+
+    async def save(
+        self, *args, update_fields: Optional[Iterable] = None, **kwargs
+    ):
+        if update_fields is None or set(COHORT_FIELDS) & set(update_fields):
+            self.cohort_id = await Cohort.resolve_for(self)
+            if update_fields is not None:
+                update_fields = [*update_fields, "cohort_id"]
+        try:
+            await super().save(*args, update_fields=update_fields, **kwargs)
+        except IntegrityError:
+            if not await Cohort.forget_missing([self.cohort_id]):
+                raise
+            self.cohort_id = await Cohort.resolve_for(self)
+            await super().save(*args, update_fields=update_fields, **kwargs)
@@ -1,5 +1,63 @@
-from tortoise import fields
-from models.base import BaseModel
+from typing import Dict, List, Optional
+from uuid import UUID
+
+from tortoise import connections, fields
+from models.base import BaseModel, PartialIndex, cohort_index, new_id
+from models.cohort import CohortMember
+
+# Inserts the submission only while the task is open, in the same
+# statement, and turns a repeat submission into an update.
+SUBMIT_SQL = """INSERT INTO "tasksubmission" AS s (
+    "id", "created_at", "updated_at", "user_id", "task_id", "url",
+    "submitted", "graded", "passed", "resubmissions"
+)
+SELECT $1, now(), now(), $2, t."id", $4, true, false, false, 0
+FROM "promotiontask" AS t
+WHERE t."id" = $3 AND t."active"
+AND (t."deadline" IS NULL OR t."deadline" > now())
+ON CONFLICT ("user_id", "task_id") DO UPDATE SET
+    "url" = EXCLUDED."url",
+    "updated_at" = EXCLUDED."updated_at",
+    "submitted" = true,
+    "graded" = false,
+    "passed" = false,
+    "resubmissions" = s."resubmissions" + 1,
+    "claimed_by_id" = NULL,
+    "claimed_until" = NULL
+WHERE NOT s."graded"
+RETURNING *"""
+
+# Takes the oldest ungraded submissions that are unclaimed or whose lease
+# has expired, skipping rows another grader is claiming right now. The
+# CTE is materialized so the locking query runs exactly once; as a
+# plain subquery the planner may rescan it and exceed the limit.
+CLAIM_SQL = """WITH next AS MATERIALIZED (
+    SELECT "id" FROM "tasksubmission"
+    WHERE NOT "graded" AND "submitted"
+    AND ("claimed_until" IS NULL OR "claimed_until" < now())
+    ORDER BY "created_at", "id"
+    LIMIT $3
+    FOR UPDATE SKIP LOCKED
+)
+UPDATE "tasksubmission" AS s SET
+    "claimed_by_id" = $1,
+    "claimed_until" = now() + make_interval(secs => $2),
+    "updated_at" = now()
+FROM next
+WHERE s."id" = next."id"
+RETURNING s.*"""
+
+GRADE_SQL = """UPDATE "tasksubmission" AS s SET
+    "graded" = true,
+    "passed" = g."passed",
+    "claimed_by_id" = NULL,
+    "claimed_until" = NULL,
+    "updated_at" = now()
+FROM unnest($1::uuid[], $2::bool[]) AS g("id", "passed")
+WHERE s."id" = g."id" AND s."claimed_by_id" = $3
+AND s."claimed_until" >= now()
+RETURNING s."id"
+"""
 
 
 class Notification(BaseModel):
@@ -9,7 +67,7 @@ class Notification(BaseModel):
     )
 
 
-class Announcement(BaseModel):
+class Announcement(CohortMember, BaseModel):
     title = fields.CharField(max_length=128, null=True)
     content = fields.CharField(max_length=655, null=True)
     creator = fields.ForeignKeyField(
@@ -20,15 +78,37 @@ class Announcement(BaseModel):
     track = fields.CharField(max_length=55, null=True)
     proficiency = fields.CharField(max_length=100, null=True)
     stage = fields.IntField(null=True)
+    cohort = fields.ForeignKeyField(
+        "models.Cohort",
+        related_name="announcements",
+        null=True,
+        on_delete=fields.RESTRICT,
+    )
 
+    class Meta:
+        indexes = (
+            cohort_index("announcement"),
+            PartialIndex(
+                fields=("created_at", "id"),
+                name="idx_announcement_general",
+                condition='"general"',
+            ),
+        )
 
-class Lesson(BaseModel):
+
+class Lesson(CohortMember, BaseModel):
     title = fields.CharField(max_length=128, null=True)
     content = fields.CharField(max_length=655, null=True)
     stack = fields.CharField(max_length=55, null=True)
     track = fields.CharField(max_length=55, null=True)
     proficiency = fields.CharField(max_length=55, null=True)
     stage = fields.IntField(null=True)
+    cohort = fields.ForeignKeyField(
+        "models.Cohort",
+        related_name="lessons",
+        null=True,
+        on_delete=fields.RESTRICT,
+    )
     creator = fields.ForeignKeyField(
         "models.User", related_name="lessons", null=True
     )
@@ -36,6 +116,9 @@ class Lesson(BaseModel):
         "models.Media", related_name="lessons", null=True
     )
 
+    class Meta:
+        indexes = (cohort_index("lesson"),)
+
 
 class Quiz(BaseModel):
     lesson = fields.ForeignKeyField(
@@ -45,24 +128,34 @@ class Quiz(BaseModel):
         "models.User", related_name="quizes", null=True
     )
     content = fields.CharField(max_length=655, null=True)
-    deadline = fields.DatetimeField(auto_now=False, null=True)
+    deadline = fields.DatetimeField(auto_now=False, null=True, index=True)
+    closed = fields.BooleanField(default=False)
     score = fields.FloatField(default=0.0, null=True)
 
 
-class PromotionTask(BaseModel):
+class PromotionTask(CohortMember, BaseModel):
     title = fields.CharField(max_length=128, null=True)
     content = fields.CharField(max_length=655, null=True)
     stack = fields.CharField(max_length=55, null=True)
     track = fields.CharField(max_length=55, null=True)
     proficiency = fields.CharField(max_length=55, null=True)
     stage = fields.IntField(null=True)
+    cohort = fields.ForeignKeyField(
+        "models.Cohort",
+        related_name="promotion_tasks",
+        null=True,
+        on_delete=fields.RESTRICT,
+    )
     feedback = fields.CharField(max_length=256, null=True)
     active = fields.BooleanField(default=False)
-    deadline = fields.DatetimeField(auto_now=False, null=True)
+    deadline = fields.DatetimeField(auto_now=False, null=True, index=True)
     creator = fields.ForeignKeyField(
         "models.User", related_name="promotion-tasks", null=True
     )
 
+    class Meta:
+        indexes = (cohort_index("promotiontask"),)
+
 
 class TaskSubmission(BaseModel):
     user = fields.ForeignKeyField(
@@ -75,9 +168,71 @@ class TaskSubmission(BaseModel):
     graded = fields.BooleanField(default=False)
     passed = fields.BooleanField(default=False)
     submitted = fields.BooleanField(default=False)
+    resubmissions = fields.IntField(default=0)
+    # The grader holding the submission and until when.
+    claimed_by = fields.ForeignKeyField(
+        "models.User",
+        related_name="claims",
+        null=True,
+        on_delete=fields.SET_NULL,
+    )
+    claimed_until = fields.DatetimeField(null=True)
+
+    class Meta:
+        unique_together = (("user", "task"),)
+        indexes = (
+            PartialIndex(
+                fields=("created_at", "id"),
+                name="idx_tasksubmission_ungraded",
+                condition='NOT "graded"',
+            ),
+        )
+
+    @classmethod
+    async def submit(
+        cls, user_id: UUID, task_id: UUID, url: str
+    ) -> Optional[dict]:
+        """Record a user's submission for a task in one statement.
+
+        A second submission replaces the url, releases any grader's claim
+        and counts a resubmission. Returns the submission row, or None if
+        the task does not exist, is inactive, its deadline has passed or
+        the submission has already been graded.
+        """
+        rows = await connections.get("default").execute_query_dict(
+            SUBMIT_SQL, [new_id(), user_id, task_id, url]
+        )
+        return rows[0] if rows else None
+
+    @classmethod
+    async def claim(
+        cls, grader_id: UUID, limit: int, lease: int
+    ) -> List[dict]:
+        """Claim up to `limit` ungraded submissions for `lease` seconds.
 
+        Returns the claimed rows, oldest first. Rows locked by a
+        concurrent claim are skipped rather than waited on, so graders
+        never block each other or claim the same submission.
+        """
+        rows = await connections.get("default").execute_query_dict(
+            CLAIM_SQL, [grader_id, lease, limit]
+        )
+        return sorted(rows, key=lambda row: (row["created_at"], row["id"]))
 
-class Resource(BaseModel):
+    @classmethod
+    async def grade(cls, grader_id: UUID, grades: Dict[UUID, bool]) -> set:
+        """Grade many claimed submissions in one statement.
+
+        Only submissions the grader still holds a lease on are graded.
+        Returns the ids that were.
+        """
+        rows = await connections.get("default").execute_query_dict(
+            GRADE_SQL, [list(grades), list(grades.values()), grader_id]
+        )
+        return {row["id"] for row in rows}
+
+
+class Resource(CohortMember, BaseModel):
     """Resources"""
 
     title = fields.CharField(max_length=128, null=True)
@@ -86,6 +241,12 @@ class Resource(BaseModel):
     track = fields.CharField(max_length=55, null=True)
     proficiency = fields.CharField(max_length=55, null=True)
     stage = fields.IntField(null=True)
+    cohort = fields.ForeignKeyField(
+        "models.Cohort",
+        related_name="resources",
+        null=True,
+        on_delete=fields.RESTRICT,
+    )
     creator = fields.ForeignKeyField(
         "models.User", related_name="resources", null=True
     )
@@ -93,6 +254,9 @@ class Resource(BaseModel):
         "models.Media", related_name="resources", null=True
     )
 
+    class Meta:
+        indexes = (cohort_index("resource"),)
+
 
 class Media(BaseModel):
     """Media contents
@@ -1,8 +1,13 @@
+from pypika.functions import Lower
+from pypika.terms import Field
 from tortoise import fields
-from models.base import BaseModel
+from tortoise.functions import Lower as LowerFunction
+from tortoise.queryset import QuerySet
+from models.base import BaseModel, UniqueIndex
+from models.cohort import CohortMember
 
 
-class User(BaseModel):
+class User(CohortMember, BaseModel):
     username = fields.CharField(max_length=55, null=True)
     first_name = fields.CharField(max_length=100, null=True)
     surname = fields.CharField(max_length=100, null=True)
@@ -13,11 +18,31 @@ class User(BaseModel):
     stack = fields.CharField(max_length=55, null=True)
     track = fields.CharField(max_length=55, null=True)
     proficiency = fields.CharField(max_length=55, null=True)
-    last_active = fields.DatetimeField(auto_now=True)
+    cohort = fields.ForeignKeyField(
+        "models.Cohort",
+        related_name="users",
+        null=True,
+        on_delete=fields.RESTRICT,
+    )
+    last_active = fields.DatetimeField(auto_now_add=True, index=True)
     is_admin = fields.BooleanField(default=False)
     hashed_password = fields.CharField(max_length=255, null=True)
     email_verified = fields.BooleanField(default=False)
 
+    class Meta:
+        indexes = (UniqueIndex(Lower(Field("email")), name="uidx_user_email"),)
+
+    @staticmethod
+    def normalize_email(email: str) -> str:
+        return email.strip().lower()
+
+    @classmethod
+    def by_email(cls, email: str) -> QuerySet:
+        """Filter on LOWER(email), which the unique index serves."""
+        return cls.annotate(email_lower=LowerFunction("email")).filter(
+            email_lower=cls.normalize_email(email)
+        )
+
 
 class Picture(BaseModel):
     user = fields.ForeignKeyField(
@@ -1,28 +1,46 @@
 # Libraries
 from uuid import UUID
 from jose import JWTError, jwt
-from passlib.context import CryptContext
-from datetime import datetime, timedelta, timezone
-from fastapi import APIRouter, status, Path, HTTPException, Security
+from datetime import datetime, timezone
+from pydantic import ValidationError
+from fastapi import APIRouter, Depends, status, Path, HTTPException, Security
+from tortoise.exceptions import IntegrityError
 
 # Files, Models, Schemas, Dependencies
 from models.user import User
 from library.security.otp import otp_manager
-from library.dependencies.utils import to_lower_case
-from library.dependencies.auth import get_current_user
+from library.security.password import password_hasher
+from library.security.tokens import (
+    REFRESH,
+    RESET,
+    create_access_token,
+    create_refresh_token,
+    create_reset_token,
+    expire_user_claims,
+    revoke_token,
+    revoke_user_tokens,
+    is_revoked,
+)
+from library.dependencies.auth import (
+    oauth2_scheme,
+    get_current_user,
+    get_current_principal,
+    invalidate_user,
+    decode_token,
+)
 from library.schemas.register import UserCreate, EmailVerify, UserPublic
 from library.schemas.auth import (
     LoginSchema,
     AuthResponse,
-    JWTSchema,
+    TokenClaims,
     PasswordResetSchema,
     ForgotPasswordSchema,
+    RefreshSchema,
 )
 from config import SECRET_KEY, ALGORITHM
 
 
 router = APIRouter(prefix="/auth")
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 
 @router.post(
@@ -45,24 +63,26 @@ async def register(data: UserCreate):
         HTTP_400_BAD_REQUEST if user exists or weak password
     """
 
-    # Converts user email to lower-case
-    valid_email = to_lower_case(data.email)
-
-    email_exist = await User.exists(email=valid_email)
-    if email_exist:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="User with this email already exist",
-        )
-
-    hashed_password = pwd_context.hash(data.password)
-
-    created_user = await User.create(
-        **data.dict(exclude_unset=True, exclude={"password"}),
-        hashed_password=hashed_password,
-        stage=0,
+    user_exists = HTTPException(
+        status_code=status.HTTP_400_BAD_REQUEST,
+        detail="User with this email already exist",
     )
-    otp = otp_manager.create_otp(user_id=str(created_user.id))
+    # Checked before hashing, so duplicate signups cannot tie up the
+    # hashing pool. The unique index on LOWER(email) still rejects a
+    # duplicate registered concurrently.
+    if await User.by_email(data.email).exists():
+        raise user_exists
+    hashed_password = await password_hasher.hash(data.password)
+    try:
+        created_user = await User.create(
+            **data.dict(exclude_unset=True, exclude={"password", "email"}),
+            email=User.normalize_email(data.email),
+            hashed_password=hashed_password,
+            stage=0,
+        )
+    except IntegrityError as e:
+        raise user_exists from e
+    otp = await otp_manager.create_otp(user_id=str(created_user.id))
     # pending - send otp as background task to registered email
     return created_user
 
@@ -95,7 +115,7 @@ async def set_permission(
             detail="Only admins can set permission",
             status_code=status.HTTP_401_UNAUTHORIZED,
         )
-    user = await User.get_or_none(email=email)
+    user = await User.by_email(email).get_or_none()
     if not user:
         raise HTTPException(
             detail="User not found", status_code=status.HTTP_404_NOT_FOUND
@@ -109,7 +129,9 @@ async def set_permission(
             detail="Permission not set",
             status_code=status.HTTP_424_FAILED_DEPENDENCY,
         )
-    return await User.get_or_none(email=email)
+    await expire_user_claims(user.id)
+    await invalidate_user(user.id)
+    return await User.get_or_none(id=user.id)
 
 
 @router.put(
@@ -129,7 +151,7 @@ async def email_verification(otp: str = Path(...)):
     Raises:
         HTTP_401_UNAUTHORIZED if otp is invalid, expired or verification fails
     """
-    user_id = otp_manager.get_otp_user(otp)
+    user_id = await otp_manager.consume_otp(otp)
     if not user_id:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -162,7 +184,7 @@ async def login(data: LoginSchema):
     Raises:
         HTTP_401_UNAUTHORIZED if login credentials are incorrect
     """
-    user = await User.get_or_none(email=data.email)
+    user = await User.by_email(data.email).get_or_none()
 
     if user is None:
         raise HTTPException(
@@ -176,7 +198,7 @@ async def login(data: LoginSchema):
         )
     # Check password.
     hashed_password = user.hashed_password
-    is_valid_password: bool = pwd_context.verify(
+    is_valid_password: bool = await password_hasher.verify(
         data.password, hashed_password
     )
     if not is_valid_password:
@@ -185,14 +207,105 @@ async def login(data: LoginSchema):
             detail="Your email or password is incorrect.",
         )
 
-    # Generate an auth token.
-    jwt_data = JWTSchema(user_id=str(user.id))
-    to_encode = jwt_data.dict()
-    expire = datetime.now(timezone.utc) + timedelta(days=30)
-    to_encode.update({"expire": str(expire)})
+    # Generate an access token and a refresh token.
+    return AuthResponse(
+        user=user,
+        token=create_access_token(user),
+        refresh_token=create_refresh_token(user),
+    )
+
 
-    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
-    return AuthResponse(user=user, token=encoded_jwt)
+async def decode_refresh_token(refresh_token: str) -> TokenClaims:
+    """Decode a refresh token and check that it is still usable."""
+    refresh_exception = HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Your refresh token is invalid or expired. Please login.",
+    )
+    try:
+        payload = jwt.decode(refresh_token, SECRET_KEY, algorithms=[ALGORITHM])
+        claims = TokenClaims(**payload)
+    except (JWTError, ValidationError) as e:
+        raise refresh_exception from e
+    if claims.type != REFRESH or claims.expire is None:
+        raise refresh_exception
+    if datetime.now(timezone.utc) > claims.expire:
+        raise refresh_exception
+    if await is_revoked(claims):
+        raise refresh_exception
+    return claims
+
+
+@router.post(
+    "/refresh/",
+    response_model=AuthResponse,
+    name="auth:refresh",
+    status_code=status.HTTP_200_OK,
+)
+async def refresh(data: RefreshSchema):
+    """Exchanges a refresh token for a new token pair
+
+    The refresh token is rotated: the one presented is revoked and a new
+    one is returned alongside a fresh access token, so role and cohort
+    claims are re-read from the database.
+    Args:
+        data - a pydantic schema holding the refresh token
+    Return:
+        HTTP_200_OK (with user details as defined in the response model)
+    Raises:
+        HTTP_401_UNAUTHORIZED if the refresh token is invalid or revoked
+    """
+    claims = await decode_refresh_token(data.refresh_token)
+    user = await User.get_or_none(id=claims.user_id)
+    if user is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="This user does not exist.",
+        )
+    # Revoking is atomic, so a refresh token can only be exchanged once.
+    if not await revoke_token(claims.jti, claims.expire):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Your refresh token is invalid or expired. Please login.",
+        )
+    return AuthResponse(
+        user=user,
+        token=create_access_token(user),
+        refresh_token=create_refresh_token(user),
+    )
+
+
+@router.post(
+    "/logout/",
+    name="auth:logout",
+    status_code=status.HTTP_200_OK,
+)
+async def logout(
+    data: RefreshSchema,
+    token: str = Depends(oauth2_scheme),
+    current_user=Security(get_current_principal, scopes=["base"]),
+):
+    """Revokes the current access token and its refresh token
+
+    Args:
+        data - a pydantic schema holding the refresh token
+        token - the bearer access token of the request
+        current_user - retrieved from login auth
+    Return:
+        HTTP_200_OK response with a success message
+    Raises:
+        HTTP_401_UNAUTHORIZED if either token is invalid
+    """
+    access_claims = await decode_token(token)
+    refresh_claims = await decode_refresh_token(data.refresh_token)
+    if refresh_claims.user_id != access_claims.user_id:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Your refresh token is invalid or expired. Please login.",
+        )
+    if access_claims.jti:
+        await revoke_token(access_claims.jti, access_claims.expire)
+    await revoke_token(refresh_claims.jti, refresh_claims.expire)
+    return {"message": "Logout successful"}
 
 
 @router.post(
@@ -210,15 +323,13 @@ async def forgot_password(data: ForgotPasswordSchema):
     Raises:
         HTTP_401_UNAUTHORIZED if data doesn't match any entry in the DB
     """
-    user = await User.get_or_none(email=data.email)
+    user = await User.by_email(data.email).get_or_none()
     if not user:
         raise HTTPException(
             detail="User does not exist",
             status_code=status.HTTP_401_UNAUTHORIZED,
         )
-    expire = datetime.now(timezone.utc) + timedelta(seconds=600)
-    to_encode = {"user_id": str(user.id), "expire": str(expire)}
-    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+    encoded_jwt = create_reset_token(user)
     # pending - send jwt token to user email as a background task
     return {"message": f"Password reset link sent to {data.email}"}
 
@@ -247,33 +358,38 @@ async def password_reset(data: PasswordResetSchema, token: str = Path(...)):
     )
     try:
         # Decodes token
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        user_id: str = payload.get("user_id")
-        expire = payload.get("expire")
-        if user_id is None or expire is None:
-            raise credentials_exception
-    except JWTError as e:
+        claims = TokenClaims(
+            **jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        )
+    except (JWTError, ValidationError) as e:
         raise credentials_exception from e
+    # Only reset tokens are accepted; access and refresh tokens carry
+    # the same user_id and expire claims.
+    if claims.type != RESET or claims.expire is None:
+        raise credentials_exception
 
-    # Check token expiration
-    if str(datetime.now(timezone.utc)) > expire:
+    # Check token expiration. A completed reset revokes the link too.
+    if datetime.now(timezone.utc) > claims.expire or await is_revoked(claims):
         raise HTTPException(
             status_code=401,
             detail="Token expired or invalid!",
         )
 
     # Fetches associated user from db
-    user = await User.get_or_none(id=user_id)
+    user = await User.get_or_none(id=claims.user_id)
 
     if not user:
         raise HTTPException(
             detail="User not found or does not exist",
             status_code=status.HTTP_401_UNAUTHORIZED,
         )
-    new_hashed_password = pwd_context.hash(data.password)
+    new_hashed_password = await password_hasher.hash(data.password)
     pwd_reset = await User.get(id=user.id).update(
         hashed_password=new_hashed_password
     )
+    await invalidate_user(user.id)
+    # End every session opened with the old password.
+    await revoke_user_tokens(user.id)
 
     if not pwd_reset:
         raise HTTPException(
@@ -281,19 +397,3 @@ async def password_reset(data: PasswordResetSchema, token: str = Path(...)):
             status_code=status.HTTP_424_FAILED_DEPENDENCY,
         )
     return {"message": "Password reset successful"}
-
-
-# @router.get(
-#     "/logout/",
-#     status_code=status.HTTP_200_OK,
-# )
-# async def logout(current_user=Security(get_current_user, scopes=["base"])):
-
-#     jwt_data = JWTSchema(user_id=str(current_user.id))
-#     to_encode = jwt_data.dict()
-#     expire = datetime.now()
-#     # expire = datetime.now(timezone.utc) - timedelta(days=1)
-#     to_encode.update({"expire": str(expire)})
-
-#     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
-#     return AuthResponse(user=current_user, token=encoded_jwt)
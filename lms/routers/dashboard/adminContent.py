@@ -0,0 +1,320 @@
+import time
+from datetime import datetime, timezone
+from typing import List, Optional, Tuple
+
+from fastapi import (
+    APIRouter,
+    File,
+    HTTPException,
+    Query,
+    Security,
+    UploadFile,
+    status,
+)
+from pydantic import ValidationError
+from tortoise.exceptions import IntegrityError
+from tortoise.functions import Lower
+
+from config import GRADING_LEASE, GRADING_CLAIM_SIZE, MAX_PAGE_SIZE
+from library.dependencies.auth import (
+    get_current_principal,
+    get_current_user,
+    token_cache,
+    user_cache,
+)
+from library.dependencies.analytics import quiz_stats
+from library.dependencies.imports import ImportReport, read_csv
+from library.dependencies.pagination import render
+from library.jobs.activity import activity_tracker
+from library.jobs.promotion import promote_students
+from library.schemas.dashboard import (
+    GradeBatch,
+    PromotionRun,
+    SubmissionClaim,
+)
+from library.schemas.enums import Proficiency, Stack, Track
+from library.schemas.register import UserImport
+from library.security.otp import otp_manager
+from library.security.password import password_hasher
+from models.cohort import Cohort, assign_cohorts
+from models.dashboard import TaskSubmission
+from models.user import User
+
+router = APIRouter(prefix="/dashboard/admin")
+
+
+def require_admin(current_user, action: str) -> None:
+    if not current_user.is_admin:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail=f"Only an admin can {action}.",
+        )
+
+
+@router.get(
+    "/active-users/",
+    name="admin:active-users",
+    status_code=status.HTTP_200_OK,
+)
+async def active_users(
+    minutes: int = Query(15, ge=1, le=60 * 24 * 30),
+    current_user=Security(get_current_principal, scopes=["base", "root"]),
+):
+    """Counts users active in the last `minutes` minutes
+
+    Args:
+        minutes - size of the activity window
+        current_user - retrieved from login auth
+    Return:
+        HTTP_200_OK response with the number of active users
+    Raises:
+        HTTP_401_UNAUTHORIZED if the current_user is not an admin
+    """
+    require_admin(current_user, "view activity")
+    cutoff = time.time() - minutes * 60
+    # Activity not yet flushed is counted from Redis; the rest from the
+    # last_active index.
+    pending = await activity_tracker.pending()
+    recent = {user_id for user_id, ts in pending.items() if ts >= cutoff}
+    flushed = (
+        await User.filter(
+            last_active__gte=datetime.fromtimestamp(cutoff, timezone.utc)
+        )
+        .exclude(id__in=list(pending))
+        .count()
+    )
+    return {"minutes": minutes, "active": flushed + len(recent)}
+
+
+async def import_users(
+    rows: List[Tuple[int, dict]], seen: set, report: ImportReport
+):
+    """Validate, hash and insert one chunk of imported users."""
+    valid = []
+    for number, row in rows:
+        report.rows += 1
+        try:
+            data = UserImport(**row)
+        except ValidationError as e:
+            report.error(number, e)
+            continue
+        email = User.normalize_email(data.email)
+        if email in seen:
+            report.error(number, "Duplicate email in this file")
+            continue
+        seen.add(email)
+        valid.append((number, email, data))
+
+    existing = set(
+        await User.annotate(email_lower=Lower("email"))
+        .filter(email_lower__in=[email for _, email, _ in valid])
+        .values_list("email_lower", flat=True)
+    )
+    for number, email, _ in valid:
+        if email in existing:
+            report.error(number, "User with this email already exist")
+    valid = [entry for entry in valid if entry[1] not in existing]
+    if not valid:
+        return
+
+    hashes = await password_hasher.hash_many(
+        data.password for _, _, data in valid
+    )
+    users = [
+        User(
+            **data.dict(exclude={"password", "email"}),
+            email=email,
+            hashed_password=hashed_password,
+        )
+        for (_, email, data), hashed_password in zip(valid, hashes)
+    ]
+    await assign_cohorts(users)
+    try:
+        await User.bulk_create(users)
+        created = users
+    except IntegrityError:
+        # Someone registered one of these emails meanwhile: insert the
+        # chunk row by row to find out which.
+        created = []
+        for (number, _, _), user in zip(valid, users):
+            try:
+                await user.save()
+                created.append(user)
+            except IntegrityError:
+                report.error(number, "User with this email already exist")
+    report.created += len(created)
+    await otp_manager.create_otps(str(user.id) for user in created)
+
+
+@router.get(
+    "/stats/",
+    name="admin:stats",
+    status_code=status.HTTP_200_OK,
+)
+async def runtime_stats(
+    current_user=Security(get_current_principal, scopes=["base", "root"]),
+):
+    """Reports this worker's auth cache and password hashing metrics
+
+    Args:
+        current_user - retrieved from login auth
+    Return:
+        HTTP_200_OK response with the size and hit/miss counters of the
+        token and user caches, and the password hasher's queue metrics
+    Raises:
+        HTTP_401_UNAUTHORIZED if the current_user is not an admin
+    """
+    require_admin(current_user, "view stats")
+    return {
+        "token_cache": token_cache.stats(),
+        "user_cache": user_cache.stats(),
+        "password_hasher": password_hasher.stats(),
+    }
+
+
+@router.post(
+    "/users/import/",
+    name="admin:import-users",
+    status_code=status.HTTP_200_OK,
+)
+async def import_users_csv(
+    file: UploadFile = File(...),
+    current_user=Security(get_current_user, scopes=["base", "root"]),
+):
+    """Registers users in bulk from an uploaded CSV
+
+    The CSV needs first_name, surname, email and password columns, and
+    may set stage, stack, track and proficiency. Rows are validated like
+    a registration; invalid rows are skipped and reported.
+
+    Args:
+        file - the CSV upload
+        current_user - retrieved from login auth
+    Return:
+        HTTP_200_OK response with the number of users created, the
+        errors per row and the import throughput
+    Raises:
+        HTTP_401_UNAUTHORIZED if the current_user is not an admin
+    """
+    require_admin(current_user, "import users")
+    report = ImportReport()
+    seen = set()
+    async for rows in read_csv(file):
+        await import_users(rows, seen, report)
+    return report.result()
+
+
+@router.post(
+    "/submissions/claim/",
+    name="admin:claim-submissions",
+    status_code=status.HTTP_200_OK,
+)
+async def claim_submissions(
+    limit: int = Query(GRADING_CLAIM_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    current_user=Security(get_current_principal, scopes=["base", "root"]),
+):
+    """Claims the next ungraded task submissions for grading
+
+    Args:
+        limit - the most submissions to claim
+        current_user - retrieved from login auth
+    Return:
+        HTTP_200_OK response with the claimed submissions, oldest first.
+        They are held for GRADING_LEASE seconds, then released to other
+        graders if not graded.
+    Raises:
+        HTTP_401_UNAUTHORIZED if the current_user is not an admin
+    """
+    require_admin(current_user, "grade submissions")
+    rows = await TaskSubmission.claim(current_user.id, limit, GRADING_LEASE)
+    return render({"results": [SubmissionClaim(**row).dict() for row in rows]})
+
+
+@router.post(
+    "/submissions/grade/",
+    name="admin:grade-submissions",
+    status_code=status.HTTP_200_OK,
+)
+async def grade_submissions(
+    data: GradeBatch,
+    current_user=Security(get_current_principal, scopes=["base", "root"]),
+):
+    """Grades a batch of claimed task submissions
+
+    Args:
+        data - pass or fail for each submission
+        current_user - retrieved from login auth
+    Return:
+        HTTP_200_OK response with the ids graded, and the ids rejected
+        because the grader no longer holds their claim
+    Raises:
+        HTTP_401_UNAUTHORIZED if the current_user is not an admin
+    """
+    require_admin(current_user, "grade submissions")
+    grades = {grade.id: grade.passed for grade in data.grades}
+    graded = await TaskSubmission.grade(current_user.id, grades)
+    return {
+        "graded": [i for i in grades if i in graded],
+        "rejected": [i for i in grades if i not in graded],
+    }
+
+
+@router.post(
+    "/promotions/",
+    name="admin:promote",
+    status_code=status.HTTP_200_OK,
+)
+async def promote(
+    data: PromotionRun,
+    current_user=Security(get_current_user, scopes=["base", "root"]),
+):
+    """Promotes every student who passed their stage's promotion tasks
+
+    Args:
+        data - the stage to promote from, all stages if unset, and
+            whether to only report who would be promoted
+        current_user - retrieved from login auth
+    Return:
+        HTTP_200_OK response with the students eligible and promoted,
+        per stage, and the time taken
+    Raises:
+        HTTP_401_UNAUTHORIZED if the current_user is not an admin
+    """
+    require_admin(current_user, "promote students")
+    return await promote_students(stage=data.stage, dry_run=data.dry_run)
+
+
+@router.get(
+    "/quiz-stats/",
+    name="admin:quiz-stats",
+    status_code=status.HTTP_200_OK,
+)
+async def cohort_quiz_stats(
+    stage: int = Query(..., ge=0, le=10),
+    stack: Stack = Query(...),
+    track: Optional[Track] = Query(None),
+    proficiency: Optional[Proficiency] = Query(None),
+    current_user=Security(get_current_principal, scopes=["base", "root"]),
+):
+    """Reports quiz score statistics for a cohort
+
+    Args:
+        stage, stack, track, proficiency - the cohort
+        current_user - retrieved from login auth
+    Return:
+        HTTP_200_OK response with the score mean, spread, percentiles and
+        histogram, and the cohort's lessons hardest first
+    Raises:
+        HTTP_401_UNAUTHORIZED if the current_user is not an admin
+        HTTP_404_NOT_FOUND if nobody has been in the cohort
+    """
+    require_admin(current_user, "view quiz statistics")
+    cohort = await Cohort.get_or_none(
+        key=Cohort.make_key(stage, stack, track, proficiency)
+    )
+    if cohort is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Cohort not found.",
+        )
+    return render(await quiz_stats.get(cohort.id))
@@ -1,21 +1,113 @@
 from datetime import datetime, timedelta, timezone
-from fastapi import APIRouter, status, HTTPException, Security, Path
-from library.dependencies.auth import get_current_user
+from functools import partial
+from typing import Optional
+from uuid import UUID
+from fastapi import (
+    APIRouter,
+    Depends,
+    Request,
+    status,
+    HTTPException,
+    Security,
+    Path,
+    Header,
+)
+from pydantic import ValidationError
+from library.dependencies.auth import (
+    get_current_user,
+    get_current_principal,
+)
 from library.dependencies.utils import get_queryset
+from library.dependencies.pagination import (
+    CursorParams,
+    dumps,
+    paginate,
+    render,
+)
+from library.dependencies.idempotency import idempotency
+from library.dependencies.feed_cache import feed_cache
+from library.dependencies.loaders import CreatorLoader
+from library.dependencies.streaming import ExportParams, stream_response
+from library.dependencies.imports import ImportReport, read_jsonl
+from library.jobs.deadlines import deadline_scheduler
 from library.schemas.dashboard import (
     LessonCreate,
+    LessonItem,
     LessonResponse,
     PromoTaskCreate,
+    PromotionTaskItem,
     ResourceCreate,
+    ResourceItem,
     ResourceResponse,
     TaskSubmissionSchema,
     TaskPublicSchema,
 )
+from models.cohort import create_in_cohorts
 from models.dashboard import Lesson, PromotionTask, Resource, TaskSubmission
 
 router = APIRouter(prefix="/dashboard")
 
 
+def promotion_task_fields(data: PromoTaskCreate) -> dict:
+    """Return the columns of a new, active promotional task."""
+    return {
+        **data.dict(exclude_unset=True, exclude={"deadline"}),
+        "active": True,
+        "deadline": datetime.now(timezone.utc) + timedelta(days=data.deadline),
+    }
+
+
+async def import_content(
+    request: Request,
+    current_user,
+    model,
+    schema,
+    feed: str,
+    build=None,
+    on_create=None,
+) -> dict:
+    """Create content in bulk from a JSON-lines request body
+
+    Rows are validated with `schema` as they stream in and inserted a
+    chunk per transaction with `bulk_create`, then passed to `on_create`
+    if given. Each affected cohort feed is invalidated once, after the
+    last chunk.
+    """
+    if build is None:
+
+        def build(data):
+            return data.dict(exclude_unset=True)
+
+    report = ImportReport()
+    keys = set()
+    try:
+        async for rows in read_jsonl(request):
+            items = []
+            for number, row, error in rows:
+                report.rows += 1
+                if error is not None:
+                    report.error(number, error)
+                    continue
+                try:
+                    data = schema(**row)
+                except ValidationError as e:
+                    report.error(number, e)
+                    continue
+                items.append(model(**build(data), creator=current_user))
+            if not items:
+                continue
+            await create_in_cohorts(model, items)
+            report.created += len(items)
+            if on_create is not None:
+                on_create(*items)
+            keys.update(feed_cache.key(feed, item) for item in items)
+    finally:
+        # Also runs if a later chunk fails, for the chunks committed.
+        for key in keys:
+            await feed_cache.invalidate(key)
+    return report.result()
+
+
 @router.post(
     "/lessons/",
     name="lesson:create",
@@ -51,39 +143,113 @@ async def create_lesson(
             detail="Lesson creation failed",
             status_code=status.HTTP_424_FAILED_DEPENDENCY,
         )
+    await feed_cache.invalidate(feed_cache.key("lesson", lesson))
     return lesson
 
 
+@router.post(
+    "/lessons/import/",
+    name="lesson:import",
+    status_code=status.HTTP_200_OK,
+    description="Create lessons in bulk from JSON lines.",
+)
+async def import_lessons(
+    request: Request,
+    current_user=Security(get_current_user, scopes=["base", "root"]),
+):
+    """Handles bulk lesson creation from a JSON-lines body
+
+    Args:
+        request - one LessonCreate object per line
+        current_user - retrieved from login auth
+    Return:
+        HTTP_200_OK response with the number of lessons created, the
+        errors per line and the import throughput
+    Raises:
+        HTTP_401_UNAUTHORIZED if the current_user is not an admin
+    """
+    if not current_user.is_admin:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Only an admin can import lessons.",
+        )
+    return await import_content(
+        request, current_user, Lesson, LessonCreate, "lesson"
+    )
+
+
 @router.get(
     "/lessons/",
     name="dashboard:all-lessons",
     status_code=status.HTTP_200_OK,
 )
 async def get_lessons(
-    current_user=Security(get_current_user, scopes=["base"])
+    request: Request,
+    params: CursorParams = Depends(),
+    loader: CreatorLoader = Depends(),
+    current_user=Security(get_current_principal, scopes=["base"]),
 ):
-    """Gets all lessons using key fields in User object
+    """Gets lessons using key fields in User object, newest first
 
     Args:
+        params - cursor and page size query parameters
         current_user - retrieved from login auth
     Return:
-        HTTP_200_OK response with a list of all related lessons
+        HTTP_200_OK response with a page of related lessons and the
+        cursor of the next page
     Raises:
-        HTTP_424_FAILED_DEPENDENCY if DB service fails retrieve objects
+        HTTP_422_UNPROCESSABLE_ENTITY if the cursor is invalid
     """
     if current_user.is_admin:
-        return await Lesson.all().order_by("-created_at")
-    user_lessons = await Lesson.filter(**get_queryset(current_user)).order_by(
-        "-created_at"
+        return await feed_cache.conditional(
+            request,
+            [feed_cache.all_key("lesson")],
+            params,
+            lambda: paginate(Lesson.all(), params, LessonItem, loader),
+        )
+    key = feed_cache.key("lesson", current_user)
+    return await feed_cache.conditional(
+        request,
+        [key],
+        params,
+        lambda: feed_cache.fetch(
+            key,
+            params,
+            lambda: paginate(
+                Lesson.filter(**get_queryset(current_user)),
+                params,
+                LessonItem,
+                loader,
+            ),
+        ),
     )
-    try:
-        len(user_lessons)
-        return user_lessons
-    except TypeError as e:
+
+
+@router.get(
+    "/lessons/export/",
+    name="dashboard:export-lessons",
+    status_code=status.HTTP_200_OK,
+)
+async def export_lessons(
+    params: ExportParams = Depends(),
+    current_user=Security(get_current_principal, scopes=["base", "root"]),
+):
+    """Streams every lesson to an admin
+
+    Args:
+        params - export format, `json` (default) or `ndjson`
+        current_user - retrieved from login auth
+    Return:
+        HTTP_200_OK streamed response with all lessons, newest first
+    Raises:
+        HTTP_401_UNAUTHORIZED if the current_user is not an admin
+    """
+    if not current_user.is_admin:
         raise HTTPException(
-            detail="Failed to get all lessons",
-            status_code=status.HTTP_424_FAILED_DEPENDENCY,
-        ) from e
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Only an admin can export lessons.",
+        )
+    return stream_response(Lesson.all(), params)
 
 
 @router.post(
@@ -111,51 +277,130 @@ async def create_promotion_task(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Only an admin can create promotional tasks.",
         )
-    deadline = datetime.now(timezone.utc) + timedelta(days=data.deadline)
     promo_task = await PromotionTask.create(
-        **data.dict(exclude_unset=True, exclude={"deadline"}),
-        creator=current_user,
-        active=True,
-        deadline=deadline
+        **promotion_task_fields(data), creator=current_user
     )
     if not promo_task:
         raise HTTPException(
             detail="Task creation failed",
             status_code=status.HTTP_424_FAILED_DEPENDENCY,
         )
+    await feed_cache.invalidate(feed_cache.key("promotiontask", promo_task))
+    deadline_scheduler.schedule("promotiontask", promo_task)
     return promo_task
 
 
+@router.post(
+    "/promotion-tasks/import/",
+    name="promotion-task:import",
+    status_code=status.HTTP_200_OK,
+    description="Create promotional tasks in bulk from JSON lines.",
+)
+async def import_promotion_tasks(
+    request: Request,
+    current_user=Security(get_current_user, scopes=["base", "root"]),
+):
+    """Handles bulk promotional task creation from a JSON-lines body
+
+    Args:
+        request - one PromoTaskCreate object per line
+        current_user - retrieved from login auth
+    Return:
+        HTTP_200_OK response with the number of promotional tasks created, the
+        errors per line and the import throughput
+    Raises:
+        HTTP_401_UNAUTHORIZED if the current_user is not an admin
+    """
+    if not current_user.is_admin:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Only an admin can import promotional tasks.",
+        )
+    return await import_content(
+        request,
+        current_user,
+        PromotionTask,
+        PromoTaskCreate,
+        "promotiontask",
+        build=promotion_task_fields,
+        on_create=partial(deadline_scheduler.schedule, "promotiontask"),
+    )
+
+
 @router.get(
     "/promotion-tasks/",
     name="dashboard:all-promotion-task",
     status_code=status.HTTP_200_OK,
 )
 async def get_promotion_tasks(
-    current_user=Security(get_current_user, scopes=["base"])
+    request: Request,
+    params: CursorParams = Depends(),
+    loader: CreatorLoader = Depends(),
+    current_user=Security(get_current_principal, scopes=["base"]),
 ):
-    """Gets all promotional tasks using key fields in User object
+    """Gets promotional tasks using key fields in User object, newest first
 
     Args:
+        params - cursor and page size query parameters
         current_user - retrieved from login auth
     Return:
-        HTTP_200_OK response with a list of all promotional tasks
+        HTTP_200_OK response with a page of promotional tasks and the
+        cursor of the next page
     Raises:
-        HTTP_424_FAILED_DEPENDENCY if DB service fails retrieve objects
+        HTTP_422_UNPROCESSABLE_ENTITY if the cursor is invalid
     """
     if current_user.is_admin:
-        return await PromotionTask.all().order_by("-created_at")
-    user_tasks = await PromotionTask.filter(
-        **get_queryset(current_user)
-    ).order_by("-created_at")
-    try:
-        len(user_tasks)
-        return user_tasks
-    except TypeError as e:
+        return await feed_cache.conditional(
+            request,
+            [feed_cache.all_key("promotiontask")],
+            params,
+            lambda: paginate(
+                PromotionTask.all(), params, PromotionTaskItem, loader
+            ),
+        )
+    key = feed_cache.key("promotiontask", current_user)
+    return await feed_cache.conditional(
+        request,
+        [key],
+        params,
+        lambda: feed_cache.fetch(
+            key,
+            params,
+            lambda: paginate(
+                PromotionTask.filter(**get_queryset(current_user)),
+                params,
+                PromotionTaskItem,
+                loader,
+            ),
+        ),
+    )
+
+
+@router.get(
+    "/promotion-tasks/export/",
+    name="dashboard:export-promotion-tasks",
+    status_code=status.HTTP_200_OK,
+)
+async def export_promotion_tasks(
+    params: ExportParams = Depends(),
+    current_user=Security(get_current_principal, scopes=["base", "root"]),
+):
+    """Streams every promotional task to an admin
+
+    Args:
+        params - export format, `json` (default) or `ndjson`
+        current_user - retrieved from login auth
+    Return:
+        HTTP_200_OK streamed response with all promotional tasks, newest first
+    Raises:
+        HTTP_401_UNAUTHORIZED if the current_user is not an admin
+    """
+    if not current_user.is_admin:
         raise HTTPException(
-            detail="Failed to get all promotional tasks",
-            status_code=status.HTTP_424_FAILED_DEPENDENCY,
-        ) from e
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Only an admin can export promotional tasks.",
+        )
+    return stream_response(PromotionTask.all(), params)
 
 
 @router.get(
@@ -165,7 +410,8 @@ async def get_promotion_tasks(
 )
 async def get_promotion_task(
     task_id: str = Path(...),
-    current_user=Security(get_current_user, scopes=["base"]),
+    loader: CreatorLoader = Depends(),
+    current_user=Security(get_current_principal, scopes=["base"]),
 ):
     """Gets a promotional task by id
 
@@ -189,7 +435,7 @@ async def get_promotion_task(
             detail="Failed to get task",
             status_code=status.HTTP_424_FAILED_DEPENDENCY,
         )
-    return task
+    return (await loader.attach([task]))[0]
 
 
 @router.post(
@@ -202,6 +448,7 @@ async def get_promotion_task(
 async def submit_task(
     data: TaskSubmissionSchema,
     task_id: str = Path(...),
+    idempotency_key: Optional[str] = Header(None, max_length=255),
     current_user=Security(get_current_user, scopes=["base", "root"]),
 ):
     """
@@ -210,43 +457,76 @@ async def submit_task(
     Args:
         data - A pydantic schema that defines the task url to be submitted.
         task_id - The task id for which a task is to be submitted.
+        idempotency_key - Optional Idempotency-Key header. A retry with
+            the same key gets the first response back.
         current_user - Retrieved from login path.
 
     Return:
-        HTTP_201_CREATED when a submission is made (created)
+        HTTP_201_CREATED when a submission is made (created). Submitting
+        again replaces the url of the existing submission.
 
     Raise:
         HTTP_404_NOT_FOUND task not found
         HTTP_422_UNPROCESSABLE_ENTITY if task ID is invalid UUID type
-        HTTP_409_CONFLICT task deadline has elapsed or no longer active.
+        HTTP_409_CONFLICT task deadline has elapsed or no longer active,
+            or a request with the same Idempotency-Key is in progress.
     """
     try:
-        task = await PromotionTask.get_or_none(id=task_id)
-    except TypeError as e:
+        task_id = UUID(task_id)
+    except ValueError as e:
         raise HTTPException(
             status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
             detail="Task ID is an Invalid UUID type.",
         ) from e
+    key = None
+    if idempotency_key:
+        key = idempotency.key(
+            current_user.id, f"task:{task_id}", idempotency_key
+        )
+        body = await idempotency.claim(key)
+        if body is not None:
+            return render(body, status_code=status.HTTP_201_CREATED)
+    try:
+        submission = await TaskSubmission.submit(
+            current_user.id, task_id, data.url
+        )
+        if submission is None:
+            await raise_task_closed(task_id, current_user.id)
+        body = dumps(TaskPublicSchema(**submission).dict())
+    except Exception:
+        if key is not None:
+            await idempotency.release(key)
+        raise
+    if key is not None:
+        await idempotency.store(key, body)
+    return render(body, status_code=status.HTTP_201_CREATED)
+
+
+async def raise_task_closed(task_id: UUID, user_id: UUID):
+    """Raise the reason a task refused a submission."""
+    task = await PromotionTask.get_or_none(id=task_id)
     if task is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Promotional task not found",
         )
-    # check to know if promotional task  is still active
-    if str(task.deadline) < str(datetime.now()):
+    if await TaskSubmission.exists(
+        user_id=user_id, task_id=task_id, graded=True
+    ):
         raise HTTPException(
             status_code=status.HTTP_409_CONFLICT,
-            detail="Task deadline has elapsed.",
+            detail="Submission has already been graded.",
         )
-    if task.active is False:
+    # check to know if promotional task  is still active
+    if task.deadline and task.deadline <= datetime.now(timezone.utc):
         raise HTTPException(
             status_code=status.HTTP_409_CONFLICT,
-            detail="Promotional task is not active",
+            detail="Task deadline has elapsed.",
         )
-    submission = await TaskSubmission.create(
-        user=current_user, task=task, url=data.url, submitted=True
+    raise HTTPException(
+        status_code=status.HTTP_409_CONFLICT,
+        detail="Promotional task is not active",
     )
-    return submission
 
 
 @router.post(
@@ -283,28 +563,100 @@ async def resource_create(
             detail="Resource creation failed",
             status_code=status.HTTP_424_FAILED_DEPENDENCY,
         )
+    await feed_cache.invalidate(feed_cache.key("resource", resource_created))
     return {"resources": data, "creator": current_user}
 
 
+@router.post(
+    "/resources/import/",
+    name="resource:import",
+    status_code=status.HTTP_200_OK,
+    description="Create resources in bulk from JSON lines.",
+)
+async def import_resources(
+    request: Request,
+    current_user=Security(get_current_user, scopes=["base", "root"]),
+):
+    """Handles bulk resource creation from a JSON-lines body
+
+    Args:
+        request - one ResourceCreate object per line
+        current_user - retrieved from login auth
+    Return:
+        HTTP_200_OK response with the number of resources created, the
+        errors per line and the import throughput
+    Raises:
+        HTTP_401_UNAUTHORIZED if the current_user is not an admin
+    """
+    if not current_user.is_admin:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Only an admin can import resources.",
+        )
+    return await import_content(
+        request, current_user, Resource, ResourceCreate, "resource"
+    )
+
+
 @router.get(
     "/resources/",
     name="resource:get",
     status_code=status.HTTP_200_OK,
 )
 async def resource(
-    current_user=Security(get_current_user, scopes=["base"]),
+    request: Request,
+    params: CursorParams = Depends(),
+    loader: CreatorLoader = Depends(),
+    current_user=Security(get_current_principal, scopes=["base"]),
 ):
     # return all resources if user is an admin
     if current_user.is_admin:
-        return await Resource.all().order_by("-created_at")
-    user_resources = await Resource.filter(
-        **get_queryset(current_user)
-    ).order_by("-created_at")
-    try:
-        len(user_resources)
-        return user_resources
-    except TypeError as e:
+        return await feed_cache.conditional(
+            request,
+            [feed_cache.all_key("resource")],
+            params,
+            lambda: paginate(Resource.all(), params, ResourceItem, loader),
+        )
+    key = feed_cache.key("resource", current_user)
+    return await feed_cache.conditional(
+        request,
+        [key],
+        params,
+        lambda: feed_cache.fetch(
+            key,
+            params,
+            lambda: paginate(
+                Resource.filter(**get_queryset(current_user)),
+                params,
+                ResourceItem,
+                loader,
+            ),
+        ),
+    )
+
+
+@router.get(
+    "/resources/export/",
+    name="dashboard:export-resources",
+    status_code=status.HTTP_200_OK,
+)
+async def export_resources(
+    params: ExportParams = Depends(),
+    current_user=Security(get_current_principal, scopes=["base", "root"]),
+):
+    """Streams every resource to an admin
+
+    Args:
+        params - export format, `json` (default) or `ndjson`
+        current_user - retrieved from login auth
+    Return:
+        HTTP_200_OK streamed response with all resources, newest first
+    Raises:
+        HTTP_401_UNAUTHORIZED if the current_user is not an admin
+    """
+    if not current_user.is_admin:
         raise HTTPException(
-            detail="Failed to get all user resources",
-            status_code=status.HTTP_424_FAILED_DEPENDENCY,
-        ) from e
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Only an admin can export resources.",
+        )
+    return stream_response(Resource.all(), params)
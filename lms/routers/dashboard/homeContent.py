@@ -0,0 +1,174 @@
+import asyncio
+
+from fastapi import (
+    APIRouter,
+    Depends,
+    Query,
+    Request,
+    Response,
+    Security,
+    status,
+)
+from starlette.datastructures import URL
+from tortoise.expressions import Q
+
+from config import HOME_SECTION_SIZE, MAX_PAGE_SIZE
+from library.dependencies.auth import get_current_user
+from library.dependencies.utils import get_queryset
+from library.dependencies.pagination import (
+    CursorParams,
+    dumps,
+    paginate,
+)
+from library.dependencies.feed_cache import feed_cache
+from library.dependencies.loaders import CreatorLoader
+from library.schemas.dashboard import (
+    AnnouncementItem,
+    LessonItem,
+    PromotionTaskItem,
+    ResourceItem,
+    UserProfile,
+)
+from models.dashboard import Announcement, Lesson, PromotionTask, Resource
+
+router = APIRouter(prefix="/dashboard")
+
+
+class HomeParams:
+    """Per-section page sizes for the dashboard home page"""
+
+    def __init__(
+        self,
+        lessons: int = Query(HOME_SECTION_SIZE, ge=1, le=MAX_PAGE_SIZE),
+        resources: int = Query(HOME_SECTION_SIZE, ge=1, le=MAX_PAGE_SIZE),
+        promotion_tasks: int = Query(
+            HOME_SECTION_SIZE, ge=1, le=MAX_PAGE_SIZE
+        ),
+        announcements: int = Query(HOME_SECTION_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    ):
+        self.lessons = lessons
+        self.resources = resources
+        self.promotion_tasks = promotion_tasks
+        self.announcements = announcements
+
+
+def section_params(request: Request, name: str, limit: int) -> CursorParams:
+    """Return first page params whose next link points at a list route."""
+    params = CursorParams(request, cursor=None, limit=limit)
+    params.url = URL(request.url_for(name))
+    return params
+
+
+async def section(
+    feed: str,
+    model,
+    schema,
+    params: CursorParams,
+    loader: CreatorLoader,
+    user,
+) -> bytes:
+    """Return the first page of a cohort feed, rendered."""
+    if user.is_admin:
+        return dumps(await paginate(model.all(), params, schema, loader))
+    return await feed_cache.fetch(
+        feed_cache.key(feed, user),
+        params,
+        lambda: paginate(
+            model.filter(**get_queryset(user)), params, schema, loader
+        ),
+    )
+
+
+async def announcements(
+    params: CursorParams, loader: CreatorLoader, user
+) -> bytes:
+    """Return the first page of the announcement timeline, rendered."""
+    queryset = Announcement.all()
+    if not user.is_admin:
+        queryset = Announcement.filter(
+            Q(general=True) | Q(**get_queryset(user))
+        )
+    return dumps(await paginate(queryset, params, AnnouncementItem, loader))
+
+
+@router.get(
+    "/home/",
+    name="dashboard:home",
+    status_code=status.HTTP_200_OK,
+)
+async def home(
+    request: Request,
+    sizes: HomeParams = Depends(),
+    loader: CreatorLoader = Depends(),
+    current_user=Security(get_current_user, scopes=["base"]),
+):
+    """Gets everything the dashboard home page shows in one request
+
+    Args:
+        sizes - page size of each section
+        current_user - retrieved from login auth
+    Return:
+        HTTP_200_OK response with the user's profile and the first page
+        of their lessons, resources, promotional tasks and announcements
+    """
+    # The sections run concurrently, each on its own pooled connection.
+    lessons, resources, tasks, timeline = await asyncio.gather(
+        section(
+            "lesson",
+            Lesson,
+            LessonItem,
+            section_params(request, "dashboard:all-lessons", sizes.lessons),
+            loader,
+            current_user,
+        ),
+        section(
+            "resource",
+            Resource,
+            ResourceItem,
+            section_params(request, "resource:get", sizes.resources),
+            loader,
+            current_user,
+        ),
+        section(
+            "promotiontask",
+            PromotionTask,
+            PromotionTaskItem,
+            section_params(
+                request,
+                "dashboard:all-promotion-task",
+                sizes.promotion_tasks,
+            ),
+            loader,
+            current_user,
+        ),
+        announcements(
+            section_params(
+                request,
+                "dashboard:all-announcements",
+                sizes.announcements,
+            ),
+            loader,
+            current_user,
+        ),
+    )
+    profile = UserProfile(
+        **{
+            name: getattr(current_user, name)
+            for name in UserProfile.__fields__
+        }
+    )
+    # Sections are already rendered (cohort pages straight from the
+    # feed cache), so the payload is spliced together rather than
+    # decoded and encoded again.
+    sections = {
+        "profile": dumps(profile.dict()),
+        "lessons": lessons,
+        "resources": resources,
+        "promotion_tasks": tasks,
+        "announcements": timeline,
+    }
+    body = b",".join(
+        b'"%s":%s' % (name.encode("utf-8"), value)
+        for name, value in sections.items()
+    )
+    return Response(b"{" + body + b"}", media_type="application/json")
@@ -1,13 +1,34 @@
 from models.user import User
-from fastapi import APIRouter, status, HTTPException, Security, Path
-from routers.auth import pwd_context
-from library.dependencies.auth import get_current_user
+from fastapi import (
+    APIRouter,
+    Depends,
+    Request,
+    status,
+    HTTPException,
+    Security,
+    Path,
+)
+from tortoise.exceptions import IntegrityError
+from tortoise.expressions import Q
+from library.security.password import password_hasher
+from library.security.tokens import expire_user_claims
+from library.dependencies.auth import (
+    get_current_user,
+    get_current_principal,
+    invalidate_user,
+)
 from library.dependencies.utils import get_queryset
+from library.dependencies.pagination import CursorParams, paginate
+from library.dependencies.loaders import CreatorLoader
+from library.dependencies.feed_cache import feed_cache
+from library.dependencies.streaming import ExportParams, stream_response
 from library.schemas.dashboard import (
     ProfileUpdateSchema,
     AnnouncementCreate as announce,
+    AnnouncementItem,
     AnnouncementResponse,
 )
+from models.cohort import COHORT_FIELDS, Cohort
 from models.dashboard import Announcement
 
 router = APIRouter(prefix="/dashboard")
@@ -34,7 +55,7 @@ async def profile_update(
         password = data.password
         old_password = data.old_password
 
-        verify_user_password: bool = pwd_context.verify(
+        verify_user_password: bool = await password_hasher.verify(
             old_password, current_user.hashed_password
         )
         if not verify_user_password:
@@ -43,13 +64,29 @@ async def profile_update(
                 status_code=status.HTTP_401_UNAUTHORIZED,
             )
         # Hash user's password before updating the User's data
-        new_hashed_password = pwd_context.hash(password)
+        new_hashed_password = await password_hasher.hash(password)
         await User.get(id=current_user.id).update(
             hashed_password=new_hashed_password
         )
-    profile_updated = await User.get(id=current_user.id).update(
-        **data.dict(exclude_unset=True, exclude={"password", "old_password"})
+    changes = data.dict(
+        exclude_unset=True, exclude={"password", "old_password"}
     )
+    if set(COHORT_FIELDS) & changes.keys():
+        changes["cohort_id"] = await Cohort.resolve_for(
+            current_user, **changes
+        )
+    try:
+        profile_updated = await User.get(id=current_user.id).update(**changes)
+    except IntegrityError:
+        if not await Cohort.forget_missing([changes.get("cohort_id")]):
+            raise
+        changes["cohort_id"] = await Cohort.resolve_for(
+            current_user, **changes
+        )
+        profile_updated = await User.get(id=current_user.id).update(**changes)
+    if "cohort_id" in changes:
+        await expire_user_claims(current_user.id)
+    await invalidate_user(current_user.id)
     if not profile_updated:
         raise HTTPException(
             detail="Profile update unsuccessful",
@@ -91,6 +128,11 @@ async def announcements(
             detail="Announcement create unsuccessful",
             status_code=status.HTTP_424_FAILED_DEPENDENCY,
         )
+    await feed_cache.invalidate(
+        feed_cache.general_key("announcement")
+        if announcement.general
+        else feed_cache.key("announcement", announcement)
+    )
     return AnnouncementResponse(
         creator=current_user,
         id=announcement.id,
@@ -106,32 +148,76 @@ async def announcements(
     status_code=status.HTTP_200_OK,
 )
 async def get_announcements(
-    current_user=Security(get_current_user, scopes=["base"])
+    request: Request,
+    params: CursorParams = Depends(),
+    loader: CreatorLoader = Depends(),
+    current_user=Security(get_current_principal, scopes=["base"]),
 ):
-    """Gets all announcement using key fields in User object
+    """Gets general and related announcements, newest first
 
     Args:
+        params - cursor and page size query parameters
         current_user - retrieved from login auth
     Return:
-        HTTP_200_OK response with a list of all related announcements
+        HTTP_200_OK response with a page of announcements and the cursor
+        of the next page
     Raises:
-        HTTP_424_FAILED_DEPENDENCY if DB service fails retrieve objects
+        HTTP_422_UNPROCESSABLE_ENTITY if the cursor is invalid
     """
     if current_user.is_admin:
-        return await Announcement.all().order_by("-created_at")
-    general = await Announcement.filter(general="true").order_by("-created_at")
-    user_announcements = await Announcement.filter(
-        **get_queryset(current_user)
-    ).order_by("-created_at")
-    user_announcements.append(general)
-    try:
-        len(user_announcements)
-        return user_announcements
-    except TypeError as e:
+        return await feed_cache.conditional(
+            request,
+            [feed_cache.all_key("announcement")],
+            params,
+            lambda: paginate(
+                Announcement.all(), params, AnnouncementItem, loader
+            ),
+        )
+    # One query serves the whole timeline: general and cohort rows are
+    # merged by the database in (created_at, id) order.
+    return await feed_cache.conditional(
+        request,
+        [
+            feed_cache.general_key("announcement"),
+            feed_cache.key("announcement", current_user),
+        ],
+        params,
+        lambda: paginate(
+            Announcement.filter(
+                Q(general=True) | Q(**get_queryset(current_user))
+            ),
+            params,
+            AnnouncementItem,
+            loader,
+        ),
+    )
+
+
+@router.get(
+    "/announcements/export/",
+    name="dashboard:export-announcements",
+    status_code=status.HTTP_200_OK,
+)
+async def export_announcements(
+    params: ExportParams = Depends(),
+    current_user=Security(get_current_principal, scopes=["base", "root"]),
+):
+    """Streams every announcement to an admin
+
+    Args:
+        params - export format, `json` (default) or `ndjson`
+        current_user - retrieved from login auth
+    Return:
+        HTTP_200_OK streamed response with all announcements, newest first
+    Raises:
+        HTTP_401_UNAUTHORIZED if the current_user is not an admin
+    """
+    if not current_user.is_admin:
         raise HTTPException(
-            detail="Failed to get all announcements",
-            status_code=status.HTTP_424_FAILED_DEPENDENCY,
-        ) from e
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Only an admin can export announcements.",
+        )
+    return stream_response(Announcement.all(), params)
 
 
 @router.get(
@@ -142,7 +228,8 @@ async def get_announcements(
 )
 async def get_announcement(
     announcement_id: str = Path(...),
-    current_user=Security(get_current_user, scopes=["base"]),
+    loader: CreatorLoader = Depends(),
+    current_user=Security(get_current_principal, scopes=["base"]),
 ):
     """Gets a single announcement by ID
 
@@ -167,11 +254,8 @@ async def get_announcement(
             detail="Announcement not found",
             status_code=status.HTTP_404_NOT_FOUND,
         )
-    creator = await User.get_or_none(id=announcement.creator_id)
-    if not creator:
-        creator = None
     return AnnouncementResponse(
-        creator=creator,
+        creator=await loader.load(announcement.creator_id),
         id=announcement.id,
         title=announcement.title,
         content=announcement.content,
@@ -1,9 +1,19 @@
 from fastapi import FastAPI
 
-from library.database.database import create_start_app_handler
+from library.database.database import (
+    create_start_app_handler,
+    create_stop_app_handler,
+)
+from library.security.password import password_hasher
+from library.dependencies.auth import user_cache_listener
+from library.dependencies.feed_cache import feed_cache
+from library.jobs.activity import activity_tracker
+from library.jobs.deadlines import deadline_scheduler
 from routers.auth import router as auth_router
 from routers.dashboard.userContent import router as user_dashboard_router
 from routers.dashboard.courseContent import router as course_dashboard_router
+from routers.dashboard.homeContent import router as home_dashboard_router
+from routers.dashboard.adminContent import router as admin_dashboard_router
 
 
 def get_application():
@@ -13,9 +23,21 @@ def get_application():
 
     # Connect to database.
     app.add_event_handler("startup", create_start_app_handler(app))
+    app.add_event_handler("startup", feed_cache.start)
+    app.add_event_handler("startup", user_cache_listener.start)
+    app.add_event_handler("startup", activity_tracker.start)
+    app.add_event_handler("startup", deadline_scheduler.start)
+    app.add_event_handler("shutdown", feed_cache.stop)
+    app.add_event_handler("shutdown", user_cache_listener.stop)
+    app.add_event_handler("shutdown", activity_tracker.stop)
+    app.add_event_handler("shutdown", deadline_scheduler.stop)
+    app.add_event_handler("shutdown", create_stop_app_handler(app))
+    app.add_event_handler("shutdown", password_hasher.shutdown)
     app.include_router(auth_router)
     app.include_router(user_dashboard_router)
     app.include_router(course_dashboard_router)
+    app.include_router(home_dashboard_router)
+    app.include_router(admin_dashboard_router)
     return app
 
 
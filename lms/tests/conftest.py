@@ -12,6 +12,7 @@ from tortoise.contrib.fastapi import register_tortoise
 from models.user import User
 from server import get_application
 from library.schemas.auth import JWTSchema
+from library.security.tokens import create_access_token
 from config import DATABASE_URL, SECRET_KEY, ALGORITHM
 
 
@@ -102,8 +103,31 @@ def authorized_client(client: AsyncClient, test_user) -> AsyncClient:
 
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
-    client.headers = {
-        **client.headers,
-        "Authorization": f"Bearer {encoded_jwt}",
-    }
+    # The client is shared by the class; replace any earlier token.
+    client.headers["Authorization"] = f"Bearer {encoded_jwt}"
     return client
+
+
+@pytest.fixture()
+async def student_user():
+    email = "student@email.com"
+    student = await User.get_or_none(email=email)
+    if student is None:
+        student = await User.create(
+            email=email,
+            first_name="Student",
+            surname="User",
+            email_verified=True,
+            hashed_password=pwd_context.hash("@123Qwerty"),
+            stage=1,
+            stack="backend",
+            track="python",
+            proficiency="beginner",
+        )
+    return student
+
+
+@pytest.fixture()
+def student_headers(student_user) -> dict:
+    """Authorization headers carrying a student access token."""
+    return {"Authorization": f"Bearer {create_access_token(student_user)}"}
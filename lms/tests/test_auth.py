@@ -1,10 +1,15 @@
+import asyncio
 import redis
 import pytest
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException
 from httpx import AsyncClient
 from passlib.context import CryptContext
 
 from models.user import User
+from library.dependencies.auth import UserCacheListener, user_cache
+from library.security.otp import otp_manager
+from library.security.password import PasswordHasher, password_hasher
+from library.security.tokens import create_reset_token
 from library.dependencies.test_data import (
     generate_user,
 )
@@ -62,6 +67,18 @@ class TestRegister:
             == "User with this email already exist"
         )
 
+    async def test_duplicate_signup_skips_hashing(
+        self, app: FastAPI, client: AsyncClient, monkeypatch
+    ) -> None:
+        async def fail(password):
+            raise AssertionError("password was hashed")
+
+        monkeypatch.setattr(password_hasher, "hash", fail)
+        response = await client.post(
+            app.url_path_for("auth:register"), json=self.request_data
+        )
+        assert response.status_code == 400
+
     # Test for weak password: no uppercase character
     async def test_register_password_no_upper(
         self, app: FastAPI, client: AsyncClient
@@ -110,6 +127,22 @@ class TestRegister:
             == "User with this email already exist"
         )
 
+    async def test_concurrent_registrations_create_one_user(
+        self, app: FastAPI, client: AsyncClient
+    ) -> None:
+        data = {**self.request_data, "password": "#1Password"}
+        responses = await asyncio.gather(
+            *(
+                client.post(
+                    app.url_path_for("auth:register"),
+                    json={**data, "email": email},
+                )
+                for email in ("Race@kodecamp.com", "race@KODECAMP.com")
+            )
+        )
+        assert sorted(r.status_code for r in responses) == [201, 400]
+        assert await User.by_email("race@kodecamp.com").count() == 1
+
     # async def test_email_verification(
     #     self, app: FastAPI, client: AsyncClient
     # ) -> None:
@@ -143,6 +176,16 @@ class TestLogin:
         assert "token" in res_data
         assert "user" in res_data
 
+    async def test_login_ignores_email_case(
+        self, app: FastAPI, client: AsyncClient, test_user
+    ) -> None:
+        response = await client.post(
+            app.url_path_for("auth:login"),
+            json={"email": "Test@Email.COM", "password": "@123Qwerty"},
+        )
+        assert response.status_code == 200
+        assert response.json()["user"]["id"] == str(test_user.id)
+
     async def test_login_fails_on_incorrect_cred(
         self, app: FastAPI, client: AsyncClient, test_user
     ) -> None:
@@ -203,7 +246,7 @@ class TestPermission:
             app.url_path_for("auth:register"), json=new_user
         )
         assert response.status_code == 201
-        user = await User.get_or_none(email=new_user.get("email"))
+        user = await User.by_email(new_user.get("email")).get_or_none()
         assert not user.is_admin
 
         # Login admin
@@ -224,23 +267,209 @@ class TestPermission:
             headers={"Authorization": f"Bearer {admin_token}"},
         )
         assert response.status_code == 200
-        user = await User.get_or_none(email=new_user.get("email"))
+        user = await User.by_email(new_user.get("email")).get_or_none()
         assert user.is_admin
 
 
-# class TestLogout:
-#     async def test_logout(
-#         self, app: FastAPI, client: AsyncClient, test_user
-#     ) -> None:
-#         request_data = {
-#             "email": test_user.email,
-#             "password": "@123Qwerty",
-#         }
-#         response = await client.post(
-#             app.url_path_for("auth:logout"), json=request_data
-#         )
-#         assert response.status_code == 200
-#         res_data = response.json()
-
-#         assert "token" in res_data
-#         assert "user" in res_data
\ No newline at end of file
+class TestTokens:
+    async def login(self, app: FastAPI, client: AsyncClient, test_user):
+        response = await client.post(
+            app.url_path_for("auth:login"),
+            json={"email": test_user.email, "password": "@123Qwerty"},
+        )
+        assert response.status_code == 200
+        return response.json()
+
+    async def test_access_token_skips_user_query(
+        self, app: FastAPI, client: AsyncClient, test_user
+    ) -> None:
+        tokens = await self.login(app, client, test_user)
+        user_cache.clear()
+        misses = user_cache.misses
+
+        response = await client.get(
+            app.url_path_for("dashboard:all-lessons"),
+            headers={"Authorization": f"Bearer {tokens['token']}"},
+        )
+        assert response.status_code == 200
+        assert user_cache.misses == misses
+
+    async def test_refresh_rotates_tokens(
+        self, app: FastAPI, client: AsyncClient, test_user
+    ) -> None:
+        tokens = await self.login(app, client, test_user)
+        data = {"refresh_token": tokens["refresh_token"]}
+
+        response = await client.post(
+            app.url_path_for("auth:refresh"), json=data
+        )
+        assert response.status_code == 200
+        assert response.json().get("refresh_token") != data["refresh_token"]
+
+        # The presented refresh token is single use.
+        response = await client.post(
+            app.url_path_for("auth:refresh"), json=data
+        )
+        assert response.status_code == 401
+
+    async def test_refresh_token_is_not_an_access_token(
+        self, app: FastAPI, client: AsyncClient, test_user
+    ) -> None:
+        tokens = await self.login(app, client, test_user)
+        response = await client.get(
+            app.url_path_for("dashboard:all-lessons"),
+            headers={"Authorization": f"Bearer {tokens['refresh_token']}"},
+        )
+        assert response.status_code == 401
+
+    async def test_reset_rejects_refresh_token(
+        self, app: FastAPI, client: AsyncClient, test_user
+    ) -> None:
+        tokens = await self.login(app, client, test_user)
+        response = await client.put(
+            app.url_path_for("password_reset", token=tokens["refresh_token"]),
+            json={"password": "@123Qwerty", "confirm_password": "@123Qwerty"},
+        )
+        assert response.status_code == 401
+
+    async def test_reset_ends_sessions(
+        self, app: FastAPI, client: AsyncClient, test_user
+    ) -> None:
+        tokens = await self.login(app, client, test_user)
+        reset_url = app.url_path_for(
+            "password_reset", token=create_reset_token(test_user)
+        )
+        data = {"password": "@123Qwerty", "confirm_password": "@123Qwerty"}
+
+        response = await client.put(reset_url, json=data)
+        assert response.status_code == 200
+
+        response = await client.get(
+            app.url_path_for("dashboard:all-lessons"),
+            headers={"Authorization": f"Bearer {tokens['token']}"},
+        )
+        assert response.status_code == 401
+        response = await client.post(
+            app.url_path_for("auth:refresh"),
+            json={"refresh_token": tokens["refresh_token"]},
+        )
+        assert response.status_code == 401
+
+        # The reset link is single use, and new logins work.
+        response = await client.put(reset_url, json=data)
+        assert response.status_code == 401
+        tokens = await self.login(app, client, test_user)
+        response = await client.get(
+            app.url_path_for("dashboard:all-lessons"),
+            headers={"Authorization": f"Bearer {tokens['token']}"},
+        )
+        assert response.status_code == 200
+
+    async def test_user_invalidation_is_broadcast(
+        self, client: AsyncClient, test_user
+    ) -> None:
+        user_cache.set(str(test_user.id), test_user)
+        await UserCacheListener.redis().publish(
+            UserCacheListener.channel, str(test_user.id)
+        )
+        for _ in range(50):
+            if user_cache.get(str(test_user.id)) is None:
+                break
+            await asyncio.sleep(0.01)
+
+        assert user_cache.get(str(test_user.id)) is None
+
+    async def test_logout_revokes_tokens(
+        self, app: FastAPI, client: AsyncClient, test_user
+    ) -> None:
+        tokens = await self.login(app, client, test_user)
+        headers = {"Authorization": f"Bearer {tokens['token']}"}
+
+        response = await client.post(
+            app.url_path_for("auth:logout"),
+            json={"refresh_token": tokens["refresh_token"]},
+            headers=headers,
+        )
+        assert response.status_code == 200
+
+        response = await client.get(
+            app.url_path_for("dashboard:all-lessons"), headers=headers
+        )
+        assert response.status_code == 401
+
+
+class TestOTPManager:
+    async def test_otp_is_consumed_once(self, client: AsyncClient) -> None:
+        otp = await otp_manager.create_otp(user_id="user-id")
+
+        assert await otp_manager.consume_otp(otp) == "user-id"
+        assert await otp_manager.consume_otp(otp) is None
+
+    async def test_create_otps_in_batch(self, client: AsyncClient) -> None:
+        user_ids = [f"user-{i}" for i in range(50)]
+        otps = await otp_manager.create_otps(user_ids)
+
+        assert set(otps) == set(user_ids)
+        assert len(set(otps.values())) == len(user_ids)
+        assert await otp_manager.consume_otp(otps["user-7"]) == "user-7"
+
+
+class TestPasswordHasher:
+    async def test_hash_and_verify(self) -> None:
+        hasher = PasswordHasher(workers=2)
+        hashed_password = await hasher.hash("@123Qwerty")
+
+        assert await hasher.verify("@123Qwerty", hashed_password)
+        assert not await hasher.verify("@123Qwertz", hashed_password)
+        assert hasher.stats()["calls"] == 3
+        hasher.shutdown()
+
+    async def test_rejects_when_queue_is_full(self) -> None:
+        hasher = PasswordHasher(workers=1, max_pending=0)
+        with pytest.raises(HTTPException) as exc_info:
+            await hasher.hash("@123Qwerty")
+
+        assert exc_info.value.status_code == 503
+        assert hasher.stats()["rejected"] == 1
+
+    async def test_hash_many_waits_instead_of_rejecting(self) -> None:
+        hasher = PasswordHasher(workers=2, max_pending=1)
+        passwords = [f"@123Qwerty{i}" for i in range(4)]
+        hashes = await hasher.hash_many(passwords)
+
+        assert len(hashes) == 4
+        assert await hasher.verify(passwords[3], hashes[3])
+        assert hasher.stats()["rejected"] == 0
+        hasher.shutdown()
+
+
+class TestAuthCache:
+    async def test_current_user_is_cached(
+        self, app: FastAPI, authorized_client: AsyncClient, test_user
+    ) -> None:
+        user_cache.clear()
+        hits = user_cache.hits
+
+        for _ in range(2):
+            response = await authorized_client.get(
+                app.url_path_for("dashboard:all-lessons")
+            )
+            assert response.status_code == 200
+        assert user_cache.hits == hits + 1
+
+    async def test_set_permission_invalidates_cache(
+        self, app: FastAPI, authorized_client: AsyncClient, test_user
+    ) -> None:
+        new_user = generate_user()
+        response = await authorized_client.post(
+            app.url_path_for("auth:register"), json=new_user
+        )
+        assert response.status_code == 201
+        user = await User.get(id=response.json().get("id"))
+        user_cache.set(str(user.id), user)
+
+        response = await authorized_client.put(
+            app.url_path_for("set_permission", email=user.email)
+        )
+        assert response.status_code == 200
+        assert user_cache.get(str(user.id)) is None
@@ -1,9 +1,45 @@
+import io
+import json
+import redis
+import random
+import time
+from tempfile import SpooledTemporaryFile
+from types import SimpleNamespace
+from datetime import datetime, timedelta, timezone
+import asyncio
+import logging
+import numpy as np
 import pytest
 from fastapi import FastAPI
+from tortoise import Tortoise
 from httpx import AsyncClient
+from starlette.datastructures import URL, UploadFile
 from passlib.context import CryptContext
 
 from essential_generators import DocumentGenerator
+from config import REDIS_OTP_DB
+from models.user import User
+from models.base import uuid7
+from models.cohort import Cohort, assign_cohorts
+from models.dashboard import (
+    Announcement,
+    Lesson,
+    Notification,
+    PromotionTask,
+    Quiz,
+    Resource,
+    TaskSubmission,
+)
+from library.dependencies import analytics
+from library.dependencies.feed_cache import feed_cache
+from library.dependencies.pagination import CursorParams
+from library.schemas.dashboard import LessonItem
+from library.dependencies.imports import read_csv
+from library.dependencies.streaming import stream_rows
+from library.jobs.activity import activity_tracker
+from library.jobs.deadlines import DeadlineScheduler, deadline_scheduler
+from library.jobs.promotion import promote_students
+from library.security.tokens import create_access_token
 from library.dependencies.test_data import (
     generate_user,
     generate_announcement,
@@ -12,6 +48,26 @@ from library.dependencies.test_data import (
 gen = DocumentGenerator()
 pytestmark = pytest.mark.asyncio
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+cohort = {
+    "stage": 1,
+    "stack": "backend",
+    "track": "python",
+    "proficiency": "beginner",
+}
+
+
+async def make_lessons(creator, count: int, **fields):
+    lessons = [
+        Lesson(
+            title=gen.sentence()[:127],
+            content=gen.sentence()[:654],
+            creator=creator,
+            **{**cohort, **fields},
+        )
+        for _ in range(count)
+    ]
+    await assign_cohorts(lessons)
+    return lessons
 
 
 class TestAnnouncement:
@@ -44,6 +100,1357 @@ class TestAnnouncement:
         assert response.status_code == 201
 
 
+class TestPagination:
+    async def test_lessons_are_paginated_by_cursor(
+        self, app: FastAPI, authorized_client: AsyncClient, test_user
+    ) -> None:
+        await Lesson.bulk_create(await make_lessons(test_user, 25))
+        seen = []
+        url = app.url_path_for("dashboard:all-lessons")
+        params = {"limit": 10}
+        while True:
+            response = await authorized_client.get(url, params=params)
+            assert response.status_code == 200
+            page = response.json()
+            assert len(page["results"]) <= 10
+            seen.extend(row["id"] for row in page["results"])
+            if not page["next_cursor"]:
+                break
+            params["cursor"] = page["next_cursor"]
+
+        assert len(seen) == len(set(seen)) == 25
+        assert seen == [
+            str(lesson.id)
+            for lesson in await Lesson.all().order_by("-created_at", "-id")
+        ]
+
+    async def test_pages_select_schema_fields(
+        self, app: FastAPI, authorized_client: AsyncClient, test_user
+    ) -> None:
+        await Lesson.bulk_create(await make_lessons(test_user, 1))
+        response = await authorized_client.get(
+            app.url_path_for("dashboard:all-lessons")
+        )
+        row = response.json()["results"][0]
+        assert row.keys() == LessonItem.__fields__.keys()
+
+    async def test_announcements_merge_general_and_cohort(
+        self, app: FastAPI, client: AsyncClient, test_user, student_headers
+    ) -> None:
+        await Announcement.all().delete()
+        for i in range(6):
+            await Announcement.create(
+                title=f"announcement {i}",
+                content="content",
+                general=i % 2 == 0,
+                creator=test_user,
+                **({} if i % 2 == 0 else cohort),
+            )
+        await Announcement.create(
+            title="other cohort",
+            content="content",
+            creator=test_user,
+            **{**cohort, "stage": 2},
+        )
+
+        url = app.url_path_for("dashboard:all-announcements")
+        response = await client.get(
+            url, params={"limit": 4}, headers=student_headers
+        )
+        assert response.status_code == 200
+        page = response.json()
+        titles = [row["title"] for row in page["results"]]
+        assert titles == [f"announcement {i}" for i in (5, 4, 3, 2)]
+
+        response = await client.get(
+            url,
+            params={"limit": 4, "cursor": page["next_cursor"]},
+            headers=student_headers,
+        )
+        titles = [row["title"] for row in response.json()["results"]]
+        assert titles == ["announcement 1", "announcement 0"]
+        assert response.json()["next_cursor"] is None
+
+    async def test_announcement_ties_are_ordered_by_id(
+        self, app: FastAPI, client: AsyncClient, test_user, student_headers
+    ) -> None:
+        await Announcement.all().delete()
+        created = await Announcement.create(
+            title="cohort", content="content", creator=test_user, **cohort
+        )
+        await Announcement.create(
+            title="general",
+            content="content",
+            general=True,
+            creator=test_user,
+        )
+        await Announcement.filter(general=True).update(
+            created_at=created.created_at
+        )
+        expected = [
+            str(row.id) for row in await Announcement.all().order_by("-id")
+        ]
+
+        url = app.url_path_for("dashboard:all-announcements")
+        seen = []
+        params = {"limit": 1}
+        while True:
+            response = await client.get(
+                url, params=params, headers=student_headers
+            )
+            page = response.json()
+            seen.extend(row["id"] for row in page["results"])
+            if not page["next_cursor"]:
+                break
+            params["cursor"] = page["next_cursor"]
+
+        assert seen == expected
+
+    async def test_invalid_cursor(
+        self, app: FastAPI, authorized_client: AsyncClient
+    ) -> None:
+        response = await authorized_client.get(
+            app.url_path_for("dashboard:all-lessons"),
+            params={"cursor": "not-a-cursor"},
+        )
+        assert response.status_code == 422
+
+
+class TestFeedCache:
+    lesson = {
+        "title": "Cached lesson",
+        "content": "content",
+        **cohort,
+    }
+
+    async def test_create_invalidates_cohort_feed(
+        self,
+        app: FastAPI,
+        authorized_client: AsyncClient,
+        student_user,
+        student_headers,
+    ) -> None:
+        url = app.url_path_for("dashboard:all-lessons")
+        key = feed_cache.key("lesson", student_user)
+
+        response = await authorized_client.get(url, headers=student_headers)
+        assert response.json()["results"] == []
+        assert await feed_cache.redis().exists(key)
+        assert feed_cache.local.get(key) is not None
+
+        other_cohort = feed_cache.key(
+            "lesson",
+            Lesson(cohort_id=await Cohort.resolve(**{**cohort, "stage": 2})),
+        )
+        await feed_cache.redis().hset(other_cohort, ":20", "{}")
+
+        response = await authorized_client.post(url, json=self.lesson)
+        assert response.status_code == 201
+        assert not await feed_cache.redis().exists(key)
+        assert feed_cache.local.get(key) is None
+        assert await feed_cache.redis().exists(other_cohort)
+
+        response = await authorized_client.get(url, headers=student_headers)
+        titles = [row["title"] for row in response.json()["results"]]
+        assert titles == ["Cached lesson"]
+
+    async def test_invalidation_is_broadcast(
+        self, client: AsyncClient
+    ) -> None:
+        feed_cache.local.set("feed:lesson:test", {":20": {}})
+        await feed_cache.redis().publish(
+            feed_cache.channel, "feed:lesson:test"
+        )
+        for _ in range(50):
+            if feed_cache.local.get("feed:lesson:test") is None:
+                break
+            await asyncio.sleep(0.01)
+
+        assert feed_cache.local.get("feed:lesson:test") is None
+
+    async def test_page_loaded_across_invalidation_is_not_cached(
+        self, client: AsyncClient
+    ) -> None:
+        key = "feed:lesson:race"
+        params = CursorParams(
+            SimpleNamespace(url=URL("http://testserver/lessons/")), None, 20
+        )
+
+        async def loader():
+            # Content changes while the page is being read.
+            await feed_cache.invalidate(key)
+            return {"results": [], "next_cursor": None, "next": None}
+
+        body = await feed_cache.fetch(key, params, loader)
+        assert json.loads(body) == {
+            "results": [],
+            "next_cursor": None,
+            "next": None,
+        }
+        assert not await feed_cache.redis().exists(key)
+        assert feed_cache.local.get(key) is None
+
+    async def test_new_pages_do_not_extend_ttl(
+        self, client: AsyncClient
+    ) -> None:
+        key = "feed:lesson:ttl"
+        url = SimpleNamespace(url=URL("http://testserver/lessons/"))
+
+        async def loader():
+            return {"results": [], "next_cursor": None, "next": None}
+
+        await feed_cache.invalidate(key)
+        await feed_cache.fetch(key, CursorParams(url, None, 20), loader)
+        assert 0 < await feed_cache.redis().ttl(key) <= feed_cache.ttl
+        await feed_cache.redis().expire(key, 5)
+
+        await feed_cache.fetch(key, CursorParams(url, None, 10), loader)
+        assert 0 < await feed_cache.redis().ttl(key) <= 5
+        await feed_cache.invalidate(key)
+
+    async def test_next_link_follows_the_request(
+        self,
+        app: FastAPI,
+        authorized_client: AsyncClient,
+        test_user,
+        student_headers,
+    ) -> None:
+        await Lesson.bulk_create(await make_lessons(test_user, 2))
+        url = app.url_path_for("dashboard:all-lessons")
+
+        response = await authorized_client.get(
+            url, headers=student_headers, params={"limit": 1}
+        )
+        assert "limit=1" in response.json()["next"]
+
+        # Same cached page, but the home page links to the list route.
+        response = await authorized_client.get(
+            app.url_path_for("dashboard:home"),
+            headers=student_headers,
+            params={"lessons": 1},
+        )
+        next_url = response.json()["lessons"]["next"]
+        assert next_url.startswith("http://testserver" + url + "?cursor=")
+        assert "limit" not in next_url
+
+
+class TestConditionalGet:
+    async def test_unchanged_feed_returns_304(
+        self,
+        app: FastAPI,
+        authorized_client: AsyncClient,
+        student_user,
+        student_headers,
+    ) -> None:
+        url = app.url_path_for("dashboard:all-lessons")
+
+        response = await authorized_client.get(url, headers=student_headers)
+        etag = response.headers["ETag"]
+
+        response = await authorized_client.get(
+            url, headers={**student_headers, "If-None-Match": etag}
+        )
+        assert response.status_code == 304
+        assert response.content == b""
+        assert response.headers["ETag"] == etag
+
+        response = await authorized_client.post(
+            url, json={**TestFeedCache.lesson, "title": "New lesson"}
+        )
+        assert response.status_code == 201
+
+        response = await authorized_client.get(
+            url, headers={**student_headers, "If-None-Match": etag}
+        )
+        assert response.status_code == 200
+        assert response.headers["ETag"] != etag
+        assert response.json()["results"][0]["title"] == "New lesson"
+
+    async def test_general_announcement_changes_every_etag(
+        self,
+        app: FastAPI,
+        authorized_client: AsyncClient,
+        student_user,
+        student_headers,
+    ) -> None:
+        url = app.url_path_for("dashboard:all-announcements")
+
+        student = await authorized_client.get(url, headers=student_headers)
+        admin = await authorized_client.get(url)
+
+        response = await authorized_client.post(
+            url,
+            json={"title": "General", "content": "content", "general": True},
+        )
+        assert response.status_code == 201
+
+        for headers, before in (
+            (student_headers, student),
+            ({}, admin),
+        ):
+            response = await authorized_client.get(
+                url,
+                headers={**headers, "If-None-Match": before.headers["ETag"]},
+            )
+            assert response.status_code == 200
+
+
+class TestExport:
+    async def test_export_streams_every_row(
+        self, app: FastAPI, authorized_client: AsyncClient, test_user
+    ) -> None:
+        await Lesson.bulk_create(await make_lessons(test_user, 25))
+        url = app.url_path_for("dashboard:export-lessons")
+
+        response = await authorized_client.get(url)
+        assert response.status_code == 200
+        rows = response.json()
+        assert len(rows) == await Lesson.all().count() >= 25
+        assert rows == sorted(
+            rows, key=lambda r: (r["created_at"], r["id"]), reverse=True
+        )
+
+        response = await authorized_client.get(
+            url, params={"format": "ndjson"}
+        )
+        assert response.headers["content-type"] == "application/x-ndjson"
+        lines = response.text.splitlines()
+        assert [json.loads(line) for line in lines] == rows
+
+    async def test_rows_are_fetched_in_chunks(self, test_user) -> None:
+        await Lesson.bulk_create(await make_lessons(test_user, 7))
+        rows = [row async for row in stream_rows(Lesson.all(), chunk_size=2)]
+        count = await Lesson.all().count()
+        assert count >= 7
+        assert len({row["id"] for row in rows}) == len(rows) == count
+
+    async def test_export_requires_admin(
+        self,
+        app: FastAPI,
+        authorized_client: AsyncClient,
+        student_user,
+        student_headers,
+    ) -> None:
+        response = await authorized_client.get(
+            app.url_path_for("dashboard:export-announcements"),
+            headers=student_headers,
+        )
+        assert response.status_code == 401
+
+
+class TestHome:
+    async def test_home_returns_every_section(
+        self,
+        app: FastAPI,
+        authorized_client: AsyncClient,
+        test_user,
+        student_user,
+        student_headers,
+    ) -> None:
+        await Lesson.bulk_create(await make_lessons(test_user, 3))
+        await Lesson.bulk_create(await make_lessons(test_user, 2, stage=2))
+        await Announcement.create(
+            title="General", content="content", general=True
+        )
+
+        response = await authorized_client.get(
+            app.url_path_for("dashboard:home"),
+            headers=student_headers,
+            params={"lessons": 2},
+        )
+        assert response.status_code == 200
+        home = response.json()
+
+        assert home["profile"]["id"] == str(student_user.id)
+        assert home["profile"]["stack"] == "backend"
+        lessons = home["lessons"]
+        assert len(lessons["results"]) == 2
+        assert all(row["stage"] == 1 for row in lessons["results"])
+        assert lessons["results"][0]["creator"]["id"] == str(test_user.id)
+        assert lessons["next"].startswith(
+            "http://testserver" + app.url_path_for("dashboard:all-lessons")
+        )
+        assert home["resources"]["results"] == []
+        assert home["promotion_tasks"]["results"] == []
+        titles = [row["title"] for row in home["announcements"]["results"]]
+        assert "General" in titles
+
+        response = await authorized_client.get(
+            lessons["next"], headers=student_headers
+        )
+        assert len(response.json()["results"]) >= 1
+
+
+class TestCreatorLoader:
+    async def test_creators_resolved_in_one_query(
+        self, app: FastAPI, authorized_client: AsyncClient, test_user, caplog
+    ) -> None:
+        other = await User.create(
+            email="other@email.com", first_name="Other", surname="Admin"
+        )
+        await Lesson.bulk_create(
+            await make_lessons(test_user, 5) + await make_lessons(other, 5)
+        )
+        # Warm the user cache so only creator lookups query the table.
+        await authorized_client.get(app.url_path_for("dashboard:all-lessons"))
+
+        with caplog.at_level(logging.DEBUG, logger="tortoise.db_client"):
+            response = await authorized_client.get(
+                app.url_path_for("dashboard:all-lessons")
+            )
+        assert response.status_code == 200
+        creators = {
+            row["creator"]["first_name"] for row in response.json()["results"]
+        }
+        assert creators == {"Test", "Other"}
+        user_queries = [
+            record
+            for record in caplog.records
+            if 'FROM "user"' in record.getMessage()
+        ]
+        assert len(user_queries) == 1
+
+
+class TestCohorts:
+    async def test_rows_share_their_cohort(
+        self, test_user, student_user
+    ) -> None:
+        lesson = await Lesson.create(
+            title="lesson", creator=test_user, **cohort
+        )
+        assert lesson.cohort_id == student_user.cohort_id
+        assert student_user.cohort_id == await Cohort.resolve(**cohort)
+        assert test_user.cohort_id != student_user.cohort_id
+
+        lesson.stage = 2
+        await lesson.save(update_fields=["stage"])
+        await lesson.refresh_from_db()
+        assert lesson.cohort_id == await Cohort.resolve(
+            **{**cohort, "stage": 2}
+        )
+
+    async def test_profile_update_moves_cohort(
+        self, app: FastAPI, client: AsyncClient, student_user, student_headers
+    ) -> None:
+        response = await client.put(
+            "/dashboard/user/profile/",
+            json={"stack": "frontend", "track": "reactjs"},
+            headers=student_headers,
+        )
+        assert response.status_code == 200
+
+        user = await User.get(id=student_user.id)
+        assert user.cohort_id == await Cohort.resolve(
+            stage=1, stack="frontend", track="reactjs", proficiency="beginner"
+        )
+
+    async def test_stale_cohort_id_is_resolved_again(self, test_user) -> None:
+        values = {**cohort, "stage": 9}
+        stale = await Cohort.resolve(**values)
+        # Deleted behind the cache, as after a rolled back transaction.
+        await Cohort.filter(id=stale).delete()
+
+        lesson = await Lesson.create(
+            title="lesson", creator=test_user, **values
+        )
+        assert lesson.cohort_id != stale
+        assert lesson.cohort_id == await Cohort.resolve(**values)
+        assert await Cohort.exists(id=lesson.cohort_id)
+
+
+class TestActivity:
+    async def test_activity_is_flushed_in_batches(
+        self, app: FastAPI, client: AsyncClient, student_user, student_headers
+    ) -> None:
+        activity_tracker.recent.clear()
+        before = (await User.get(id=student_user.id)).last_active
+        url = app.url_path_for("dashboard:all-lessons")
+
+        for _ in range(3):
+            await client.get(url, headers=student_headers)
+        pending = await activity_tracker.pending()
+        assert list(pending) == [str(student_user.id)]
+        assert (await User.get(id=student_user.id)).last_active == before
+
+        assert await activity_tracker.flush() == 1
+        assert await activity_tracker.pending() == {}
+        user = await User.get(id=student_user.id)
+        assert user.last_active.timestamp() == pytest.approx(
+            pending[str(student_user.id)]
+        )
+
+        # Already recorded this interval: no further Redis writes.
+        await client.get(url, headers=student_headers)
+        assert await activity_tracker.pending() == {}
+
+    async def test_active_users_counts_pending_and_flushed(
+        self,
+        app: FastAPI,
+        authorized_client: AsyncClient,
+        test_user,
+        student_user,
+    ) -> None:
+        activity_tracker.recent.clear()
+        await User.filter(id=student_user.id).update(
+            last_active=datetime.now(timezone.utc) - timedelta(hours=2)
+        )
+        url = app.url_path_for("admin:active-users")
+
+        response = await authorized_client.get(url)
+        assert response.json()["active"] == 1
+
+        await activity_tracker.flush()
+        response = await authorized_client.get(url, params={"minutes": 60})
+        assert response.json()["active"] == 1
+        response = await authorized_client.get(url, params={"minutes": 180})
+        assert response.json()["active"] == 2
+
+    async def test_stats_report_auth_cache_counters(
+        self, app: FastAPI, authorized_client: AsyncClient, student_headers
+    ) -> None:
+        url = app.url_path_for("admin:stats")
+        response = await authorized_client.get(url)
+        assert response.status_code == 200
+        before = response.json()
+        assert before["user_cache"].keys() == {
+            "size",
+            "maxsize",
+            "hits",
+            "misses",
+        }
+        assert "pending" in before["password_hasher"]
+
+        response = await authorized_client.get(url)
+        after = response.json()["token_cache"]
+        assert after["hits"] > before["token_cache"]["hits"]
+
+        response = await authorized_client.get(url, headers=student_headers)
+        assert response.status_code == 401
+
+
+class TestUserImport:
+    async def test_import_reports_per_row(
+        self, app: FastAPI, authorized_client: AsyncClient, student_user
+    ) -> None:
+        csv = "\n".join(
+            [
+                "first_name,surname,email,password,stage,stack,track",
+                "Ada,Lovelace,Ada@Import.com,#1Password,2,backend,python",
+                "Alan,Turing,alan@import.com,#1Password,,,",
+                "Bad,Row,not-an-email,#1Password,,,",
+                "Weak,Password,weak@import.com,password,,,",
+                "Ada,Again,ada@import.COM,#1Password,,,",
+                f"Stu,Dent,{student_user.email},#1Password,,,",
+            ]
+        )
+        # The shared client sends JSON; uploads need their own
+        # multipart Content-Type.
+        async with AsyncClient(
+            app=app,
+            base_url="http://testserver",
+            headers={
+                "Authorization": authorized_client.headers["Authorization"]
+            },
+        ) as uploader:
+            response = await uploader.post(
+                app.url_path_for("admin:import-users"),
+                files={"file": ("users.csv", csv.encode(), "text/csv")},
+            )
+        assert response.status_code == 200
+        result = response.json()
+        assert result["rows"] == 6
+        assert result["created"] == 2
+        assert [e["row"] for e in result["errors"]] == [3, 4, 5, 6]
+        assert "Duplicate" in result["errors"][2]["error"]
+        assert "already exist" in result["errors"][3]["error"]
+        assert result["rows_per_second"] > 0
+
+        ada = await User.by_email("ada@import.com").get()
+        assert ada.email == "ada@import.com"
+        assert ada.cohort_id == await Cohort.resolve(
+            stage=2, stack="backend", track="python"
+        )
+        assert pwd_context.verify("#1Password", ada.hashed_password)
+        otps = redis.Redis(host="redis", port=6379, db=REDIS_OTP_DB)
+        owners = {otps.get(key) for key in otps.keys()}
+        assert str(ada.id).encode() in owners
+
+    async def test_csv_is_read_in_small_pieces(self) -> None:
+        # Multibyte text and a quoted newline, read a few bytes at a
+        # time, so reads split both characters and records.
+        data = (
+            "\ufefffirst_name,surname,email\n"
+            'Zoë,"Ní\nBhriain",zoe@import.com\n'
+            "\n"
+            "Élodie,,elodie@import.com"
+        ).encode()
+        upload = UploadFile("users.csv", file=SpooledTemporaryFile())
+        await upload.write(data)
+        await upload.seek(0)
+
+        chunks = [
+            chunk
+            async for chunk in read_csv(upload, chunk_size=1, read_size=5)
+        ]
+        assert chunks == [
+            [
+                (
+                    1,
+                    {
+                        "first_name": "Zoë",
+                        "surname": "Ní\nBhriain",
+                        "email": "zoe@import.com",
+                    },
+                )
+            ],
+            [(2, {"first_name": "Élodie", "email": "elodie@import.com"})],
+        ]
+
+
+class TestContentImport:
+    async def test_import_lessons_per_line(
+        self,
+        app: FastAPI,
+        client: AsyncClient,
+        authorized_client: AsyncClient,
+        student_headers,
+    ) -> None:
+        await Lesson.all().delete()
+        lines = [
+            json.dumps({"title": f"imported {i}", "content": "c", **cohort})
+            for i in range(3)
+        ]
+        lines.insert(1, json.dumps({"title": "no content", **cohort}))
+        lines.insert(3, "{not json")
+        lines.append("")
+        body = "\n".join(lines).encode()
+
+        # Warm the student's cached feed so the import must invalidate it.
+        url = app.url_path_for("dashboard:all-lessons")
+        response = await client.get(url, headers=student_headers)
+        assert response.json()["results"] == []
+
+        response = await authorized_client.post(
+            app.url_path_for("lesson:import"),
+            content=body,
+            headers={"Content-Type": "application/x-ndjson"},
+        )
+        assert response.status_code == 200
+        result = response.json()
+        assert result["rows"] == 5
+        assert result["created"] == 3
+        assert [e["row"] for e in result["errors"]] == [2, 4]
+
+        response = await client.get(url, headers=student_headers)
+        titles = {row["title"] for row in response.json()["results"]}
+        assert titles == {f"imported {i}" for i in range(3)}
+
+    async def test_import_promotion_tasks_schedules_deadlines(
+        self, app: FastAPI, authorized_client: AsyncClient
+    ) -> None:
+        lines = [
+            json.dumps(
+                {
+                    "title": f"imported task {i}",
+                    "content": "c",
+                    "deadline": 3,
+                    **cohort,
+                }
+            )
+            for i in range(2)
+        ]
+        lines.append(json.dumps({"title": "no deadline", **cohort}))
+        body = "\n".join(lines).encode()
+
+        # Stopped, the app's scheduler only gains heap entries from
+        # schedule(), not from a reload.
+        await deadline_scheduler.stop()
+        try:
+            response = await authorized_client.post(
+                app.url_path_for("promotion-task:import"),
+                content=body,
+                headers={"Content-Type": "application/x-ndjson"},
+            )
+            assert response.status_code == 200
+            result = response.json()
+            assert result["rows"] == 3
+            assert result["created"] == 2
+            assert [e["row"] for e in result["errors"]] == [3]
+
+            tasks = await PromotionTask.filter(
+                title__startswith="imported task"
+            )
+            assert len(tasks) == 2
+            assert all(task.active for task in tasks)
+            scheduled = {
+                row_id
+                for _, job, row_id in deadline_scheduler.heap
+                if job == "promotiontask"
+            }
+            assert {str(task.id) for task in tasks} <= scheduled
+        finally:
+            await deadline_scheduler.start()
+
+    async def test_import_resources(
+        self, app: FastAPI, authorized_client: AsyncClient
+    ) -> None:
+        await Resource.all().delete()
+        lines = [
+            json.dumps({"title": f"resource {i}", "content": "c", **cohort})
+            for i in range(2)
+        ]
+        lines.append(json.dumps({**cohort, "stack": "nope"}))
+        body = "\n".join(lines).encode()
+
+        response = await authorized_client.post(
+            app.url_path_for("resource:import"),
+            content=body,
+            headers={"Content-Type": "application/x-ndjson"},
+        )
+        assert response.status_code == 200
+        result = response.json()
+        assert result["rows"] == 3
+        assert result["created"] == 2
+        assert [e["row"] for e in result["errors"]] == [3]
+        titles = set(await Resource.all().values_list("title", flat=True))
+        assert titles == {"resource 0", "resource 1"}
+
+    async def test_import_requires_admin(
+        self, app: FastAPI, client: AsyncClient, student_headers
+    ) -> None:
+        response = await client.post(
+            app.url_path_for("resource:import"),
+            content=b"{}",
+            headers=student_headers,
+        )
+        assert response.status_code == 401
+
+
+class TestDeadlines:
+    @pytest.fixture(autouse=True)
+    async def idle_app_scheduler(self, client: AsyncClient):
+        # The app's own scheduler would race the ones under test for the
+        # same rows and locks.
+        await deadline_scheduler.stop()
+        yield
+        await deadline_scheduler.start()
+
+    async def test_submit_rejects_elapsed_deadline(
+        self, app: FastAPI, client: AsyncClient, test_user, student_headers
+    ) -> None:
+        task = await PromotionTask.create(
+            title="task",
+            content="content",
+            active=True,
+            deadline=datetime.now(timezone.utc) - timedelta(minutes=1),
+            creator=test_user,
+            **cohort,
+        )
+        response = await client.post(
+            app.url_path_for("task:submit", task_id=str(task.id)),
+            json={"url": "https://example.com"},
+            headers=student_headers,
+        )
+        assert response.status_code == 409
+        assert response.json()["detail"] == "Task deadline has elapsed."
+
+    async def test_scheduler_closes_due_rows_in_batches(
+        self, client: AsyncClient, test_user
+    ) -> None:
+        now = datetime.now(timezone.utc)
+        tasks = [
+            await PromotionTask.create(
+                title=f"task {minutes}",
+                active=True,
+                deadline=now + timedelta(minutes=minutes),
+                creator=test_user,
+                **cohort,
+            )
+            for minutes in (-3, -2, -1, 10)
+        ]
+        quiz = await Quiz.create(
+            user=test_user, deadline=now - timedelta(minutes=1)
+        )
+        scheduler = DeadlineScheduler(interval=60, batch_size=2)
+        scheduler.schedule("promotiontask", *tasks)
+        scheduler.schedule("quiz", quiz)
+        assert scheduler.heap[0][0] == tasks[0].deadline.timestamp()
+
+        await scheduler.run_due()
+        assert [
+            (await PromotionTask.get(id=task.id)).active for task in tasks
+        ] == [False, False, False, True]
+        assert (await Quiz.get(id=quiz.id)).closed
+        assert scheduler.heap == [
+            (tasks[3].deadline.timestamp(), "promotiontask", str(tasks[3].id))
+        ]
+
+    async def test_closing_tasks_changes_feed_etag(
+        self,
+        app: FastAPI,
+        client: AsyncClient,
+        test_user,
+        student_headers,
+    ) -> None:
+        task = await PromotionTask.create(
+            title="task",
+            active=True,
+            deadline=datetime.now(timezone.utc) - timedelta(minutes=1),
+            creator=test_user,
+            **cohort,
+        )
+        url = app.url_path_for("dashboard:all-promotion-task")
+        response = await client.get(url, headers=student_headers)
+        etag = response.headers["ETag"]
+        rows = {row["id"]: row for row in response.json()["results"]}
+        assert rows[str(task.id)]["active"]
+
+        scheduler = DeadlineScheduler(interval=60, batch_size=10)
+        assert await scheduler.expire(
+            "promotiontask", datetime.now(timezone.utc)
+        )
+
+        response = await client.get(
+            url, headers={**student_headers, "If-None-Match": etag}
+        )
+        assert response.status_code == 200
+        assert response.headers["ETag"] != etag
+        rows = {row["id"]: row for row in response.json()["results"]}
+        assert not rows[str(task.id)]["active"]
+
+    async def test_scheduler_defers_to_lock_holder(
+        self, client: AsyncClient, test_user
+    ) -> None:
+        quiz = await Quiz.create(
+            user=test_user,
+            deadline=datetime.now(timezone.utc) - timedelta(minutes=1),
+        )
+        scheduler = DeadlineScheduler(interval=60, batch_size=10)
+        scheduler.schedule("quiz", quiz)
+        lock = scheduler.redis().lock(scheduler.lock_prefix + "quiz")
+        assert await lock.acquire(blocking=False)
+        try:
+            await scheduler.run_due()
+        finally:
+            await lock.release()
+        assert not (await Quiz.get(id=quiz.id)).closed
+        assert [entry[1:] for entry in scheduler.heap] == [
+            ("quiz", str(quiz.id))
+        ]
+
+        await scheduler.load()
+        assert await scheduler.expire("quiz", datetime.now(timezone.utc))
+        assert (await Quiz.get(id=quiz.id)).closed
+
+    async def test_load_skips_rows_due_after_the_next_reload(
+        self, client: AsyncClient, test_user
+    ) -> None:
+        await Quiz.all().delete()
+        now = datetime.now(timezone.utc)
+        soon, later = [
+            await Quiz.create(user=test_user, deadline=now + delay)
+            for delay in (timedelta(seconds=30), timedelta(hours=1))
+        ]
+        await Quiz.create(user=test_user)
+
+        scheduler = DeadlineScheduler(interval=60, batch_size=10)
+        await scheduler.load()
+        assert [
+            entry[1:] for entry in scheduler.heap if entry[1] == "quiz"
+        ] == [("quiz", str(soon.id))]
+
+
+class TestSubmissions:
+    async def make_task(self, test_user) -> PromotionTask:
+        return await PromotionTask.create(
+            title="task",
+            content="content",
+            active=True,
+            deadline=datetime.now(timezone.utc) + timedelta(days=1),
+            creator=test_user,
+            **cohort,
+        )
+
+    async def test_resubmission_updates_the_same_row(
+        self, app: FastAPI, client: AsyncClient, test_user, student_headers
+    ) -> None:
+        task = await self.make_task(test_user)
+        url = app.url_path_for("task:submit", task_id=str(task.id))
+        first = await client.post(
+            url, json={"url": "https://one.com"}, headers=student_headers
+        )
+        assert first.status_code == 201
+        assert first.json()["resubmissions"] == 0
+
+        second = await client.post(
+            url, json={"url": "https://two.com"}, headers=student_headers
+        )
+        assert second.status_code == 201
+        assert second.json()["id"] == first.json()["id"]
+        assert second.json()["url"] == "https://two.com"
+        assert second.json()["resubmissions"] == 1
+        assert await TaskSubmission.filter(task_id=task.id).count() == 1
+
+    async def test_graded_submission_is_kept(
+        self, app: FastAPI, client: AsyncClient, test_user, student_headers
+    ) -> None:
+        task = await self.make_task(test_user)
+        url = app.url_path_for("task:submit", task_id=str(task.id))
+        await client.post(
+            url, json={"url": "https://one.com"}, headers=student_headers
+        )
+        await TaskSubmission.filter(task_id=task.id).update(
+            graded=True, passed=True
+        )
+
+        response = await client.post(
+            url, json={"url": "https://two.com"}, headers=student_headers
+        )
+        assert response.status_code == 409
+        assert response.json()["detail"] == (
+            "Submission has already been graded."
+        )
+        submission = await TaskSubmission.get(task_id=task.id)
+        assert submission.graded and submission.passed
+        assert submission.url == "https://one.com"
+
+    async def test_idempotency_key_replays_the_response(
+        self, app: FastAPI, client: AsyncClient, test_user, student_headers
+    ) -> None:
+        task = await self.make_task(test_user)
+        url = app.url_path_for("task:submit", task_id=str(task.id))
+        headers = {**student_headers, "Idempotency-Key": "retry-1"}
+        responses = [
+            await client.post(
+                url, json={"url": "https://one.com"}, headers=headers
+            )
+            for _ in range(3)
+        ]
+        assert {r.status_code for r in responses} == {201}
+        assert len({r.content for r in responses}) == 1
+        submission = await TaskSubmission.get(task_id=task.id)
+        assert submission.resubmissions == 0
+
+        headers["Idempotency-Key"] = "retry-2"
+        response = await client.post(
+            url, json={"url": "https://two.com"}, headers=headers
+        )
+        assert response.json()["resubmissions"] == 1
+
+    async def test_refused_submission_releases_the_key(
+        self, app: FastAPI, client: AsyncClient, test_user, student_headers
+    ) -> None:
+        task = await self.make_task(test_user)
+        await PromotionTask.filter(id=task.id).update(active=False)
+        url = app.url_path_for("task:submit", task_id=str(task.id))
+        headers = {**student_headers, "Idempotency-Key": "retry-1"}
+        response = await client.post(
+            url, json={"url": "https://one.com"}, headers=headers
+        )
+        assert response.status_code == 409
+        assert response.json()["detail"] == "Promotional task is not active"
+
+        await PromotionTask.filter(id=task.id).update(active=True)
+        response = await client.post(
+            url, json={"url": "https://one.com"}, headers=headers
+        )
+        assert response.status_code == 201
+
+        response = await client.post(
+            app.url_path_for("task:submit", task_id=str(uuid7())),
+            json={"url": "https://one.com"},
+            headers=student_headers,
+        )
+        assert response.status_code == 404
+        response = await client.post(
+            app.url_path_for("task:submit", task_id="not-a-uuid"),
+            json={"url": "https://one.com"},
+            headers=student_headers,
+        )
+        assert response.status_code == 422
+
+
+class TestGrading:
+    async def make_grader(self) -> User:
+        grader, _ = await User.get_or_create(
+            email="grader@email.com",
+            defaults={"hashed_password": "x", "is_admin": True},
+        )
+        return grader
+
+    async def make_submissions(self, test_user, student_user, count):
+        submissions = []
+        for i in range(count):
+            task = await PromotionTask.create(
+                title=f"task {i}", active=True, creator=test_user, **cohort
+            )
+            submissions.append(
+                await TaskSubmission.create(
+                    user=student_user,
+                    task=task,
+                    url=f"https://{i}.com",
+                    submitted=True,
+                )
+            )
+        return submissions
+
+    async def test_concurrent_claims_never_overlap(
+        self, client: AsyncClient, test_user, student_user
+    ) -> None:
+        await TaskSubmission.all().delete()
+        submissions = await self.make_submissions(test_user, student_user, 10)
+        other = await self.make_grader()
+        claims = await asyncio.gather(
+            TaskSubmission.claim(test_user.id, 4, 60),
+            TaskSubmission.claim(other.id, 4, 60),
+            TaskSubmission.claim(test_user.id, 4, 60),
+        )
+        claimed = [row["id"] for rows in claims for row in rows]
+        assert len(claimed) == len(set(claimed))
+        assert all(len(rows) <= 4 for rows in claims)
+
+        rest = await TaskSubmission.claim(other.id, 10, 60)
+        claimed += [row["id"] for row in rest]
+        assert sorted(claimed) == sorted(s.id for s in submissions)
+        assert await TaskSubmission.claim(other.id, 10, 60) == []
+
+    async def test_claim_and_grade_a_batch(
+        self,
+        app: FastAPI,
+        authorized_client: AsyncClient,
+        test_user,
+        student_user,
+    ) -> None:
+        await TaskSubmission.all().delete()
+        first, second, third = await self.make_submissions(
+            test_user, student_user, 3
+        )
+        response = await authorized_client.post(
+            app.url_path_for("admin:claim-submissions"),
+            params={"limit": 2},
+        )
+        assert response.status_code == 200
+        results = response.json()["results"]
+        assert [r["id"] for r in results] == [str(first.id), str(second.id)]
+        assert results[0]["url"] == "https://0.com"
+
+        # The lease on the second claim lapses and another grader takes it.
+        await TaskSubmission.filter(id=second.id).update(
+            claimed_until=datetime.now(timezone.utc) - timedelta(seconds=1)
+        )
+        other = await self.make_grader()
+        reclaimed = await TaskSubmission.claim(other.id, 10, 60)
+        assert {row["id"] for row in reclaimed} == {second.id, third.id}
+
+        response = await authorized_client.post(
+            app.url_path_for("admin:grade-submissions"),
+            json={
+                "grades": [
+                    {"id": str(first.id), "passed": True},
+                    {"id": str(second.id), "passed": True},
+                ]
+            },
+        )
+        assert response.status_code == 200
+        assert response.json() == {
+            "graded": [str(first.id)],
+            "rejected": [str(second.id)],
+        }
+        first = await TaskSubmission.get(id=first.id)
+        assert first.graded and first.passed
+        assert first.claimed_by_id is None
+        assert not (await TaskSubmission.get(id=second.id)).graded
+
+    async def test_grading_requires_admin(
+        self, app: FastAPI, client: AsyncClient, student_headers
+    ) -> None:
+        response = await client.post(
+            app.url_path_for("admin:claim-submissions"),
+            headers=student_headers,
+        )
+        assert response.status_code == 401
+
+
+class TestPromotion:
+    async def test_promotes_students_who_passed_every_task(
+        self, app: FastAPI, authorized_client: AsyncClient, test_user
+    ) -> None:
+        students = [
+            await User.create(
+                email=f"promote{i}@email.com",
+                hashed_password="x",
+                **{**cohort, "stage": stage},
+            )
+            for i, stage in enumerate((1, 1, 1, 2))
+        ]
+        tasks = [
+            await PromotionTask.create(
+                title="task", creator=test_user, **{**cohort, "stage": stage}
+            )
+            for stage in (1, 1, 2)
+        ]
+        # Passed both stage 1 tasks, passed one, failed one, passed the
+        # only stage 2 task.
+        for student, task, passed in [
+            (students[0], tasks[0], True),
+            (students[0], tasks[1], True),
+            (students[1], tasks[0], True),
+            (students[2], tasks[0], False),
+            (students[2], tasks[1], True),
+            (students[3], tasks[2], True),
+        ]:
+            await TaskSubmission.create(
+                user=student, task=task, graded=True, passed=passed
+            )
+        url = app.url_path_for("admin:promote")
+
+        response = await authorized_client.post(
+            url, json={"stage": 1, "dry_run": True}
+        )
+        assert response.status_code == 200
+        report = response.json()
+        assert report["eligible"] == 1 and report["promoted"] == 0
+        assert report["by_stage"] == {"1": 1}
+        assert (await User.get(id=students[0].id)).stage == 1
+
+        response = await authorized_client.post(url, json={})
+        report = response.json()
+        assert report["promoted"] == 2
+        assert report["by_stage"] == {"1": 1, "2": 1}
+        stages = [(await User.get(id=s.id)).stage for s in students]
+        assert stages == [2, 1, 1, 3]
+        promoted = await User.get(id=students[0].id)
+        assert promoted.cohort_id == await Cohort.resolve(
+            **{**cohort, "stage": 2}
+        )
+
+        # Promoted students start over on their new stage's tasks.
+        response = await authorized_client.post(url, json={})
+        assert response.json()["promoted"] == 0
+
+    async def test_tokens_issued_before_promotion_are_reloaded(
+        self, app: FastAPI, client: AsyncClient, test_user
+    ) -> None:
+        await PromotionTask.all().delete()
+        student = await User.create(
+            email="promote-token@email.com", hashed_password="x", **cohort
+        )
+        task = await PromotionTask.create(
+            title="task", creator=test_user, **cohort
+        )
+        await TaskSubmission.create(
+            user=student, task=task, graded=True, passed=True
+        )
+        for stage in (1, 2):
+            await Lesson.create(
+                title=f"stage {stage}",
+                creator=test_user,
+                **{**cohort, "stage": stage},
+            )
+        headers = {"Authorization": f"Bearer {create_access_token(student)}"}
+        url = app.url_path_for("dashboard:all-lessons")
+
+        response = await client.get(url, headers=headers)
+        titles = {row["title"] for row in response.json()["results"]}
+        assert "stage 1" in titles and "stage 2" not in titles
+
+        report = await promote_students(stage=1)
+        assert report["promoted"] >= 1
+
+        # Same token: its claims still say stage 1.
+        response = await client.get(url, headers=headers)
+        titles = {row["title"] for row in response.json()["results"]}
+        assert "stage 2" in titles and "stage 1" not in titles
+
+
+class TestQuizStats:
+    async def make_quizzes(self, test_user):
+        await User.filter(email__startswith="quiz").delete()
+        students = [
+            await User.create(
+                email=f"quiz{i}@email.com",
+                hashed_password="x",
+                **{**cohort, "stage": 4 if i == 3 else cohort["stage"]},
+            )
+            for i in range(4)
+        ]
+        easy, hard = [
+            await Lesson.create(title=title, creator=test_user, **cohort)
+            for title in ("easy", "hard")
+        ]
+        other = await Lesson.create(
+            title="other", creator=test_user, **{**cohort, "stage": 2}
+        )
+        for student, lesson, score in [
+            (students[0], easy, 90),
+            (students[1], easy, 80),
+            (students[2], easy, 70),
+            (students[0], hard, 40),
+            (students[1], hard, 50),
+            (students[2], hard, 30),
+            (students[0], None, 60),
+            (students[1], None, None),
+            (students[0], other, 60),
+            # Since promoted, but the quiz stays with the lesson's cohort.
+            (students[3], easy, 10),
+        ]:
+            await Quiz.create(user=student, lesson=lesson, score=score)
+        return easy, hard
+
+    async def test_stats_are_computed_per_cohort(
+        self,
+        app: FastAPI,
+        authorized_client: AsyncClient,
+        test_user,
+        monkeypatch,
+    ) -> None:
+        easy, hard = await self.make_quizzes(test_user)
+        url = app.url_path_for("admin:quiz-stats")
+        response = await authorized_client.get(url, params=cohort)
+        assert response.status_code == 200
+        stats = response.json()
+        scores = np.array([90, 80, 70, 10, 40, 50, 30], dtype=float)
+        assert stats["count"] == 7
+        assert stats["mean"] == pytest.approx(scores.mean())
+        assert stats["std"] == pytest.approx(scores.std())
+        assert stats["percentiles"]["50"] == pytest.approx(50)
+        assert sum(stats["histogram"]["counts"]) == 7
+        lessons = stats["lessons"]
+        assert [row["lesson_id"] for row in lessons] == [
+            str(hard.id),
+            str(easy.id),
+        ]
+        assert [row["attempts"] for row in lessons] == [3, 4]
+        assert lessons[0]["difficulty"] == pytest.approx(
+            (scores.mean() - 40) / scores.std()
+        )
+
+        # Unchanged scores are served from the cache.
+        def fail(cohort_id):
+            raise AssertionError("scores were reloaded")
+
+        monkeypatch.setattr(analytics, "load_scores", fail)
+        response = await authorized_client.get(url, params=cohort)
+        assert response.json() == stats
+        monkeypatch.undo()
+
+        await Quiz.filter(lesson_id=hard.id).update(score=100)
+        response = await authorized_client.get(url, params=cohort)
+        assert response.json()["lessons"][0]["lesson_id"] == str(easy.id)
+
+    async def test_reader_handles_any_chunking(self, test_user) -> None:
+        await self.make_quizzes(test_user)
+        cohort_id = await Cohort.resolve(**cohort)
+        stream = io.BytesIO()
+        async with Tortoise.get_connection(
+            "default"
+        ).acquire_connection() as raw:
+            await raw.copy_from_query(
+                analytics.SCORES_SQL,
+                cohort_id,
+                output=stream,
+                format="binary",
+            )
+        data = stream.getvalue()
+        reader = analytics.ScoreReader()
+        for start in range(0, len(data), 7):
+            end = start + 7
+            await reader(data[start:end])
+        scores, lessons = reader.arrays()
+        expected, _ = await analytics.load_scores(cohort_id)
+        assert sorted(scores) == sorted(expected)
+        assert len(lessons) == len(scores)
+
+    async def test_reader_checks_the_header(self) -> None:
+        header = analytics.COPY_SIGNATURE + bytes(4)
+        row = np.array(
+            [(2, 8, 75.0, 16, b"l" * 16)], dtype=analytics.ROW
+        ).tobytes()
+        reader = analytics.ScoreReader()
+        # A header extension arriving a byte at a time is skipped.
+        for byte in header + b"\x00\x00\x00\x03ext":
+            await reader(bytes([byte]))
+        await reader(row + analytics.COPY_TRAILER)
+        scores, lessons = reader.arrays()
+        assert scores.tolist() == [75.0]
+        assert lessons.tolist() == [b"l" * 16]
+
+        with pytest.raises(ValueError, match="Not a binary COPY"):
+            await analytics.ScoreReader()(b"PGCOPY\n\xff\r\n\x01" + bytes(8))
+
+
+class TestFeedIndexes:
+    stacks = [
+        ("backend", "python"),
+        ("backend", "golang"),
+        ("frontend", "reactjs"),
+        ("design", "product design"),
+    ]
+    proficiencies = ["beginner", "intermediate", "advanced"]
+
+    def random_cohort(self):
+        stack, track = random.choice(self.stacks)
+        return {
+            "stage": random.randint(0, 10),
+            "stack": stack,
+            "track": track,
+            "proficiency": random.choice(self.proficiencies),
+        }
+
+    async def explain(self, queryset) -> str:
+        conn = Tortoise.get_connection("default")
+        await conn.execute_script(f"ANALYZE {queryset.model._meta.db_table}")
+        _, rows = await conn.execute_query(f"EXPLAIN {queryset.sql()}")
+        return "\n".join(row["QUERY PLAN"] for row in rows)
+
+    async def test_cohort_feed_uses_index(self, test_user) -> None:
+        lessons = [
+            Lesson(
+                title="lesson",
+                content="content",
+                creator=test_user,
+                **self.random_cohort(),
+            )
+            for _ in range(5000)
+        ]
+        await assign_cohorts(lessons)
+        await Lesson.bulk_create(lessons)
+        queryset = (
+            Lesson.filter(cohort_id=await Cohort.resolve(**cohort))
+            .order_by("-created_at", "-id")
+            .limit(21)
+        )
+        plan = await self.explain(queryset)
+
+        assert "Index Scan" in plan
+        assert "idx_lesson_cohort" in plan
+        assert "Seq Scan" not in plan
+
+    async def test_general_announcements_use_partial_index(
+        self, test_user
+    ) -> None:
+        announcements = [
+            Announcement(
+                title="announcement",
+                content="content",
+                creator=test_user,
+                general=i % 100 == 0,
+                **({} if i % 100 == 0 else self.random_cohort()),
+            )
+            for i in range(5000)
+        ]
+        await assign_cohorts(announcements)
+        await Announcement.bulk_create(announcements)
+        queryset = (
+            Announcement.filter(general=True)
+            .order_by("-created_at", "-id")
+            .limit(21)
+        )
+        plan = await self.explain(queryset)
+
+        assert "Index Scan" in plan
+        assert "idx_announcement_general" in plan
+
 
 """
 Unit Test To-Dos
@@ -56,3 +1463,19 @@ Unit Test To-Dos
     * promotional tasks
     * notifications
 """
+
+
+class TestTimeOrderedIds:
+    async def test_uuid7_is_time_ordered(self) -> None:
+        ids = [uuid7() for _ in range(5000)]
+        assert ids == sorted(ids)
+        assert len(set(ids)) == len(ids)
+        assert all(i.version == 7 for i in ids)
+        millis = ids[-1].int >> 80
+        assert abs(millis - time.time() * 1000) < 5000
+
+    async def test_new_rows_get_time_ordered_ids(self) -> None:
+        first = await Notification.create(message="first")
+        second = await Notification.create(message="second")
+        assert first.id.version == 7
+        assert first.id < second.id